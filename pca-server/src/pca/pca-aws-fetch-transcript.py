@@ -5,7 +5,6 @@ It performs summarization of the call if summarization was enabled.
 Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
-import boto3
 import os
 import pcaconfiguration as cf
 import pcaresults
@@ -53,6 +52,23 @@ def generate_transcript_string(pca_results):
     return transcript_str
 
 
+def create_transcript_string(pca_results, token_count=None, process_transcript=False):
+    """
+    Creates the text transcript for a set of results, optionally truncating it and removing filler words
+
+    :param pca_results: PCA results to create the transcript from
+    :param token_count: Number of words to truncate the transcript to, if set
+    :param process_transcript: Flag to say if filler words should be removed
+    :return: Text transcript
+    """
+    transcript_str = generate_transcript_string(pca_results)
+    if token_count is not None:
+        transcript_str = truncate_number_of_words(transcript_str, int(token_count))
+    if process_transcript:
+        transcript_str = remove_filler_words(transcript_str)
+    return transcript_str
+
+
 def lambda_handler(event, context):
     """
     Lambda function entrypoint
@@ -61,21 +77,14 @@ def lambda_handler(event, context):
     print(event)
 
     # Load our configuration data
-    cf.loadConfiguration()
+    cf.loadEventConfiguration(event)
 
     # Load in our existing interim CCA results
     pca_results = pcaresults.PCAResults()
     pca_results.read_results_from_s3(cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], event["interimResultsFile"])
     
-    transcript_str = generate_transcript_string(pca_results)
-    if 'tokenCount' in event:
-        tokenCount = int(event['tokenCount'])
-        transcript_str = truncate_number_of_words(transcript_str, tokenCount)
-
-    if 'processTranscript' in event:
-        processTranscript = event['processTranscript']
-        if processTranscript:
-            transcript_str = remove_filler_words(transcript_str)
+    transcript_str = create_transcript_string(pca_results, event.get('tokenCount'),
+                                              event.get('processTranscript', False))
 
     return {
         'transcript': transcript_str
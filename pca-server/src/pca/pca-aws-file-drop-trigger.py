@@ -10,7 +10,6 @@ SPDX-License-Identifier: Apache-2.0
 from pathlib import Path
 import json
 import urllib.parse
-import boto3
 import pcaconfiguration as cf
 import pcacommon
 import filetype
@@ -19,6 +18,7 @@ import os
 TMP_DIR = "/tmp/"
 VALID_MIME_TYPES = ["audio", "video"]
 SUMMARIZE = os.getenv("SUMMARIZE", "false")
+FUSED_PROCESSING = os.getenv("FUSED_PROCESSING", "false")
 
 
 def get_invalid_mime_type(filename):
@@ -63,7 +63,7 @@ def verify_transcribe_file(bucket, key):
     # Download our JSON file to local storage
     transcribe_file = False
     inputFilename = TMP_DIR + key.split('/')[-1]
-    s3Client = boto3.client('s3')
+    s3Client = pcacommon.get_s3_client()
     s3Client.download_file(bucket, key, inputFilename)
 
     # Load the JSON file into memory
@@ -88,7 +88,7 @@ def lambda_handler(event, context):
     cf.loadConfiguration()
 
     # Get handles to the object from the event
-    s3 = boto3.client("s3")
+    s3 = pcacommon.get_s3_client()
     bucket = event['Records'][0]['s3']['bucket']['name']
     key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
 
@@ -123,7 +123,7 @@ def lambda_handler(event, context):
         else:
             # Download our object to local file storage
             local_filename = TMP_DIR + key.split('/')[-1]
-            s3_client = boto3.client('s3')
+            s3_client = pcacommon.get_s3_client()
             s3_client.download_file(bucket, key, local_filename)
 
             # Get some file metadata to see what kind of file this actually is
@@ -155,7 +155,7 @@ def invoke_step_function(bucket, key, file_type):
     :param file_type: The type of file, either "audio" or "transcript"
     """
     ourStepFunction = cf.appConfig[cf.COMP_SFN_NAME]
-    sfnClient = boto3.client('stepfunctions')
+    sfnClient = pcacommon.get_client('stepfunctions')
     sfnMachinesResult = sfnClient.list_state_machines(maxResults=1000)
 
     sfnArnList = list(
@@ -171,7 +171,8 @@ def invoke_step_function(bucket, key, file_type):
     parameters = '{\n  \"bucket\": \"' + bucket + '\",\n' + \
                  '  \"key\": \"' + key + '\",\n' + \
                  '  \"inputType\": \"' + file_type + '\",\n' + \
-                 '  \"summarize\": \"' + SUMMARIZE + '\"\n' + \
+                 '  \"summarize\": \"' + SUMMARIZE + '\",\n' + \
+                 '  \"fusedProcessing\": \"' + FUSED_PROCESSING + '\"\n' + \
                  '}'
     sfnClient.start_execution(stateMachineArn=sfnArn, input=parameters)
 
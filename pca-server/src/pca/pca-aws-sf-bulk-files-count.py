@@ -8,8 +8,8 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import pcaconfiguration as cf
+import pcacommon
 import copy
-import boto3
 
 def lambda_handler(event, context):
 
@@ -22,7 +22,7 @@ def lambda_handler(event, context):
     else:
         # First time through, so read them once, store them, and use for the duration of the workflow.
         # Also, make sure here that the out max job limit and file drip rate are at least 1+
-        ssmClient = boto3.client("ssm")
+        ssmClient = pcacommon.get_client("ssm")
         bucket = ssmClient.get_parameter(Name=cf.BULK_S3_BUCKET)["Parameter"]["Value"]
         targetBucket = ssmClient.get_parameter(Name=cf.CONF_S3BUCKET_INPUT)["Parameter"]["Value"]
         targetAudioKey = ssmClient.get_parameter(Name=cf.CONF_PREFIX_RAW_AUDIO)["Parameter"]["Value"]
@@ -37,7 +37,7 @@ def lambda_handler(event, context):
         sfData["filesProcessed"] = 0
 
     # Just get a single S3 check on whether or not we have files to go
-    s3Client = boto3.client('s3')
+    s3Client = pcacommon.get_s3_client()
     maxKeys = dripRate + 10 # list a few additional keys to allow for some folder objects that won't be moved
     response = s3Client.list_objects_v2(Bucket=bucket, MaxKeys=maxKeys)
     if "Contents" in response:
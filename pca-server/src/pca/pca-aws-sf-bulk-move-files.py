@@ -7,7 +7,7 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import copy
-import boto3
+import pcacommon
 
 
 def lambda_handler(event, context):
@@ -23,8 +23,7 @@ def lambda_handler(event, context):
     movedFiles = 0
 
     # Get as many files from S3 as we can move this time (minimum of queueSpace and dripRate)
-    s3Client = boto3.client('s3')
-    s3 = boto3.resource('s3')
+    s3Client = pcacommon.get_s3_client()
     maxKeys = min(dripRate, queueSpace) + 10 # list a few additional keys to allow for some folder objects that won't be moved
     response = s3Client.list_objects_v2(Bucket=sourceBucket, MaxKeys=maxKeys)
     if "Contents" in response:
@@ -43,7 +42,7 @@ def lambda_handler(event, context):
                     'Key': audioFile["Key"]
                 }
                 print(f'Copying: copy_source={copy_source}, targetBucket={targetBucket}, copyDestnKey={copyDestnKey}')
-                s3.meta.client.copy(copy_source, targetBucket, copyDestnKey)
+                s3Client.copy(copy_source, targetBucket, copyDestnKey)
                 deleteResponse = s3Client.delete_object(Bucket=sourceBucket, Key=audioFile["Key"])
                 movedFiles += 1
             except Exception as e:
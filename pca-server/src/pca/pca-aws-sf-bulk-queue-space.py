@@ -8,7 +8,7 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import copy
-import boto3
+import pcacommon
 
 
 def countTranscribeJobsInState(status, client, filesLimit):
@@ -41,7 +41,7 @@ def lambda_handler(event, context):
     sfData.pop("filesToMove", None)
 
     # Count the number of IN_PROGRESS and QUEUED Transcribe jobs
-    transcribeClient = boto3.client("transcribe")
+    transcribeClient = pcacommon.get_client("transcribe")
     try:
         inProgress = countTranscribeJobsInState("IN_PROGRESS", transcribeClient, filesLimit)
         queued = countTranscribeJobsInState("QUEUED", transcribeClient, (filesLimit - inProgress))
@@ -11,10 +11,11 @@ SPDX-License-Identifier: Apache-2.0
 import os
 from pathlib import Path
 from datetime import datetime
-import boto3
 import json
 import pcaconfiguration as cf
 import pcaresults
+import pcacommon
+import pcanlp
 import copy
 
 # General constants
@@ -82,7 +83,7 @@ def load_single_ctr_file(ctr_filename):
 
     # Check conv file exists
     if not OFFLINE_MODE:
-        s3_client = boto3.client("s3")
+        s3_client = pcacommon.get_s3_client()
         response = s3_client.get_object(Bucket=cf.appConfig[cf.CONF_S3BUCKET_INPUT], Key=ctr_filename)
 
     # Download to a tempfile
@@ -238,6 +239,7 @@ def split_ivr_speech_segment(segment, ivr_end_time, pca_results):
     :param segment: Speech segment containing both IVR and agent text
     :param ivr_end_time: End time for the IVR's participation in the segment
     :param pca_results: Handle to the overall PCA results so we can manipulate the speech segment results list
+    :return: The new agent segment, or None if the segment didn't need to be split
     """
     split_index = pca_results.speech_segments.index(segment)
     if split_index > 0:
@@ -256,22 +258,27 @@ def split_ivr_speech_segment(segment, ivr_end_time, pca_results):
         agent_segment.segmentSpeaker = get_speaker_channel(pca_results.analytics.speaker_labels, AGENT_CHANNEL_LC_NAME)
 
         # Split the words up correctly for both segments - IVR first
-        segment.segmentConfidence = list(filter(lambda x: x["EndTime"] < (ivr_end_time + TIMESTAMP_BUFFER), segment.segmentConfidence))
-        segment.segmentEndTime = segment.segmentConfidence[-1]["EndTime"]
+        ivr_words = segment.segmentConfidence
+        segment.segmentConfidence = ivr_words.select([index for index, end_time in enumerate(ivr_words.end_times)
+                                                      if end_time < (ivr_end_time + TIMESTAMP_BUFFER)])
+        segment.segmentEndTime = segment.segmentConfidence.end_times[-1]
         segment.segmentText = regenerate_segment_text(segment)
 
         # Now get the words for the Agent half
-        agent_segment.segmentConfidence = list(filter(lambda x: x["StartTime"] > (ivr_end_time - TIMESTAMP_BUFFER), agent_segment.segmentConfidence))
+        agent_words = agent_segment.segmentConfidence
+        agent_segment.segmentConfidence = agent_words.select([index for index, start_time in
+                                                              enumerate(agent_words.start_times)
+                                                              if start_time > (ivr_end_time - TIMESTAMP_BUFFER)])
         if len(agent_segment.segmentConfidence) > 0:
-            agent_segment.segmentConfidence[0]["Text"] = agent_segment.segmentConfidence[0]["Text"].replace(" ", "")
-            agent_segment.segmentStartTime = agent_segment.segmentConfidence[0]["StartTime"]
+            agent_segment.segmentConfidence.texts[0] = agent_segment.segmentConfidence.texts[0].replace(" ", "")
+            agent_segment.segmentStartTime = agent_segment.segmentConfidence.start_times[0]
             agent_segment.segmentText = regenerate_segment_text(agent_segment)
         else:
             # we didnt really need to split this segment
             pca_results.speech_segments = lhs_segments
             pca_results.speech_segments.append(orig_segment)
             pca_results.speech_segments.extend(rhs_segments)
-            return
+            return None
 
         # Work out which custom entities belong to the agent and the IVR
         ivr_text_len = len(segment.segmentText)
@@ -287,8 +294,7 @@ def split_ivr_speech_segment(segment, ivr_end_time, pca_results):
                 # Add to IVR segment
                 ivr_entities.append(entity)
 
-        # Assign our entity lists back to the correct segments
-        # TODO Need to add in a new scaled sentiment score
+        # Assign our entity lists back to the correct segments - the agent's sentiment is re-scored later
         segment.segmentCustomEntities = ivr_entities
         agent_segment.segmentCustomEntities = agent_entites
 
@@ -297,6 +303,36 @@ def split_ivr_speech_segment(segment, ivr_end_time, pca_results):
         pca_results.speech_segments.append(segment)
         pca_results.speech_segments.append(agent_segment)
         pca_results.speech_segments.extend(rhs_segments)
+        return agent_segment
+
+    return None
+
+
+def rescore_agent_segments(agent_segments, pca_analytics):
+    """
+    Generates new sentiment values for agent segments that have been split away from an IVR segment, as they
+    will still have the sentiment of the original combined segment.  Any that have since been marked as IVR
+    segments are skipped, as their sentiment is erased, and the Comprehend requests for the rest are run
+    concurrently by the NLP executor.  Nothing is done if there is no Comprehend language for the call
+
+    :param agent_segments: Agent segments created by splitting IVR segments
+    :param pca_analytics: Analytics part of PCA results
+    """
+    lang_code = pcacommon.get_comprehend_language_code(pca_analytics.conversationLanguageCode)
+    nlp_segments = list(filter(lambda x: (not x.segmentIVR) and (len(x.segmentText) >= pcanlp.MIN_SENTIMENT_LENGTH),
+                               agent_segments))
+    if (lang_code == "") or not nlp_segments:
+        return
+
+    executor = pcanlp.NLPExecutor()
+    sentiment_responses = pcanlp.comprehend_multiple_sentiment([segment.segmentText for segment in nlp_segments],
+                                                               lang_code, pcanlp.COMPREHEND_SENTIMENT_SCALER, executor)
+    executor.report()
+
+    # Replace the inherited sentiment, applying the configured thresholds in the same way as the main parser
+    for segment, sentimentResponse in zip(nlp_segments, sentiment_responses):
+        pcanlp.apply_sentiment_thresholds(segment, sentimentResponse, cf.appConfig[cf.CONF_MINNEGATIVE],
+                                          cf.appConfig[cf.CONF_MINPOSITIVE])
 
 
 def calculate_start_time(call_ctr_json, conv_ctr=True):
@@ -321,10 +357,7 @@ def regenerate_segment_text(segment):
     :param segment: Segment to be updated
     :return: Regenerated text
     """
-    new_full_text = ""
-    for word in segment.segmentConfidence:
-        new_full_text = new_full_text + word["Text"]
-    return new_full_text
+    return "".join(segment.segmentConfidence.texts)
 
 
 def get_filtered_json_data(json_data, key_term, key_value):
@@ -408,20 +441,22 @@ def extract_ivr_lines(agent_channel, call_start_time, ctr_json, pca_analytics, p
         # Now go through each speech segment, and if it STARTS within
         # a start/end point of an agent segment, and its first word ENDS
         # before the end of the IVR tine, then flag as IVR
-        segments_to_split = []
+        split_agent_segments = []
         for ivr in ivr_times:
             for segment in pca_results.speech_segments:
                 # If this IVR block starts inside the segment, and it doesn't end before the
                 # first word in the segment, and it's an agent channel, then we have an IVR overlap
                 if (ivr["Start"] <= segment.segmentStartTime <= ivr["End"]) and \
-                        (ivr["End"] >= segment.segmentConfidence[0]["EndTime"]) and \
+                        (ivr["End"] >= segment.segmentConfidence.end_times[0]) and \
                         (segment.segmentSpeaker == agent_channel):
                     # If this segment has speech after the IVR has finished then this
                     # MIGHT be agent speech, so we need to split this segment up before
                     # marking segments
                     if segment.segmentEndTime > ivr["End"]:
                         # If we found any segments that we need to split then do that now
-                        split_ivr_speech_segment(segment, ivr["End"], pca_results)
+                        agent_segment = split_ivr_speech_segment(segment, ivr["End"], pca_results)
+                        if agent_segment is not None:
+                            split_agent_segments.append(agent_segment)
 
         # Run through one more time but without splitting
         for ivr in ivr_times:
@@ -429,7 +464,7 @@ def extract_ivr_lines(agent_channel, call_start_time, ctr_json, pca_analytics, p
                 # If this IVR block starts inside the segment, and it doesn't end before the
                 # first word in the segment, and it's an agent channel, then we have an IVR overlap
                 if (ivr["Start"] <= segment.segmentStartTime <= ivr["End"]) and \
-                        (ivr["End"] >= segment.segmentConfidence[0]["EndTime"]) and \
+                        (ivr["End"] >= segment.segmentConfidence.end_times[0]) and \
                         (segment.segmentSpeaker == agent_channel):
                     # Mark this segment as an IVR segment
                     segment.segmentIVR = True
@@ -440,6 +475,9 @@ def extract_ivr_lines(agent_channel, call_start_time, ctr_json, pca_analytics, p
                     segment.segmentIsPositive = False
                     segment.segmentAllSentiments = {"Positive": 0.0, "Negative": 0.0, "Neutral": 1.0}
 
+        # Any agent segments that we split off need their own sentiment
+        rescore_agent_segments(split_agent_segments, pca_analytics)
+
         # Run through our IVR segments calculate the time that the IVR was speaking, and
         # whilst we're there remove any found entities (as they aren't relevant for BI)
         regenerate_entities = False
@@ -554,13 +592,143 @@ def handle_multiple_agents(agent_channel, call_start_time, ctr_json, pca_results
         return agent_index
 
 
+def set_ctr_file_suffixes():
+    """
+    Sets up the filename suffixes for the conversation and call CTR files from our configuration, either or
+    both of which may not be defined
+    """
+    global FILE_SUFFIX_CONVERSATION
+    global FILE_SUFFIX_CALL
+
+    suffixes = cf.appConfig[cf.CONF_TELEPHONY_CTR_SUFFIX]
+    if len(suffixes) > 0:
+        FILE_SUFFIX_CONVERSATION = cf.appConfig[cf.CONF_TELEPHONY_CTR_SUFFIX][0]
+        if len(suffixes) > 1:
+            FILE_SUFFIX_CALL = cf.appConfig[cf.CONF_TELEPHONY_CTR_SUFFIX][1]
+
+
+def merge_ctr_into_results(pca_results, conv_ctr_json, call_ctr_json):
+    """
+    Merges the data from a pair of Genesys CTR files into a set of PCA results - this covers the IVR lines,
+    splitting the agent channel if there was more than one agent, and adding the telephony header data
+
+    :param pca_results: PCA results to be updated
+    :param conv_ctr_json: Conversation CTR file data
+    :param call_ctr_json: Call CTR file data, which may be empty
+    """
+    pca_analytics = pca_results.get_conv_analytics()
+
+    # Pick out the official call start time from the call metadata, and get the timestamp too.
+    # Then get the call start time for the conversation as a whole
+    pca_analytics.conversationTime = calculate_start_time(call_ctr_json, conv_ctr=False)
+    call_start_time = datetime.strptime(pca_analytics.conversationTime, "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    conv_start_time = datetime.strptime(calculate_start_time(conv_ctr_json), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    conv_stat_time_offset = call_start_time - conv_start_time
+
+    # Get the speaker channel for the AGENT, as that's where the IVR will be
+    # If we can't find the agent channel then we can't do much more here
+    agent_channel = get_speaker_channel(pca_results.analytics.speaker_labels, AGENT_CHANNEL_LC_NAME)
+    if agent_channel in pca_analytics.sentiment_trends:
+
+        # We need to override the display name for Agent sentiment, as it will show the name of the agent
+        # assigned to the agent channel, and we may have multiple agents.  Hence, override it.
+        # pca_analytics.sentiment_trends[agent_channel]["NameOverride"] = pca_analytics.speaker_labels
+        channel_index = int(agent_channel.split("_")[1])
+        pca_analytics.sentiment_trends[agent_channel]["NameOverride"] = \
+            cf.appConfig[cf.CONF_SPEAKER_NAMES][channel_index]
+
+        # Extract all the IVR lines and update the segments
+        extract_ivr_lines(agent_channel, call_start_time, conv_ctr_json, pca_analytics, pca_results)
+
+        # Split up our single agent tag to multiple tags if there is more than one agent on the call
+        unique_agents = handle_multiple_agents(agent_channel, call_start_time, conv_ctr_json, pca_results,
+                                               conv_stat_time_offset)
+
+        # Now that we potentially have multiple agents we should update the result header's
+        # AGENTID field to show the agent that had the most interactions on the call
+        if unique_agents != None and unique_agents > 0:
+            # Create a list of speaker identifiers that are not Agent channels
+            filtered_speakers = [IVR_CHANNEL_NAME, NON_TALK_LABEL,
+                                 get_speaker_channel(pca_analytics.speaker_labels, CUST_CHANNEL_LC_NAME)]
+
+            # Create a filtered list of speakers that are just Agents, then sort by speaking time
+            filtered_speaker_time = dict(filter(lambda x: (x[0] not in filtered_speakers),
+                                                pca_analytics.speaker_time.items()))
+            sorted_speakers = list(sorted(filtered_speaker_time.items(), key=lambda item: item[1]["TotalTimeSecs"],
+                                          reverse=True))
+
+            # Now loop through our speakers and add their display names to the AGENTS list field
+            for speaker in filtered_speaker_time:
+                speaker_details = list(filter(lambda x: (x["Speaker"] == speaker), pca_analytics.speaker_labels))
+                if speaker_details:
+                    pca_analytics.agent_list.append(speaker_details[0]["DisplayText"])
+
+                    # If this speaker was also the top-talker then put them in the AGENT field
+                    if speaker_details[0]["Speaker"] == sorted_speakers[0][0]:
+                        pca_analytics.agent = speaker_details[0]["DisplayText"]
+
+        # TODO Recalculate the various sentiment trends to cater for IVR and split segments
+
+        # Finally, write some of the CTR data back into the main results - note
+        # that some comes from the call metatdata file, some from the conversation
+        telephony = {"conversationStart": conv_ctr_json["conversationStart"],
+                     "originatingDirection": conv_ctr_json["originatingDirection"]}
+
+        # We may not hava a call-specific file, and some of this info comes from that file
+        # TODO Some of the call-file values could be inferred from the conversation file
+        if call_ctr_json:
+            telephony["id"] = call_ctr_json["id"]
+            telephony["conversationId"] = call_ctr_json["conversationId"]
+            telephony["startTime"] = call_ctr_json["startTime"]
+            telephony["endTime"] = call_ctr_json["endTime"]
+
+        # Extract unique queueId values
+        queue_ids = []
+        for participant in conv_ctr_json["participants"]:
+            for session in participant["sessions"]:
+                # TODO Could pick out ani and dnis values here
+                for segment in session["segments"]:
+                    if "queueId" in segment:
+                        if segment["queueId"] not in queue_ids:
+                            queue_ids.append(segment["queueId"])
+        telephony["queueIds"] = queue_ids
+
+        # Write this all into the Analytics header
+        pca_analytics.telephony = {
+            "Genesys": telephony
+        }
+
+    else:
+        print("No AGENT channel defined or present in transcription output")
+
+    # Now ensure that the Customer ID is set if it is defined in the CTR
+    customer_id = set_customer_id(pca_analytics.speaker_labels, conv_ctr_json)
+    if customer_id:
+        pca_analytics.cust = customer_id
+
+
+def merge_ctr_files(event, pca_results):
+    """
+    Loads in any CTR files for the call and merges them into a set of PCA results that are already in memory,
+    which is how the fused processing mode runs this step without using the interim results file
+
+    :param event: Step Functions event data
+    :param pca_results: PCA results to be updated
+    """
+    global OFFLINE_MODE
+    OFFLINE_MODE = False
+
+    set_ctr_file_suffixes()
+    conv_ctr_json, call_ctr_json = load_ctr_files(event["key"])
+    if conv_ctr_json:
+        merge_ctr_into_results(pca_results, conv_ctr_json, call_ctr_json)
+
+
 def lambda_handler(event, context):
     """
     Lambda function entrypoint
     """
     global OFFLINE_MODE
-    global FILE_SUFFIX_CONVERSATION
-    global FILE_SUFFIX_CALL
 
     # Setup some offline data
     OFFLINE_MODE = "offline" in event
@@ -574,14 +742,10 @@ def lambda_handler(event, context):
 
     # Load our configuration data
     if not OFFLINE_MODE:
-        cf.loadConfiguration()
+        cf.loadEventConfiguration(event)
 
     # Extract out the call suffix filenames, which may or may not exist
-    suffixes = cf.appConfig[cf.CONF_TELEPHONY_CTR_SUFFIX]
-    if len(suffixes) > 0:
-        FILE_SUFFIX_CONVERSATION = cf.appConfig[cf.CONF_TELEPHONY_CTR_SUFFIX][0]
-        if len(suffixes) > 1:
-            FILE_SUFFIX_CALL = cf.appConfig[cf.CONF_TELEPHONY_CTR_SUFFIX][1]
+    set_ctr_file_suffixes()
 
     # Load in any associated CTR files
     conv_ctr_json, call_ctr_json = load_ctr_files(event["key"])
@@ -590,97 +754,11 @@ def lambda_handler(event, context):
     if conv_ctr_json:
         # Load in our existing interim CCA results
         pca_results = pcaresults.PCAResults()
-        pca_analytics = pca_results.get_conv_analytics()
         pca_results.read_results_from_s3(cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], event["interimResultsFile"],
                                          offline=OFFLINE_MODE)
 
-        # Pick out the official call start time from the call metadata, and get the timestamp too.
-        # Then get the call start time for the conversation as a whole
-        pca_analytics.conversationTime = calculate_start_time(call_ctr_json, conv_ctr=False)
-        call_start_time = datetime.strptime(pca_analytics.conversationTime, "%Y-%m-%d %H:%M:%S.%f").timestamp()
-        conv_start_time = datetime.strptime(calculate_start_time(conv_ctr_json), "%Y-%m-%d %H:%M:%S.%f").timestamp()
-        conv_stat_time_offset = call_start_time - conv_start_time
-
-        # Get the speaker channel for the AGENT, as that's where the IVR will be
-        # If we can't find the agent channel then we can't do much more here
-        agent_channel = get_speaker_channel(pca_results.analytics.speaker_labels, AGENT_CHANNEL_LC_NAME)
-        if agent_channel in pca_analytics.sentiment_trends:
-
-            # We need to override the display name for Agent sentiment, as it will show the name of the agent
-            # assigned to the agent channel, and we may have multiple agents.  Hence, override it.
-            # pca_analytics.sentiment_trends[agent_channel]["NameOverride"] = pca_analytics.speaker_labels
-            channel_index = int(agent_channel.split("_")[1])
-            pca_analytics.sentiment_trends[agent_channel]["NameOverride"] = \
-                cf.appConfig[cf.CONF_SPEAKER_NAMES][channel_index]
-
-            # Extract all the IVR lines and update the segments
-            extract_ivr_lines(agent_channel, call_start_time, conv_ctr_json, pca_analytics, pca_results)
-
-            # Split up our single agent tag to multiple tags if there is more than one agent on the call
-            unique_agents = handle_multiple_agents(agent_channel, call_start_time, conv_ctr_json, pca_results,
-                                                   conv_stat_time_offset)
-
-            # Now that we potentially have multiple agents we should update the result header's
-            # AGENTID field to show the agent that had the most interactions on the call
-            if unique_agents != None and unique_agents > 0:
-                # Create a list of speaker identifiers that are not Agent channels
-                filtered_speakers = [IVR_CHANNEL_NAME, NON_TALK_LABEL,
-                                     get_speaker_channel(pca_analytics.speaker_labels, CUST_CHANNEL_LC_NAME)]
-
-                # Create a filtered list of speakers that are just Agents, then sort by speaking time
-                filtered_speaker_time = dict(filter(lambda x: (x[0] not in filtered_speakers),
-                                                    pca_analytics.speaker_time.items()))
-                sorted_speakers = list(sorted(filtered_speaker_time.items(), key=lambda item: item[1]["TotalTimeSecs"],
-                                              reverse=True))
-
-                # Now loop through our speakers and add their display names to the AGENTS list field
-                for speaker in filtered_speaker_time:
-                    speaker_details = list(filter(lambda x: (x["Speaker"] == speaker), pca_analytics.speaker_labels))
-                    if speaker_details:
-                        pca_analytics.agent_list.append(speaker_details[0]["DisplayText"])
-
-                        # If this speaker was also the top-talker then put them in the AGENT field
-                        if speaker_details[0]["Speaker"] == sorted_speakers[0][0]:
-                            pca_analytics.agent = speaker_details[0]["DisplayText"]
-
-            # TODO Recalculate the various sentiment trends to cater for IVR and split segments
-
-            # Finally, write some of the CTR data back into the main results - note
-            # that some comes from the call metatdata file, some from the conversation
-            telephony = {"conversationStart": conv_ctr_json["conversationStart"],
-                         "originatingDirection": conv_ctr_json["originatingDirection"]}
-
-            # We may not hava a call-specific file, and some of this info comes from that file
-            # TODO Some of the call-file values could be inferred from the conversation file
-            if call_ctr_json:
-                telephony["id"] = call_ctr_json["id"]
-                telephony["conversationId"] = call_ctr_json["conversationId"]
-                telephony["startTime"] = call_ctr_json["startTime"]
-                telephony["endTime"] = call_ctr_json["endTime"]
-
-            # Extract unique queueId values
-            queue_ids = []
-            for participant in conv_ctr_json["participants"]:
-                for session in participant["sessions"]:
-                    # TODO Could pick out ani and dnis values here
-                    for segment in session["segments"]:
-                        if "queueId" in segment:
-                            if segment["queueId"] not in queue_ids:
-                                queue_ids.append(segment["queueId"])
-            telephony["queueIds"] = queue_ids
-
-            # Write this all into the Analytics header
-            pca_analytics.telephony = {
-                "Genesys": telephony
-            }
-
-        else:
-            print("No AGENT channel defined or present in transcription output")
-
-        # Now ensure that the Customer ID is set if it is defined in the CTR
-        customer_id = set_customer_id(pca_analytics.speaker_labels, conv_ctr_json)
-        if customer_id:
-            pca_analytics.cust = customer_id
+        # Merge the CTR data into the results
+        merge_ctr_into_results(pca_results, conv_ctr_json, call_ctr_json)
 
         # Finished all updates - write results back to our interim location
         if not OFFLINE_MODE:
@@ -711,13 +789,12 @@ if __name__ == "__main__":
 
     # If we're not offline then copy our copy of the interim results file
     if "offline" not in event:
-        s3_resource = boto3.resource("s3")
         src_key = "interimResults/copy-" + event["interimResultsFile"].split("/")[-1]
         copy_source = {
             'Bucket': "ak-cci-output",
             'Key': src_key
         }
-        s3_resource.meta.client.copy(copy_source, "ak-cci-output", event["interimResultsFile"])
+        pcacommon.get_s3_client().copy(copy_source, "ak-cci-output", event["interimResultsFile"])
     # But if we are offline then copy the copy that we have in /tmp
     else:
         command = "cp /tmp/copy-" + event["interimResultsFile"].split("/")[-1] + " /tmp/" + event["interimResultsFile"].split("/")[-1]
@@ -8,8 +8,8 @@ SPDX-License-Identifier: Apache-2.0
 """
 from pcaresults import PCAResults
 import pcaconfiguration as cf
+import pcacommon
 import copy
-import boto3
 
 
 def populate_job_info(transcribe_info, job_info, api_mode, lang_code):
@@ -94,7 +94,7 @@ def load_transcribe_job_header(event):
     :return: PCAResults() structure that just contains the Transcribe job info
     """
     # Load in the Amazon Transcribe job header information, ensuring that the job has completed
-    transcribe_client = boto3.client("transcribe")
+    transcribe_client = pcacommon.get_client("transcribe")
     api_mode = event["apiMode"]
     job_name = event["jobName"]
     try:
@@ -150,7 +150,7 @@ def lambda_handler(event, context):
     """
     # Load our configuration data
     sf_event = copy.deepcopy(event)
-    cf.loadConfiguration()
+    cf.loadEventConfiguration(sf_event)
     job_name = sf_event["jobName"]
 
     # We should only be here if the job has completed, so exit quickly if this isn't the case
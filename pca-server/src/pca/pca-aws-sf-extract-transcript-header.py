@@ -12,7 +12,6 @@ from datetime import datetime
 from pathlib import Path
 import pcaconfiguration as cf
 import pcacommon
-import boto3
 import json
 import time
 import copy
@@ -34,7 +33,7 @@ def load_transcript_file(transcript_bucket, transcript_path):
 
     # Now download - this has been known to get a "404 HeadObject Not Found",
     # which makes no sense, so if that happens then re-try in a sec.  Only once.
-    s3Client = boto3.client('s3')
+    s3Client = pcacommon.get_s3_client()
     try:
         s3Client.download_file(transcript_bucket, transcript_path, json_filepath)
     except:
@@ -66,7 +65,7 @@ def update_audio_file_metadata(sf_event, interim_results):
     # Now download and process that audio file
     try:
         # Download
-        s3Client = boto3.client('s3')
+        s3Client = pcacommon.get_s3_client()
         s3Client.download_file(cf.appConfig[cf.CONF_S3BUCKET_INPUT], input_filename, output_filename)
 
         # Extract some stream-based metadata from the audio file
@@ -168,10 +167,10 @@ def copy_transcript_file(sf_event):
     :param sf_event: Step Functions event
     """
     # Now copy the transcript file to the output folder (where the others all live)
-    s3_client = boto3.resource("s3")
+    s3_client = pcacommon.get_s3_client()
     source = {"Bucket": cf.appConfig[cf.CONF_S3BUCKET_INPUT], "Key": sf_event["key"]}
     dest_key = cf.appConfig[cf.CONF_PREFIX_TRANSCRIBE_RESULTS] + "/liveStreaming/" + sf_event["key"].split('/')[-1]
-    s3_client.meta.client.copy(source, cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], dest_key)
+    s3_client.copy(source, cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], dest_key)
     sf_event["transcriptUri"] = "s3://" + cf.appConfig[cf.CONF_S3BUCKET_OUTPUT] + "/" + dest_key
 
 
@@ -185,7 +184,7 @@ def lambda_handler(event, context):
     """
     # Load our configuration data
     sf_event = copy.deepcopy(event)
-    cf.loadConfiguration()
+    cf.loadEventConfiguration(sf_event)
 
     # Load up our transcript file and create our baseline data
     asr_output = load_transcript_file(sf_event["bucket"], sf_event["key"])
@@ -0,0 +1,132 @@
+"""
+This python function is part of the main processing workflow.  It runs all of the post-Transcribe processing
+steps - header extraction, turn-by-turn processing, telephony CTR handling, post-CTR processing and summarization -
+in a single Lambda invocation.  The results are passed between the steps in memory and are only written to S3 once,
+straight to the final results location, rather than each step reading and re-writing the interim results file.
+
+The separate step-per-Lambda workflow is still used unless the Step Functions input has "fusedProcessing" set to
+"true", and each step here calls the same code as its stand-alone Lambda function.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import copy
+import importlib
+import pcaconfiguration as cf
+import pcacommon
+import pcaresults
+
+# The step modules have hyphenated names, so they can't be imported with a normal import statement
+extract_job_header = importlib.import_module("pca-aws-sf-extract-job-header")
+extract_transcript_header = importlib.import_module("pca-aws-sf-extract-transcript-header")
+process_turn_by_turn = importlib.import_module("pca-aws-sf-process-turn-by-turn")
+ctr_genesys = importlib.import_module("pca-aws-sf-ctr-genesys")
+post_ctr_processing = importlib.import_module("pca-aws-sf-post-ctr-processing")
+fetch_transcript = importlib.import_module("pca-aws-fetch-transcript")
+
+
+def extract_header(sf_event):
+    """
+    Creates the header results for the call, either from the Transcribe job or from a transcript file, exactly
+    as the ProcessJobHeader and ProcessTranscriptHeader steps do, but without writing them to S3
+
+    :param sf_event: Step Functions event data
+    :return: PCAResults() structure that just contains the header
+    :return: Filename to use for the results file
+    """
+    if sf_event["inputType"] == "audio":
+        job_name = sf_event["jobName"]
+        assert sf_event["transcribeStatus"] == "COMPLETED", f"Transcription job '{job_name}' has not yet completed."
+        pca_results = extract_job_header.load_transcribe_job_header(sf_event)
+        results_filename = sf_event["transcriptUri"].split("/")[-1]
+    else:
+        asr_output = extract_transcript_header.load_transcript_file(sf_event["bucket"], sf_event["key"])
+        pca_results = extract_transcript_header.create_transcribe_job_header(sf_event, asr_output)
+        results_filename = sf_event["key"].split("/")[-1]
+
+    return pca_results, results_filename
+
+
+def summarize_call(sf_event, pca_results):
+    """
+    Summarizes the call, as the ProcessSummarize step does.  The transcript is generated here rather than by
+    the fetch transcript Lambda, but a custom summarizer Lambda reads the interim results file for itself, so in
+    that case we have to write it out first
+
+    :param sf_event: Step Functions event data
+    :param pca_results: PCA results to be summarized
+    """
+    # The summarizer is only loaded if we need it, as it isn't used by most calls
+    summarize = importlib.import_module("pca-aws-sf-summarize")
+    results_bucket = cf.appConfig[cf.CONF_S3BUCKET_OUTPUT]
+    interim_results_file = sf_event["interimResultsFile"]
+
+    if summarize.SUMMARIZE_TYPE == "LAMBDA":
+        pca_results.write_results_to_s3(bucket=results_bucket, object_key=interim_results_file)
+        summarize.summarize_results(pca_results, interim_results_file, transcript_str="")
+        if "debug" not in sf_event:
+            pcacommon.get_s3_client().delete_object(Bucket=results_bucket, Key=interim_results_file)
+    else:
+        transcript_str = fetch_transcript.create_transcript_string(pca_results, summarize.TOKEN_COUNT, True)
+        summarize.summarize_results(pca_results, interim_results_file, transcript_str=transcript_str)
+
+
+def lambda_handler(event, context):
+    """
+    Lambda function entrypoint
+    """
+    # Load our configuration data
+    sf_event = copy.deepcopy(event)
+    cf.loadEventConfiguration(sf_event)
+    results_bucket = cf.appConfig[cf.CONF_S3BUCKET_OUTPUT]
+
+    # Create our header results - the interim results filename is still set, as some steps use it for naming,
+    # but nothing is written there unless a custom summarizer needs it
+    pca_results, results_filename = extract_header(sf_event)
+    sf_event["interimResultsFile"] = pcaresults.INTERIM_RESULTS_KEY + "/" + results_filename
+
+    # Create the turn-by-turn results, and add the requested telephony CTR type
+    transcribe_parser = process_turn_by_turn.TranscribeParser(cf.appConfig[cf.CONF_MINPOSITIVE],
+                                                              cf.appConfig[cf.CONF_MINNEGATIVE],
+                                                              cf.appConfig[cf.CONF_ENTITYENDPOINT])
+    transcribe_parser.parse_transcribe_file(sf_event, pca_results)
+    sf_event["telephony"] = cf.appConfig[cf.CONF_TELEPHONY_CTR]
+
+    # Handle any telephony CTR files, then do any post-CTR processing
+    if sf_event["telephony"] == "genesys":
+        ctr_genesys.merge_ctr_files(sf_event, pca_results)
+    post_ctr_processing.process_results(pca_results)
+
+    # Summarize the call if we've been asked to
+    if sf_event.get("summarize", "false") == "true":
+        summarize_call(sf_event, pca_results)
+
+    # Finally, write the results straight to the final results location, along with any header sidecar
+    dest_key = cf.appConfig[cf.CONF_PREFIX_PARSED_RESULTS] + "/" + results_filename
+    pca_results.write_results_to_s3(bucket=results_bucket, object_key=dest_key,
+                                    compression=pcaresults.RESULTS_FINAL_COMPRESSION,
+                                    header_sidecar=pcaresults.RESULTS_HEADER_SIDECAR)
+
+    return sf_event
+
+
+# Main entrypoint for testing
+if __name__ == "__main__":
+    # Test event
+    test_event_analytics = {
+        "bucket": "ak-cci-input",
+        "key": "originalAudio/Card2_GUID_102_AGENT_AndrewK_DT_2022-03-22T12-23-49.wav",
+        "inputType": "audio",
+        "jobName": "Card2_GUID_102_AGENT_AndrewK_DT_2022-03-22T12-23-49.wav",
+        "apiMode": "analytics",
+        "transcribeStatus": "COMPLETED",
+        "fusedProcessing": "true"
+    }
+    test_stream_tca = {
+        "bucket": "ak-cci-input",
+        "key": "originalTranscripts/TCA_GUID_3c7161f7-bebc-4951-9cfb-943af1d3a5f5_CUST_17034816544_AGENT_BabuS_2022-11-22T21-32-52.145Z.json",
+        "inputType": "transcript",
+        "fusedProcessing": "true"
+    }
+    lambda_handler(test_event_analytics, "")
+    lambda_handler(test_stream_tca, "")
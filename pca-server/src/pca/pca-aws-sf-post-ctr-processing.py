@@ -10,19 +10,29 @@ import pcaconfiguration as cf
 import pcaresults
 
 
+def process_results(pca_results):
+    """
+    Performs any post-CTR processing on the results, which is shared by this step and the fused processing mode
+
+    :param pca_results: PCA results to be updated
+    """
+    # --------- Do any post processing here ----------
+    pass
+
+
 def lambda_handler(event, context):
     """
     Lambda function entrypoint
     """
 
     # Load our configuration data
-    cf.loadConfiguration()
+    cf.loadEventConfiguration(event)
 
     # Load in our existing interim CCA results
     pca_results = pcaresults.PCAResults()
     pca_results.read_results_from_s3(cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], event["interimResultsFile"])
 
-    # --------- Do any post processing here ----------
+    process_results(pca_results)
 
     # Write out back to interim file
     pca_results.write_results_to_s3(bucket=cf.appConfig[cf.CONF_S3BUCKET_OUTPUT],
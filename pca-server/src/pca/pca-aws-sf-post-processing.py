@@ -6,8 +6,9 @@ telephony-specific Contract Trace Record handling
 Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
-import boto3
 import pcaconfiguration as cf
+import pcacommon
+import pcaresults
 
 
 def lambda_handler(event, context):
@@ -16,22 +17,39 @@ def lambda_handler(event, context):
     """
 
     # Load our configuration data
-    cf.loadConfiguration()
+    cf.loadEventConfiguration(event)
     results_bucket = cf.appConfig[cf.CONF_S3BUCKET_OUTPUT]
 
-    # This function just has to move the interim results file to the full results file
-    s3_resource = boto3.resource("s3")
+    # This function just has to move the interim results file to the full results file, re-compressing
+    # it if the final results file needs a different compression to the interim one
     dest_key = cf.appConfig[cf.CONF_PREFIX_PARSED_RESULTS] + "/" + event["interimResultsFile"].split("/")[-1]
-    copy_source = {
-        'Bucket': results_bucket,
-        'Key': event["interimResultsFile"]
-    }
-    s3_resource.meta.client.copy(copy_source, results_bucket, dest_key)
 
-    # Then delete the interim file if we're not debugging
+    # If an earlier step left a header patch then it has to be merged in, so the results are read in and written
+    # back out - lazily, so that the speech segments go straight back out as they were read
+    header_patch = None
+    if pcaresults.RESULTS_DELTA_WRITES:
+        header_patch = pcaresults.read_header_patch_from_s3(results_bucket, event["interimResultsFile"])
+    if header_patch is not None:
+        pca_results = pcaresults.PCAResults()
+        pca_results.read_results_from_s3(results_bucket, event["interimResultsFile"], lazy=True)
+        pca_results.write_results_to_s3(bucket=results_bucket, object_key=dest_key,
+                                        compression=pcaresults.RESULTS_FINAL_COMPRESSION,
+                                        header_sidecar=pcaresults.RESULTS_HEADER_SIDECAR)
+    else:
+        # If enabled, write the header sidecar before the results file, as the results file triggers the UI indexer
+        if pcaresults.RESULTS_HEADER_SIDECAR:
+            pca_results = pcaresults.PCAResults()
+            pca_results.read_results_from_s3(results_bucket, event["interimResultsFile"], header_only=True)
+            pca_results.write_header_sidecar_to_s3(results_bucket, dest_key)
+
+        pcaresults.copy_results_in_s3(results_bucket, event["interimResultsFile"], results_bucket, dest_key)
+
+    # Then delete the interim file, and any header patch, if we're not debugging
     if "debug" not in event:
-        s3_client = boto3.client("s3")
+        s3_client = pcacommon.get_s3_client()
         s3_client.delete_object(Bucket=results_bucket, Key=event["interimResultsFile"])
+        if header_patch is not None:
+            pcaresults.delete_header_patch_from_s3(results_bucket, event["interimResultsFile"])
 
     return event
 
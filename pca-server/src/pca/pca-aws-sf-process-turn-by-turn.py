@@ -9,22 +9,29 @@ from pathlib import Path
 from datetime import datetime
 from urllib.parse import urlparse
 from math import floor
-from pcakendrasearch import prepare_transcript, put_kendra_document
 from pcaresults import SpeechSegment, PCAResults
+from pcatimeline import TimelineIndex
 import pcaconfiguration as cf
 import pcacommon
+import pcaentitymatcher
+import pcajsonstream
+import pcanlp
+import pcanlpcache
 import subprocess
 import copy
+import heapq
+import itertools
+import os
 import re
 import json
 import csv
-import boto3
+import io
 import time
 
-# Sentiment helpers
-MIN_SENTIMENT_LENGTH = 8
-NLP_THROTTLE_RETRIES = 1
-COMPREHEND_SENTIMENT_SCALER = 5.0
+# Comprehend batch API helpers - batch mode can be switched off via the environment
+COMPREHEND_BATCH_MODE = os.getenv("COMPREHEND_BATCH_MODE", "true").lower() == "true"
+COMPREHEND_BATCH_SIZE = 25
+COMPREHEND_BATCH_MAX_BYTES = 5000
 
 # Other Markers and helpers
 PII_PLACEHOLDER = "[PII]"
@@ -32,6 +39,24 @@ PII_PLACEHOLDER_MASK = "*" * len(PII_PLACEHOLDER)
 TMP_DIR = "/tmp"
 BAR_CHART_WIDTH = 1.0
 
+# Arrays in the Transcribe results that hold the transcript itself.  The results are streamed from S3, and these
+# arrays are read one element at a time so that the whole file is never in memory - this can be switched off via
+# the environment, in which case the results file is downloaded and loaded in one go
+TRANSCRIPT_STREAMING = os.getenv("TRANSCRIPT_STREAMING", "true").lower() == "true"
+TRANSCRIBE_ITEMS_PATH = ("results", "items")
+TRANSCRIBE_SEGMENTS_PATH = ("results", "speaker_labels", "segments")
+TRANSCRIBE_CHANNELS_PATH = ("results", "channel_labels", "channels")
+TRANSCRIBE_CHANNEL_ITEMS_PATH = TRANSCRIBE_CHANNELS_PATH + (pcajsonstream.ANY_ELEMENT, "items")
+ANALYTICS_TURNS_PATH = ("Transcript",)
+TRANSCRIPT_ARRAY_PATHS = [TRANSCRIBE_ITEMS_PATH, TRANSCRIBE_SEGMENTS_PATH, TRANSCRIBE_CHANNELS_PATH,
+                          TRANSCRIBE_CHANNEL_ITEMS_PATH, ANALYTICS_TURNS_PATH]
+
+# Warm-container caches for custom entity endpoint discovery and compiled entity maps, which are re-validated
+# once they are older than the TTL - endpoints via Comprehend, and entity maps via an S3 conditional GET
+ENTITY_CACHE_TTL_SECS = int(os.getenv("ENTITY_CACHE_TTL_SECS", "300"))
+endpoint_arn_cache = {}
+entity_map_cache = {}
+
 
 class TranscribeParser:
 
@@ -51,48 +76,67 @@ class TranscribeParser:
         self.customEntityEndpointARN = ""
         self.simpleEntityMap = {}
         self.matchedSimpleEntities = {}
+        self.simpleEntityMatcher = None
         self.audioPlaybackUri = ""
         self.transcript_uri = ""
         self.api_mode = cf.API_STANDARD
         self.analytics_channel_map = {}
         self.asr_output = ""
-
-        cf.loadConfiguration()
+        self.asr_stream = None
 
         # Check the model exists - if now we may use simple file entity detection instead
         if self.customEntityEndpointName != "":
-            # Get the ARN for our classifier endpoint, getting out quickly if there
-            # isn't one defined or if we can't find the one that is defined
-            comprehendClient = boto3.client("comprehend")
-            recognizerList = comprehendClient.list_endpoints()
-            recognizer = list(filter(lambda x: x["EndpointArn"].endswith(self.customEntityEndpointName),
-                                     recognizerList["EndpointPropertiesList"]))
-
-            # Only use it if it exists (!) and is IN_SERVICE
-            if (recognizer == []) or (recognizer[0]["Status"] != "IN_SERVICE"):
+            self.customEntityEndpointARN = self.get_custom_entity_endpoint_arn(self.customEntityEndpointName)
+            if self.customEntityEndpointARN == "":
                 # Doesn't exist, so ignore the config
                 self.customEntityEndpointName = ""
-            else:
-                self.customEntityEndpointARN = recognizer[0]["EndpointArn"]
 
         # Set flag to say if we could do simple entities
         self.simpleEntityMatchingUsed = (self.customEntityEndpointARN == "") and \
                                         (cf.appConfig[cf.CONF_ENTITY_FILE] != "")
 
+    def get_custom_entity_endpoint_arn(self, endpoint_name):
+        """
+        Gets the ARN for our custom entity classifier endpoint, which is only returned if the endpoint exists and is
+        IN_SERVICE.  The result, even if there is no usable endpoint, is cached for the container for the cache TTL
+
+        :param endpoint_name: Name of the custom entity endpoint
+        :return: ARN of the endpoint, or an empty string if it cannot be used
+        """
+        cached_entry = endpoint_arn_cache.get(endpoint_name)
+        if (cached_entry is not None) and (time.time() - cached_entry["CheckedAt"] < ENTITY_CACHE_TTL_SECS):
+            return cached_entry["EndpointArn"]
+
+        # Look for our endpoint in the list of Comprehend endpoints
+        comprehendClient = pcacommon.get_client("comprehend")
+        recognizerList = comprehendClient.list_endpoints()
+        recognizer = list(filter(lambda x: x["EndpointArn"].endswith(endpoint_name),
+                                 recognizerList["EndpointPropertiesList"]))
+
+        # Only use it if it exists (!) and is IN_SERVICE
+        if (recognizer == []) or (recognizer[0]["Status"] != "IN_SERVICE"):
+            endpoint_arn = ""
+        else:
+            endpoint_arn = recognizer[0]["EndpointArn"]
+        endpoint_arn_cache[endpoint_name] = {"EndpointArn": endpoint_arn, "CheckedAt": time.time()}
+
+        return endpoint_arn
+
     def process_tca_summary(self):
         if self.api_mode == cf.API_ANALYTICS and \
            self.asr_output["ConversationCharacteristics"] and \
            "ContactSummary" in self.asr_output["ConversationCharacteristics"]:
             self.analytics.contact_summary = self.asr_output["ConversationCharacteristics"]["ContactSummary"]
 
-    def generate_sentiment_trend(self, speaker, speaker_num):
+    def generate_sentiment_trend(self, speaker, speaker_num, speaker_totals):
         """
         Generates an entry for the "SentimentTrends" block for the given speaker, which is the overall speaker
         sentiment score and trend over the call.  For Call Analytics calls we also store the per-quarter sentiment
-        data provided by Transcribe
+        data provided by Transcribe, otherwise we use the speaker's totals from aggregate_speaker_segments
 
         @param speaker: Internal name for the speaker (e.g. spk_1)
         @param speaker_num: Channel number for the speaker (only relevant for Call Analytics)
+        @param speaker_totals: Per-speaker totals from the speech segments (not used for Call Analytics)
         @return:
         """
 
@@ -139,51 +183,14 @@ class TranscribeParser:
                     quarter_scores.append(quarter_block)
                 speaker_trend["SentimentPerQuarter"] = quarter_scores
         else:
-            # Speaker scores / trends using aggregated data from Comprehend
-            # Start by initialising data structures for the sentiment total and change
-            speakerTurns = 0
-            sumSentiment = 0.0
-
-            # Initialise data for the per-quarter scores
-            quarter_scores = []
-            for quarter in range(1,5):
-                quarter_block = {
-                    "Quarter": quarter,
-                    "Score": 0.0,
-                    "BeginOffsetSecs": 0.0,
-                    "EndOffsetSecs": 0.0,
-                    "datapoints": 0
-                }
-                quarter_scores.append(quarter_block)
+            # Speaker scores / trends using aggregated data from Comprehend, which
+            # is empty if this speaker never actually had a turn in the call
+            speaker_data = speaker_totals.get(speaker)
+            if speaker_data is None:
+                speaker_data = self.create_speaker_totals()
+            quarter_scores = speaker_data["QuarterScores"]
             speaker_trend["SentimentPerQuarter"] = quarter_scores
 
-            # Loop through each speech segment for this speaker
-            for segment in self.speechSegmentList:
-                if segment.segmentSpeaker == speaker:
-                    # Increment our counter for number of speaker turns and work out our call quarter offset,
-                    # and we decide which quarter a segment is in by where middle of the segment lies
-                    speakerTurns += 1
-                    segment_midpoint = segment.segmentStartTime + \
-                                       (segment.segmentEndTime - segment.segmentStartTime) / 2
-                    quarter_offset = min(floor((segment_midpoint * 4) / self.analytics.duration), 3)
-
-                    # Update some quarter-based values that are separate from sentiment
-                    quarter_scores[quarter_offset]["datapoints"] += 1
-                    if quarter_scores[quarter_offset]["BeginOffsetSecs"] == 0.0:
-                        quarter_scores[quarter_offset]["BeginOffsetSecs"] = segment.segmentStartTime
-                    quarter_scores[quarter_offset]["EndOffsetSecs"] = segment.segmentEndTime
-
-                    # Only really interested in Positive/Negative turns for the sentiment scores
-                    if segment.segmentIsPositive or segment.segmentIsNegative:
-                        # Calculate score and add it to (-ve) or subtract it from (-ve) our total
-                        turn_score = segment.segmentSentimentScore
-                        if segment.segmentIsNegative:
-                            turn_score *= -1
-                        sumSentiment += turn_score
-
-                        # Update our quarter tracker
-                        quarter_scores[quarter_offset]["Score"] += turn_score
-
             # Create the average score per quarter, and drop the datapoints field (as it's o longer needed)
             for quarter in quarter_scores:
                 points = max(quarter["datapoints"], 1)
@@ -192,11 +199,75 @@ class TranscribeParser:
 
             # Log our trends for this speaker
             speaker_trend["SentimentChange"] = quarter_scores[-1]["Score"] - quarter_scores[0]["Score"]
-            speaker_trend["SentimentScore"] = sumSentiment / max(speakerTurns, 1)
+            speaker_trend["SentimentScore"] = speaker_data["SumSentiment"] / max(speaker_data["Turns"], 1)
             speaker_trend["SentimentPerQuarter"] = quarter_scores
 
         return speaker_trend
 
+    def create_speaker_totals(self):
+        """
+        Creates an empty block of per-speaker totals, as used by aggregate_speaker_segments
+
+        @return: Empty per-speaker totals
+        """
+        # Initialise data for the per-quarter scores
+        quarter_scores = []
+        for quarter in range(1, 5):
+            quarter_block = {
+                "Quarter": quarter,
+                "Score": 0.0,
+                "BeginOffsetSecs": 0.0,
+                "EndOffsetSecs": 0.0,
+                "datapoints": 0
+            }
+            quarter_scores.append(quarter_block)
+
+        return {"Turns": 0, "SumSentiment": 0.0, "QuarterScores": quarter_scores, "TalkTime": 0}
+
+    def aggregate_speaker_segments(self):
+        """
+        Makes a single pass through the speech segments and totals up, for every speaker, the values that are needed
+        for their sentiment trend and speaking time - the number of turns, the sentiment total, the per-quarter data
+        and the total talk time.  Everything is accumulated in segment order, so the totals are exactly the same as
+        they would be from a separate scan of the segments for each speaker
+
+        @return: Dictionary of speaker (e.g. spk_1) -> speaker totals
+        """
+        speaker_totals = {}
+        for segment in self.speechSegmentList:
+            speaker_data = speaker_totals.get(segment.segmentSpeaker)
+            if speaker_data is None:
+                speaker_data = self.create_speaker_totals()
+                speaker_totals[segment.segmentSpeaker] = speaker_data
+            quarter_scores = speaker_data["QuarterScores"]
+
+            # Increment our counter for number of speaker turns and work out our call quarter offset,
+            # and we decide which quarter a segment is in by where middle of the segment lies
+            speaker_data["Turns"] += 1
+            speaker_data["TalkTime"] += segment.segmentEndTime - segment.segmentStartTime
+            segment_midpoint = segment.segmentStartTime + \
+                               (segment.segmentEndTime - segment.segmentStartTime) / 2
+            quarter_offset = min(floor((segment_midpoint * 4) / self.analytics.duration), 3)
+
+            # Update some quarter-based values that are separate from sentiment
+            quarter_scores[quarter_offset]["datapoints"] += 1
+            if quarter_scores[quarter_offset]["BeginOffsetSecs"] == 0.0:
+                quarter_scores[quarter_offset]["BeginOffsetSecs"] = segment.segmentStartTime
+            quarter_scores[quarter_offset]["EndOffsetSecs"] = segment.segmentEndTime
+
+            # Only really interested in Positive/Negative turns for the sentiment scores
+            if segment.segmentIsPositive or segment.segmentIsNegative:
+                # Calculate score and add it to (-ve) or subtract it from (-ve) our total
+                turn_score = segment.segmentSentimentScore
+                if segment.segmentIsNegative:
+                    turn_score *= -1
+                speaker_data["SumSentiment"] += turn_score
+
+                # Update our quarter tracker
+                quarter_scores[quarter_offset]["Score"] += turn_score
+
+        return speaker_totals
+
     def push_turn_by_turn_results(self):
         '''
         Pushes the rest of our calculated data items into the PCA Results structures.  Some
@@ -208,10 +279,17 @@ class TranscribeParser:
         # Ensure our results have the speech segments recorded
         self.pca_results.speech_segments = self.speechSegmentList
 
+        # Total up everything we need from the speech segments in one pass - Call Analytics gives us these instead
+        if self.api_mode == cf.API_ANALYTICS:
+            speaker_totals = {}
+        else:
+            speaker_totals = self.aggregate_speaker_segments()
+
         # Sentiment Trends
         for speaker in range(self.maxSpeakerIndex + 1):
             full_name = self.pca_results.get_speaker_prefix(True) + str(speaker)
-            self.analytics.sentiment_trends[full_name] = self.generate_sentiment_trend(full_name, speaker)
+            self.analytics.sentiment_trends[full_name] = self.generate_sentiment_trend(full_name, speaker,
+                                                                                       speaker_totals)
 
         # Build up a list of speaker labels from the config; note that if we have more speakers
         # than configured then we still return something (clear first, as we're appending)
@@ -239,13 +317,11 @@ class TranscribeParser:
             self.analytics.categories_detected = self.analytics.extract_analytics_categories(self.asr_output["Categories"], self.speechSegmentList)
         # For non-analytics mode, we can simulate some analytics data
         elif self.api_mode == cf.API_STANDARD:
-            # Calculate the speaker time from the speech segments, once per speaker (can't do silent time like this)
+            # Take the speaker time from our speech segment totals (can't do silent time like this)
             speaker_time = {}
             for next_speaker in self.analytics.speaker_labels:
                 next_speaker_label = next_speaker["Speaker"]
-                next_speaker_time = sum(
-                    (segment.segmentEndTime - segment.segmentStartTime) for segment in self.speechSegmentList if
-                    segment.segmentSpeaker == next_speaker_label)
+                next_speaker_time = speaker_totals.get(next_speaker_label, {"TalkTime": 0})["TalkTime"]
                 speaker_time[next_speaker_label] = {"TotalTimeSecs": float(next_speaker_time)}
             self.analytics.speaker_time = speaker_time
 
@@ -296,10 +372,9 @@ class TranscribeParser:
             else:
                 # Same speaker, short time, need to copy this info to the last one
                 lastSegment.segmentEndTime = segment.segmentEndTime
-                lastSegment.segmentText += " " + segment.segmentText
-                segment.segmentConfidence[0]["Text"] = " " + segment.segmentConfidence[0]["Text"]
-                for wordConfidence in segment.segmentConfidence:
-                    lastSegment.segmentConfidence.append(wordConfidence)
+                lastSegment.append_segment_text(segment)
+                segment.segmentConfidence.texts[0] = " " + segment.segmentConfidence.texts[0]
+                lastSegment.segmentConfidence.extend(segment.segmentConfidence)
 
         return outputSegmentList
 
@@ -340,59 +415,7 @@ class TranscribeParser:
         for this conversation.  It is "best-match" as Comprehend can model in EN, but has no differentiation between
         EN-US and EN-GB.  If we cannot determine a language to use then we cannot use Comprehend standard models
         """
-
-        try:
-            for checkLangCode in cf.appConfig[cf.CONF_COMP_LANGS]:
-                if self.analytics.conversationLanguageCode.startswith(checkLangCode):
-                    self.comprehendLanguageCode = checkLangCode
-                    break
-        except:
-            # If anything fails - e.g. no language  string - then we have no language for Comprehend
-            self.comprehendLanguageCode = ""
-
-    def comprehend_single_sentiment(self, text, client):
-        """
-        Perform sentiment analysis, but try and avert throttling by trying one more time if this exceptions.
-        It is not a replacement for limit increases, but will help limit failures if usage suddenly grows
-        """
-        sentimentResponse = {}
-        counter = 0
-        while sentimentResponse == {}:
-            try:
-                # Get the sentiment, and strip off the MIXED response (as we won't be using it)
-                sentimentResponse = client.detect_sentiment(Text=text, LanguageCode=self.comprehendLanguageCode)
-                sentimentResponse["SentimentScore"].pop("Mixed", None)
-
-                # Now scale our remaining values
-                for sentiment_key in sentimentResponse["SentimentScore"]:
-                    sentimentResponse["SentimentScore"][sentiment_key] *= COMPREHEND_SENTIMENT_SCALER
-            except Exception as e:
-                if counter < NLP_THROTTLE_RETRIES:
-                    counter += 1
-                    time.sleep(3)
-                else:
-                    raise e
-
-        return sentimentResponse
-
-    def comprehend_single_entity(self, text, client):
-        """
-        Perform entity analysis, but try and avert throttling by trying one more time if this exceptions.
-        It is not a replacement for limit increases, but will help limit failures if usage suddenly grows
-        """
-        entityResponse = {}
-        counter = 0
-        while entityResponse == {}:
-            try:
-                entityResponse = client.detect_entities(Text=text, LanguageCode=self.comprehendLanguageCode)
-            except Exception as e:
-                if counter < NLP_THROTTLE_RETRIES:
-                    counter += 1
-                    time.sleep(3)
-                else:
-                    raise e
-
-        return entityResponse
+        self.comprehendLanguageCode = pcacommon.get_comprehend_language_code(self.analytics.conversationLanguageCode)
 
     def extract_analytics_speaker_time(self, conv_characteristics):
         """
@@ -433,86 +456,264 @@ class TranscribeParser:
 
         return speaker_time
 
+    def comprehend_batch_request(self, batch_api, text_list, executor):
+        """
+        Sends a list of texts to one of the Comprehend batch APIs in blocks of up to COMPREHEND_BATCH_SIZE texts,
+        with the blocks sent concurrently by the NLP executor.  Any text that is too large for a batch request,
+        or that Comprehend returns in the batch's error list, has no result returned, and the caller needs to
+        fall back to the single-text API for it
+
+        :param batch_api: Name of the boto3 Comprehend batch method (e.g. "batch_detect_sentiment")
+        :param text_list: Texts to be analysed
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of batch result entries, in input order, with None for any text without a result
+        """
+        results = [None] * len(text_list)
+
+        # Only texts under the per-document byte limit can go into a batch
+        batch_indexes = [index for index, text in enumerate(text_list)
+                         if len(text.encode("utf-8")) <= COMPREHEND_BATCH_MAX_BYTES]
+        block_index_list = [batch_indexes[block_start:block_start + COMPREHEND_BATCH_SIZE]
+                            for block_start in range(0, len(batch_indexes), COMPREHEND_BATCH_SIZE)]
+        batch_responses = executor.map(batch_api, [{"TextList": [text_list[index] for index in block_indexes],
+                                                     "LanguageCode": self.comprehendLanguageCode}
+                                                    for block_indexes in block_index_list])
+
+        # Map each result back to its position in the full text list - errored texts are left as None
+        for block_indexes, batch_response in zip(block_index_list, batch_responses):
+            for result in batch_response["ResultList"]:
+                results[block_indexes[result["Index"]]] = result
+            for error in batch_response["ErrorList"]:
+                print(f"Comprehend {batch_api} failed for a batched text ({error['ErrorCode']}), retrying singly")
+
+        return results
+
+    def fetch_sentiment(self, text_list, executor):
+        """
+        Gets the unscaled sentiment of a list of texts directly from Comprehend, bypassing the NLP result cache.
+        In batch mode the batch API is used, and any text without a batch result is sent to the single-text API
+
+        :param text_list: Texts to be examined for sentiment
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of sentiment responses, in the same order as the input texts
+        """
+        if COMPREHEND_BATCH_MODE:
+            responses = self.comprehend_batch_request("batch_detect_sentiment", text_list, executor)
+        else:
+            responses = [None] * len(text_list)
+
+        # Get anything that's left from the single-text API
+        single_indexes = [index for index, result in enumerate(responses) if result is None]
+        single_responses = pcanlp.fetch_sentiment([text_list[index] for index in single_indexes],
+                                                  self.comprehendLanguageCode, executor)
+        for index, sentimentResponse in zip(single_indexes, single_responses):
+            responses[index] = sentimentResponse
+
+        return [{"Sentiment": result["Sentiment"], "SentimentScore": result["SentimentScore"]}
+                for result in responses]
+
+    def fetch_entities(self, text_list, executor):
+        """
+        Gets the standard entities in a list of texts directly from Comprehend, bypassing the NLP result cache.
+        In batch mode the batch API is used, and any text without a batch result is sent to the single-text API
+
+        :param text_list: Texts to be examined for entities
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of entity responses, in the same order as the input texts
+        """
+        if COMPREHEND_BATCH_MODE:
+            responses = self.comprehend_batch_request("batch_detect_entities", text_list, executor)
+        else:
+            responses = [None] * len(text_list)
+
+        # Get anything that's left from the single-text API
+        single_indexes = [index for index, result in enumerate(responses) if result is None]
+        single_responses = executor.map("detect_entities", [{"Text": text_list[index],
+                                                             "LanguageCode": self.comprehendLanguageCode}
+                                                            for index in single_indexes])
+        for index, entityResponse in zip(single_indexes, single_responses):
+            responses[index] = entityResponse
+
+        return [{"Entities": result["Entities"]} for result in responses]
+
+    def fetch_custom_entities(self, text_list, executor):
+        """
+        Gets the entities in a list of texts directly from our custom entity endpoint, bypassing the
+        NLP result cache.  Custom endpoints have no batch API, so each text is a separate request
+
+        :param text_list: Texts to be examined for entities
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of entity responses, in the same order as the input texts
+        """
+        responses = executor.map("detect_entities", [{"Text": text, "EndpointArn": self.customEntityEndpointARN}
+                                                     for text in text_list])
+        return [{"Entities": result["Entities"]} for result in responses]
+
+    def comprehend_sentiment(self, text_list, executor):
+        """
+        Performs sentiment analysis on a list of texts, using the NLP result cache where possible.  Each response
+        matches that of pcanlp.comprehend_single_sentiment, so the MIXED score is dropped and the remaining
+        scores are scaled
+
+        :param text_list: Texts to be examined for sentiment
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of sentiment responses, in the same order as the input texts
+        """
+        responses = pcanlpcache.cached_lookup("detect_sentiment", text_list, self.comprehendLanguageCode, "",
+                                              lambda fetch_list: self.fetch_sentiment(fetch_list, executor))
+        return [pcanlp.scale_sentiment_response(response, pcanlp.COMPREHEND_SENTIMENT_SCALER) for response in responses]
+
+    def comprehend_entity(self, text_list, executor):
+        """
+        Performs standard entity detection on a list of texts, using the NLP result cache where possible
+
+        :param text_list: Texts to be examined for entities
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of entity responses, in the same order as the input texts
+        """
+        return pcanlpcache.cached_lookup("detect_entities", text_list, self.comprehendLanguageCode, "",
+                                         lambda fetch_list: self.fetch_entities(fetch_list, executor))
+
+    def comprehend_custom_entity(self, text_list, executor):
+        """
+        Performs entity detection on a list of texts against our custom entity endpoint,
+        using the NLP result cache where possible
+
+        :param text_list: Texts to be examined for entities
+        :param executor: NLP executor used to make the Comprehend requests
+        :return: List of entity responses, in the same order as the input texts
+        """
+        return pcanlpcache.cached_lookup("detect_entities", text_list, self.comprehendLanguageCode,
+                                         self.customEntityEndpointARN,
+                                         lambda fetch_list: self.fetch_custom_entities(fetch_list, executor))
+
     def extract_nlp(self, segment_list):
         """
         Generates sentiment per speech segment, inserting the results into the input list.
         If we had no valid language for Comprehend to use then we use Neutral for everything.
         It also extracts standard LOCATION entities, and calls any custom entity recognition
-        model that has been configured for that language
+        model that has been configured for that language.  All of the Comprehend requests are
+        made up-front by the NLP executor, concurrently and rate-limited, before the results are applied,
+        and any utterance that has been seen before is taken from the NLP result cache instead
         """
-        client = boto3.client("comprehend")
-
         # Setup some sentiment blocks - used when we have no Comprehend
         # language or where we need "something" for Call Analytics
         sentiment_set_neutral = {'Positive': 0.0, 'Negative': 0.0, 'Neutral': 1.0}
         sentiment_set_positive = {'Positive': 1.0, 'Negative': 0.0, 'Neutral': 0.0}
         sentiment_set_negative = {'Positive': 0.0, 'Negative': 1.0, 'Neutral': 0.0}
 
+        # Work out which segments need which Comprehend calls
+        nlp_segments = [segment for segment in segment_list if len(segment.segmentText) >= pcanlp.MIN_SENTIMENT_LENGTH]
+        use_comprehend = (self.comprehendLanguageCode != "")
+        need_comprehend_sentiment = use_comprehend and (self.api_mode != cf.API_ANALYTICS)
+        need_custom_entities = use_comprehend and (self.customEntityEndpointARN != "") and \
+            (self.comprehendLanguageCode == "en")
+        pii_masked_texts = [segment.segmentText.replace(PII_PLACEHOLDER, PII_PLACEHOLDER_MASK)
+                            for segment in nlp_segments]
+
+        # Get all of the Comprehend results that we need.  At the time of writing, Custom Entity
+        # models in Comprehend are ENGLISH ONLY, and endpoints have no batch API
+        sentiment_responses = None
+        entity_responses = None
+        custom_entity_responses = None
+        if use_comprehend:
+            executor = pcanlp.NLPExecutor()
+            if need_comprehend_sentiment:
+                sentiment_responses = self.comprehend_sentiment([segment.segmentText for segment in nlp_segments],
+                                                                executor)
+            entity_responses = self.comprehend_entity(pii_masked_texts, executor)
+            if need_custom_entities:
+                custom_entity_responses = self.comprehend_custom_entity(pii_masked_texts, executor)
+            executor.report()
+            if pcanlpcache.get_nlp_cache() is not None:
+                pcanlpcache.get_nlp_cache().report()
+
         # Go through each of our segments
-        for next_segment in segment_list:
-            if len(next_segment.segmentText) >= MIN_SENTIMENT_LENGTH:
-                nextText = next_segment.segmentText
-
-                # First, set the sentiment scores in the transcript.  In Call Analytics mode
-                # we already have a sentiment marker (+ve/-ve) per turn of the transcript
-                if self.api_mode == cf.API_ANALYTICS:
-                    # Just set some fake scores against the line to match the sentiment type
-                    if next_segment.segmentIsPositive:
-                        next_segment.segmentAllSentiments = sentiment_set_positive
-                    elif next_segment.segmentIsNegative:
-                        next_segment.segmentAllSentiments = sentiment_set_negative
-                    else:
-                        next_segment.segmentAllSentiments = sentiment_set_neutral
-                # Standard Transcribe requires us to use Comprehend
+        for segment_index, next_segment in enumerate(nlp_segments):
+            # First, set the sentiment scores in the transcript.  In Call Analytics mode
+            # we already have a sentiment marker (+ve/-ve) per turn of the transcript
+            if self.api_mode == cf.API_ANALYTICS:
+                # Just set some fake scores against the line to match the sentiment type
+                if next_segment.segmentIsPositive:
+                    next_segment.segmentAllSentiments = sentiment_set_positive
+                elif next_segment.segmentIsNegative:
+                    next_segment.segmentAllSentiments = sentiment_set_negative
                 else:
-                    # We can only use Comprehend if we have a language code
-                    if self.comprehendLanguageCode == "":
-                        # We had no language - use default neutral sentiment scores
-                        next_segment.segmentAllSentiments = sentiment_set_neutral
-                        next_segment.segmentIsPositive = False
-                        next_segment.segmentIsNegative = False
-                    else:
-                        # For Standard Transcribe we need to set the sentiment marker based on score thresholds
-                        sentimentResponse = self.comprehend_single_sentiment(nextText, client)
-                        positiveBase = sentimentResponse["SentimentScore"]["Positive"]
-                        negativeBase = sentimentResponse["SentimentScore"]["Negative"]
-
-                        # If we're over the NEGATIVE threshold then we're negative
-                        if negativeBase >= self.min_sentiment_negative:
-                            next_segment.segmentSentiment = "Negative"
-                            next_segment.segmentIsNegative = True
-                            next_segment.segmentSentimentScore = negativeBase
-                        # Else if we're over the POSITIVE threshold then we're positive,
-                        # otherwise we're NEUTRAL and we don't really care
-                        elif positiveBase >= self.min_sentiment_positive:
-                            next_segment.segmentSentiment = "Positive"
-                            next_segment.segmentIsPositive = True
-                            next_segment.segmentSentimentScore = positiveBase
-
-                        # Store all of the original sentiments for future use
-                        next_segment.segmentAllSentiments = sentimentResponse["SentimentScore"]
-                        next_segment.segmentPositive = positiveBase
-                        next_segment.segmentNegative = negativeBase
-
-                # If we have a language model then extract entities via Comprehend,
-                # and the same methodology is used for all of the Transcribe modes
-                if self.comprehendLanguageCode != "":
-                    # Get sentiment and standard entity detection from Comprehend
-                    pii_masked_text = nextText.replace(PII_PLACEHOLDER, PII_PLACEHOLDER_MASK)
-                    entity_response = self.comprehend_single_entity(pii_masked_text, client)
-
-                    # Filter for desired entity types
-                    for detected_entity in entity_response["Entities"]:
-                        self.extract_entities_from_line(detected_entity, next_segment, cf.appConfig[cf.CONF_ENTITY_TYPES])
-
-                    # Now do the same for any entities we can find in a custom model.  At the
-                    # time of writing, Custom Entity models in Comprehend are ENGLISH ONLY
-                    if (self.customEntityEndpointARN != "") and (self.comprehendLanguageCode == "en"):
-                        # Call the custom model and insert
-                        custom_entity_response = client.detect_entities(Text=pii_masked_text,
-                                                                        EndpointArn=self.customEntityEndpointARN)
-                        for detected_entity in custom_entity_response["Entities"]:
-                            self.extract_entities_from_line(detected_entity, next_segment, [])
+                    next_segment.segmentAllSentiments = sentiment_set_neutral
+            # Standard Transcribe requires us to use Comprehend
+            else:
+                # We can only use Comprehend if we have a language code
+                if not use_comprehend:
+                    # We had no language - use default neutral sentiment scores
+                    next_segment.segmentAllSentiments = sentiment_set_neutral
+                    next_segment.segmentIsPositive = False
+                    next_segment.segmentIsNegative = False
+                else:
+                    # For Standard Transcribe we need to set the sentiment marker based on score thresholds
+                    pcanlp.apply_sentiment_thresholds(next_segment, sentiment_responses[segment_index],
+                                                      self.min_sentiment_negative, self.min_sentiment_positive)
+
+            # If we have a language model then extract entities via Comprehend,
+            # and the same methodology is used for all of the Transcribe modes
+            if use_comprehend:
+                # Filter for desired entity types
+                for detected_entity in entity_responses[segment_index]["Entities"]:
+                    self.extract_entities_from_line(detected_entity, next_segment, cf.appConfig[cf.CONF_ENTITY_TYPES])
+
+                # Now do the same for any entities we can find in a custom model
+                if need_custom_entities:
+                    for detected_entity in custom_entity_responses[segment_index]["Entities"]:
+                        self.extract_entities_from_line(detected_entity, next_segment, [])
+
+    def get_best_alternative(self, item):
+        """
+        Returns the highest-confidence alternative for a Transcribe 'pronunciation' item, along with its
+        confidence score.  Redacted words have no top-level confidence, so we take it from the redaction block
+
+        :param item: Transcribe 'pronunciation' item
+        :return: Best alternative for the item, and its confidence score
+        """
+        try:
+            result = sorted(item["alternatives"], key=lambda x: x["confidence"])[-1]
+            confidence = float(result["confidence"])
+        except:
+            result = item["alternatives"][0]
+            confidence = float(result["redactions"][0]["confidence"])
+
+        return result, confidence
+
+    def create_word_index(self, items):
+        """
+        Builds a lookup of all 'pronunciation' items in a Transcribe results item list, keyed by the word's
+        (start_time, end_time).  Each entry holds the text of the best alternative and its confidence, along with
+        the text of any 'punctuation' item that immediately follows the word, so that each word in a speaker segment
+        can be resolved without rescanning the whole item list.  If several words share the same timestamps then, as
+        before, the alternative comes from the last of them but the punctuation follows the first of them
+
+        :param items: Transcribe results item list
+        :return: Dictionary of (start_time, end_time) -> [best alternative text, confidence, trailing punctuation]
+        """
+        word_index = {}
+        last_new_entry = None
+        for item in items:
+            if item["type"] == "pronunciation":
+                result, confidence = self.get_best_alternative(item)
+                key = (item["start_time"], item["end_time"])
+                if key in word_index:
+                    # Later duplicate - take its alternative, but not any following punctuation
+                    word_index[key][0] = result["content"]
+                    word_index[key][1] = confidence
+                    last_new_entry = None
+                else:
+                    last_new_entry = [result["content"], confidence, ""]
+                    word_index[key] = last_new_entry
+            else:
+                # Punctuation only attaches to the word immediately before it
+                if last_new_entry is not None:
+                    last_new_entry[2] = item["alternatives"][0]["content"]
+                last_new_entry = None
+
+        return word_index
 
     def generate_speaker_label(self, standard_ts_speaker="", analytics_ts_speaker=""):
         '''
@@ -537,6 +738,243 @@ class TranscribeParser:
         newLabel = "spk_" + str(speaker)
         return newLabel
 
+    def read_transcript_elements(self):
+        """
+        Yields a (path, element) tuple for every element of the transcript arrays in the Transcribe results, in the
+        order that they appear.  If the results are being streamed from S3 then they are read here, and once every
+        element has been read asr_output is set to the rest of the results; otherwise they come from asr_output
+        """
+        if self.asr_stream is not None:
+            yield from self.asr_stream.elements()
+            self.asr_output = self.asr_stream.document
+            self.asr_stream = None
+        else:
+            yield from pcajsonstream.iterate_document_arrays(self.asr_output, TRANSCRIPT_ARRAY_PATHS)
+
+    def group_transcript_elements(self):
+        """
+        Groups the transcript array elements from the Transcribe results by the array that they come from.  Each
+        group's elements must be used before moving on to the next group, as they may be coming from a stream
+
+        :return: Iterator of (array path, iterator of the array's elements) tuples
+        """
+        for array_path, group in itertools.groupby(self.read_transcript_elements(), key=lambda element: element[0]):
+            yield array_path, (element for _, element in group)
+
+    def create_speaker_segments(self, segments):
+        """
+        Creates the speech segments for a speaker-separated file from the Transcribe speaker label segments.  A new
+        speech segment starts if the speaker changes or there's a 3-second gap.  The words aren't added here, as the
+        word items may not have been read yet, so the timestamp keys for each segment's words are returned instead
+
+        :param segments: Transcribe speaker label segments
+        :return: List of speech segments, and a matching list of word timestamp keys for each segment
+        """
+        speechSegmentList = []
+        segment_word_keys = []
+        lastSpeaker = ""
+        lastEndTime = 0.0
+        nextSpeechSegment = None
+        word_keys = []
+
+        # A segment is a blob of pronunciation and punctuation by an individual speaker
+        for segment in segments:
+
+            # If there is content in the segment then pick out the time and speaker
+            if len(segment["items"]) > 0:
+                # Pick out our next data
+                nextStartTime = float(segment["start_time"])
+                nextEndTime = float(segment["end_time"])
+                nextSpeaker = self.generate_speaker_label(standard_ts_speaker=str(segment["speaker_label"]))
+
+                # If we've changed speaker, or there's a 3-second gap, create a new row
+                if (nextSpeaker != lastSpeaker) or ((nextStartTime - lastEndTime) >= 3.0):
+                    nextSpeechSegment = SpeechSegment()
+                    speechSegmentList.append(nextSpeechSegment)
+                    nextSpeechSegment.segmentStartTime = nextStartTime
+                    nextSpeechSegment.segmentSpeaker = nextSpeaker
+                    word_keys = []
+                    segment_word_keys.append(word_keys)
+                nextSpeechSegment.segmentEndTime = nextEndTime
+
+                # Note the speaker and end time of this segment for the next iteration
+                lastSpeaker = nextSpeaker
+                lastEndTime = nextEndTime
+
+                # Remember each word in the segment, as words are indexed by their timestamps
+                for word in segment["items"]:
+                    word_keys.append((word["start_time"], word["end_time"]))
+
+        return speechSegmentList, segment_word_keys
+
+    def add_speaker_segment_words(self, speech_segments, segment_word_keys, word_index):
+        """
+        Adds the words to the speech segments of a speaker-separated file, once all of the words have been indexed
+
+        :param speech_segments: Speech segments from create_speaker_segments
+        :param segment_word_keys: Word timestamp keys for each speech segment, from create_speaker_segments
+        :param word_index: Word index from create_word_index
+        """
+        for nextSpeechSegment, word_keys in zip(speech_segments, segment_word_keys):
+            skipLeadingSpace = True
+            confidenceList = nextSpeechSegment.segmentConfidence
+
+            # For each word in the segment...
+            for word_key in word_keys:
+
+                # Get the word with the highest confidence, and any punctuation that follows it
+                content, confidence, punctuation = word_index[word_key]
+
+                # Write the word, and a leading space if this isn't the start of the segment
+                if skipLeadingSpace:
+                    skipLeadingSpace = False
+                    wordToAdd = content
+                else:
+                    wordToAdd = " " + content
+
+                # If the next item is punctuation, add it to the current word
+                wordToAdd += punctuation
+
+                # Add word and confidence to the segment and to our overall stats
+                nextSpeechSegment.append_text(wordToAdd)
+                confidenceList.append(wordToAdd, confidence, float(word_key[0]), float(word_key[1]))
+                self.numWordsParsed += 1
+                self.cummulativeWordAccuracy += confidence
+
+    def create_channel_segments(self, channel_items):
+        """
+        Creates the speech segments for one channel of a channel-separated file, starting a new segment whenever
+        there's a pause of more than 100ms.  Punctuation is added to the word immediately before it.  The channel's
+        speaker isn't known until all of its items have been read, so is left for the caller to set
+
+        :param channel_items: Transcribe items for the channel
+        :return: List of speech segments for the channel
+        """
+        channelSegmentList = []
+        lastEndTime = 0.0
+        nextSpeechSegment = None
+        follows_word = False
+
+        for word in channel_items:
+            # Pick out our next data from a 'pronunciation'
+            if word["type"] == "pronunciation":
+                nextStartTime = float(word["start_time"])
+                nextEndTime = float(word["end_time"])
+
+                # If this is the start of the channel, or the pause is very small, then start a new text segment
+                if (nextSpeechSegment is None) or ((nextStartTime - lastEndTime) > 0.1):
+                    nextSpeechSegment = SpeechSegment()
+                    channelSegmentList.append(nextSpeechSegment)
+                    nextSpeechSegment.segmentStartTime = nextStartTime
+                    wordToAdd = ""
+                else:
+                    wordToAdd = " "
+                nextSpeechSegment.segmentEndTime = nextEndTime
+
+                # Note the end time of this segment for the next iteration
+                lastEndTime = nextEndTime
+
+                # Get the word with the highest confidence, and write it with a
+                # leading space if this isn't the start of the segment
+                result, confidence = self.get_best_alternative(word)
+                wordToAdd += result["content"]
+
+                # Add word and confidence to the segment and to our overall stats
+                nextSpeechSegment.append_text(wordToAdd)
+                nextSpeechSegment.segmentConfidence.append(wordToAdd, confidence, nextStartTime, nextEndTime)
+                self.numWordsParsed += 1
+                self.cummulativeWordAccuracy += confidence
+                follows_word = True
+
+            else:
+                # If this is punctuation straight after a word then add it to that word
+                if (word["type"] == "punctuation") and follows_word:
+                    punctuation = word["alternatives"][0]["content"]
+                    nextSpeechSegment.segmentConfidence.texts[-1] += punctuation
+                    nextSpeechSegment.append_text(punctuation)
+                follows_word = False
+
+        return channelSegmentList
+
+    def create_analytics_segment(self, turn):
+        """
+        Creates the speech segment for a single turn of a Call Analytics file
+
+        :param turn: Call Analytics transcript turn
+        :return: Speech segment for the turn
+        """
+        # Get our next speaker name
+        nextSpeaker = self.generate_speaker_label(analytics_ts_speaker=turn["ParticipantRole"])
+
+        # Setup the next speaker block
+        nextSpeechSegment = SpeechSegment()
+        nextSpeechSegment.segmentStartTime = float(turn["BeginOffsetMillis"]) / 1000.0
+        nextSpeechSegment.segmentEndTime = float(turn["EndOffsetMillis"]) / 1000.0
+        nextSpeechSegment.segmentSpeaker = nextSpeaker
+        nextSpeechSegment.segmentText = turn["Content"]
+        nextSpeechSegment.segmentLoudnessScores = turn["LoudnessScores"]
+        confidenceList = nextSpeechSegment.segmentConfidence
+        skipLeadingSpace = True
+
+        # Process each word in this turn
+        if "Items" in turn:
+            # Turn-level items are available
+            for word in turn["Items"]:
+                # Pick out our next data from a 'pronunciation'
+                if word["Type"] == "pronunciation":
+                    # Write the word, and a leading space if this isn't the start of the segment
+                    if skipLeadingSpace:
+                        skipLeadingSpace = False
+                        wordToAdd = word["Content"]
+                    else:
+                        wordToAdd = " " + word["Content"]
+
+                    # If the word is redacted then the word confidence is a bit more buried
+                    if "Confidence" in word:
+                        conf_score = float(word["Confidence"])
+                    elif "Redaction" in word:
+                        conf_score = float(word["Redaction"][0]["Confidence"])
+
+                    # Add the word and confidence to this segment's list and to our overall stats
+                    confidenceList.append(wordToAdd, conf_score, float(word["BeginOffsetMillis"]) / 1000.0,
+                                          float(word["EndOffsetMillis"] / 1000.0))
+                    self.numWordsParsed += 1
+                    self.cummulativeWordAccuracy += conf_score
+
+                else:
+                    # Punctuation, needs to be added to the previous word
+                    confidenceList.texts[-1] = confidenceList.texts[-1] + word["Content"]
+        else:
+            # Turn-level items are NOT available (true for the launch of TCA Streaming)
+            # TODO This should be temporary, as TCA Streaming will support this going forward
+            word_list = turn["Content"].split(" ")
+            for wordToAdd in word_list:
+                # Go through each word and create a similar entry to the above
+                self.numWordsParsed += 1
+                confidenceList.append(wordToAdd, 0.0, 0.0, 0.0)
+
+        # Record any issues, actions or outcomes detected
+        self.extract_summary_data(nextSpeechSegment, nextSpeechSegment.segmentIssuesDetected,
+                                  self.analytics.issues_detected, "IssuesDetected", turn)
+        self.extract_summary_data(nextSpeechSegment, nextSpeechSegment.segmentActionItemsDetected,
+                                  self.analytics.actions_detected, "ActionItemsDetected", turn)
+        self.extract_summary_data(nextSpeechSegment, nextSpeechSegment.segmentOutcomesDetected,
+                                  self.analytics.outcomes_detected, "OutcomesDetected", turn)
+
+        # Tag on the sentiment - analytics has no per-turn numbers, so max out the
+        # positive and negative, which effectively is 1.0 * pcanlp.COMPREHEND_SENTIMENT_SCALER
+        turn_sentiment = turn["Sentiment"]
+        if turn_sentiment == "POSITIVE":
+            nextSpeechSegment.segmentIsPositive = True
+            nextSpeechSegment.segmentPositive = 1.0
+            nextSpeechSegment.segmentSentimentScore = pcanlp.COMPREHEND_SENTIMENT_SCALER
+        elif turn_sentiment == "NEGATIVE":
+            nextSpeechSegment.segmentIsNegative = True
+            nextSpeechSegment.segmentNegative = 1.0
+            nextSpeechSegment.segmentSentimentScore = pcanlp.COMPREHEND_SENTIMENT_SCALER
+
+        return nextSpeechSegment
+
     def create_turn_by_turn_segments(self, sf_event):
         """
         Creates a list of conversational turns, splitting up by speaker or if there's a noticeable pause in
@@ -562,151 +1000,43 @@ class TranscribeParser:
             isChannelMode = self.analytics.transcribe_job.channel_identification
             isSpeakerMode = not isChannelMode
 
-        lastSpeaker = ""
-        lastEndTime = 0.0
-        skipLeadingSpace = False
-        confidenceList = []
-        nextSpeechSegment = None
-
         # Process a Speaker-separated non-Analytics file
         if isSpeakerMode:
-            # A segment is a blob of pronunciation and punctuation by an individual speaker
-            for segment in self.asr_output["results"]["speaker_labels"]["segments"]:
-
-                # If there is content in the segment then pick out the time and speaker
-                if len(segment["items"]) > 0:
-                    # Pick out our next data
-                    nextStartTime = float(segment["start_time"])
-                    nextEndTime = float(segment["end_time"])
-                    nextSpeaker = self.generate_speaker_label(standard_ts_speaker=str(segment["speaker_label"]))
-
-                    # If we've changed speaker, or there's a 3-second gap, create a new row
-                    if (nextSpeaker != lastSpeaker) or ((nextStartTime - lastEndTime) >= 3.0):
-                        nextSpeechSegment = SpeechSegment()
-                        speechSegmentList.append(nextSpeechSegment)
-                        nextSpeechSegment.segmentStartTime = nextStartTime
-                        nextSpeechSegment.segmentSpeaker = nextSpeaker
-                        skipLeadingSpace = True
-                        confidenceList = []
-                        nextSpeechSegment.segmentConfidence = confidenceList
-                    nextSpeechSegment.segmentEndTime = nextEndTime
-
-                    # Note the speaker and end time of this segment for the next iteration
-                    lastSpeaker = nextSpeaker
-                    lastEndTime = nextEndTime
-
-                    # For each word in the segment...
-                    for word in segment["items"]:
-
-                        # Get the word with the highest confidence
-                        pronunciations = list(filter(lambda x: x["type"] == "pronunciation", self.asr_output["results"]["items"]))
-                        word_result = list(filter(lambda x: x["start_time"] == word["start_time"] and x["end_time"] == word["end_time"], pronunciations))
-                        try:
-                            result = sorted(word_result[-1]["alternatives"], key=lambda x: x["confidence"])[-1]
-                            confidence = float(result["confidence"])
-                        except:
-                            result = word_result[-1]["alternatives"][0]
-                            confidence = float(result["redactions"][0]["confidence"])
-
-                        # Write the word, and a leading space if this isn't the start of the segment
-                        if skipLeadingSpace:
-                            skipLeadingSpace = False
-                            wordToAdd = result["content"]
-                        else:
-                            wordToAdd = " " + result["content"]
-
-                        # If the next item is punctuation, add it to the current word
-                        try:
-                            word_result_index = self.asr_output["results"]["items"].index(word_result[0])
-                            next_item = self.asr_output["results"]["items"][word_result_index + 1]
-                            if next_item["type"] == "punctuation":
-                                wordToAdd += next_item["alternatives"][0]["content"]
-                        except IndexError:
-                            # There may not be a next item
-                            word_result_index = -1
-
-                        # Add word and confidence to the segment and to our overall stats
-                        nextSpeechSegment.segmentText += wordToAdd
-                        confidenceList.append({"Text": wordToAdd,
-                                               "Confidence": confidence,
-                                               "StartTime": float(word["start_time"]),
-                                               "EndTime": float(word["end_time"])})
-                        self.numWordsParsed += 1
-                        self.cummulativeWordAccuracy += confidence
+            # Speaker segments only reference their words by timestamps, and Transcribe may write the segments out
+            # before the items, so we build the segments first and then fill in their words once all are indexed
+            word_index = {}
+            segment_word_keys = []
+            for array_path, elements in self.group_transcript_elements():
+                if array_path == TRANSCRIBE_ITEMS_PATH:
+                    word_index = self.create_word_index(elements)
+                elif array_path == TRANSCRIBE_SEGMENTS_PATH:
+                    speechSegmentList, segment_word_keys = self.create_speaker_segments(elements)
+            self.add_speaker_segment_words(speechSegmentList, segment_word_keys, word_index)
 
         # Process a Channel-separated file
         elif isChannelMode:
 
-            # A channel contains all pronunciation and punctuation from a single speaker
-            for channel in self.asr_output["results"]["channel_labels"]["channels"]:
-
-                # If there is content in the channel then start processing it
-                if len(channel["items"]) > 0:
-
-                    # We have the same speaker all the way through this channel
-                    nextSpeaker = self.generate_speaker_label(standard_ts_speaker=str(channel["channel_label"]))
-                    for word in channel["items"]:
-                        # Pick out our next data from a 'pronunciation'
-                        if word["type"] == "pronunciation":
-                            nextStartTime = float(word["start_time"])
-                            nextEndTime = float(word["end_time"])
-
-                            # If we've changed speaker, or we haven't and the
-                            # pause is very small, then start a new text segment
-                            if (nextSpeaker != lastSpeaker) or\
-                                    ((nextSpeaker == lastSpeaker) and ((nextStartTime - lastEndTime) > 0.1)):
-                                nextSpeechSegment = SpeechSegment()
-                                speechSegmentList.append(nextSpeechSegment)
-                                nextSpeechSegment.segmentStartTime = nextStartTime
-                                nextSpeechSegment.segmentSpeaker = nextSpeaker
-                                skipLeadingSpace = True
-                                confidenceList = []
-                                nextSpeechSegment.segmentConfidence = confidenceList
-                            nextSpeechSegment.segmentEndTime = nextEndTime
-
-                            # Note the speaker and end time of this segment for the next iteration
-                            lastSpeaker = nextSpeaker
-                            lastEndTime = nextEndTime
-
-                            # Get the word with the highest confidence
-                            pronunciations = list(filter(lambda x: x["type"] == "pronunciation", channel["items"]))
-                            word_result = list(filter(lambda x: x["start_time"] == word["start_time"] and x["end_time"] == word["end_time"], pronunciations))
-                            try:
-                                result = sorted(word_result[-1]["alternatives"], key=lambda x: x["confidence"])[-1]
-                                confidence = float(result["confidence"])
-                            except:
-                                result = word_result[-1]["alternatives"][0]
-                                confidence = float(result["redactions"][0]["confidence"])
-
-                            # Write the word, and a leading space if this isn't the start of the segment
-                            if skipLeadingSpace:
-                                skipLeadingSpace = False
-                                wordToAdd = result["content"]
-                            else:
-                                wordToAdd = " " + result["content"]
-
-                            # If the next item is punctuation, add it to the current word
-                            try:
-                                word_result_index = channel["items"].index(word_result[0])
-                                next_item = channel["items"][word_result_index + 1]
-                                if next_item["type"] == "punctuation":
-                                    wordToAdd += next_item["alternatives"][0]["content"]
-                            except IndexError:
-                                # There may not be a next item
-                                word_result_index = -1
-
-                            # Add word and confidence to the segment and to our overall stats
-                            nextSpeechSegment.segmentText += wordToAdd
-                            confidenceList.append({"Text": wordToAdd,
-                                                   "Confidence": confidence,
-                                                   "StartTime": float(word["start_time"]),
-                                                   "EndTime": float(word["end_time"])})
-                            self.numWordsParsed += 1
-                            self.cummulativeWordAccuracy += confidence
-
-            # Sort the segments, as they are in channel-order and not speaker-order, then
+            # A channel contains all pronunciation and punctuation from a single speaker, and each one
+            # is already in time order, so we build a separate time-ordered segment list per channel.  Each
+            # channel's label is only known once all of its items have been read, so it is applied afterwards
+            channel_segment_lists = []
+            channelSegmentList = None
+            for array_path, elements in self.group_transcript_elements():
+                if array_path == TRANSCRIBE_CHANNEL_ITEMS_PATH:
+                    channelSegmentList = self.create_channel_segments(elements)
+                elif array_path == TRANSCRIBE_CHANNELS_PATH:
+                    for channel in elements:
+                        # Channels with no items have no segments, so are ignored
+                        if channelSegmentList is not None:
+                            nextSpeaker = self.generate_speaker_label(standard_ts_speaker=str(channel["channel_label"]))
+                            for segment in channelSegmentList:
+                                segment.segmentSpeaker = nextSpeaker
+                            channel_segment_lists.append(channelSegmentList)
+                            channelSegmentList = None
+
+            # Interleave the per-channel segments into start-time order, then
             # merge together turns from the same speaker that are very close together
-            speechSegmentList = sorted(speechSegmentList, key=lambda segment: segment.segmentStartTime)
+            speechSegmentList = list(heapq.merge(*channel_segment_lists, key=lambda segment: segment.segmentStartTime))
             speechSegmentList = self.merge_speaker_segments(speechSegmentList)
 
         # Process a Call Analytics file
@@ -717,98 +1047,27 @@ class TranscribeParser:
             for channel_def in sf_event["channelDefinitions"]:
                 self.analytics_channel_map[channel_def["ParticipantRole"]] = channel_def["ChannelId"]
 
-            # Lookup shortcuts
+            # Each turn has already been processed by Transcribe, so the outputs are in order
+            turn_windows = []
+            for array_path, elements in self.group_transcript_elements():
+                if array_path == ANALYTICS_TURNS_PATH:
+                    for turn in elements:
+                        speechSegmentList.append(self.create_analytics_segment(turn))
+                        turn_windows.append((turn["ParticipantRole"], turn["BeginOffsetMillis"],
+                                             turn["EndOffsetMillis"]))
+
+            # Index the interruption start times for each interrupter - these may come after the turns in
+            # the results, so each turn is only checked against them once the whole file has been read
             interrupts = self.asr_output["ConversationCharacteristics"]["Interruptions"]
+            interruption_index = {}
+            for role, entries in interrupts["InterruptionsByInterrupter"].items():
+                interruption_index[role] = TimelineIndex.from_entries(entries, "BeginOffsetMillis")
 
-            # Each turn has already been processed by Transcribe, so the outputs are in order
-            for turn in self.asr_output["Transcript"]:
-
-                # Get our next speaker name
-                nextSpeaker = self.generate_speaker_label(analytics_ts_speaker=turn["ParticipantRole"])
-
-                # Setup the next speaker block
-                nextSpeechSegment = SpeechSegment()
-                speechSegmentList.append(nextSpeechSegment)
-                nextSpeechSegment.segmentStartTime = float(turn["BeginOffsetMillis"]) / 1000.0
-                nextSpeechSegment.segmentEndTime = float(turn["EndOffsetMillis"]) / 1000.0
-                nextSpeechSegment.segmentSpeaker = nextSpeaker
-                nextSpeechSegment.segmentText = turn["Content"]
-                nextSpeechSegment.segmentLoudnessScores = turn["LoudnessScores"]
-                confidenceList = []
-                nextSpeechSegment.segmentConfidence = confidenceList
-                skipLeadingSpace = True
-
-                # Check if this block is within an interruption block for the speaker
-                if turn["ParticipantRole"] in interrupts["InterruptionsByInterrupter"]:
-                    turnStart = turn["BeginOffsetMillis"]
-                    turnEnd = turn["EndOffsetMillis"]
-                    for entry in interrupts["InterruptionsByInterrupter"][turn["ParticipantRole"]]:
-                        if (entry["BeginOffsetMillis"] >= turnStart) and (entry["BeginOffsetMillis"] < turnEnd):
-                            nextSpeechSegment.segmentInterruption = True
-                            break
-
-                # Process each word in this turn
-                if "Items" in turn:
-                    # Turn-level items are available
-                    for word in turn["Items"]:
-                        # Pick out our next data from a 'pronunciation'
-                        if word["Type"] == "pronunciation":
-                            # Write the word, and a leading space if this isn't the start of the segment
-                            if skipLeadingSpace:
-                                skipLeadingSpace = False
-                                wordToAdd = word["Content"]
-                            else:
-                                wordToAdd = " " + word["Content"]
-
-                            # If the word is redacted then the word confidence is a bit more buried
-                            if "Confidence" in word:
-                                conf_score = float(word["Confidence"])
-                            elif "Redaction" in word:
-                                conf_score = float(word["Redaction"][0]["Confidence"])
-
-                            # Add the word and confidence to this segment's list and to our overall stats
-                            confidenceList.append({"Text": wordToAdd,
-                                                   "Confidence": conf_score,
-                                                   "StartTime": float(word["BeginOffsetMillis"]) / 1000.0,
-                                                   "EndTime": float(word["EndOffsetMillis"] / 1000.0)})
-                            self.numWordsParsed += 1
-                            self.cummulativeWordAccuracy += conf_score
-
-                        else:
-                            # Punctuation, needs to be added to the previous word
-                            last_word = nextSpeechSegment.segmentConfidence[-1]
-                            last_word["Text"] = last_word["Text"] + word["Content"]
-                else:
-                    # Turn-level items are NOT available (true for the launch of TCA Streaming)
-                    # TODO This should be temporary, as TCA Streaming will support this going forward
-                    word_list = turn["Content"].split(" ")
-                    for wordToAdd in word_list:
-                        # Go through each word and create a similar entry to the above
-                        self.numWordsParsed += 1
-                        confidenceList.append({"Text": wordToAdd,
-                                               "Confidence": 0.0,
-                                               "StartTime": 0.0,
-                                               "EndTime": 0.0})
-
-                # Record any issues, actions or outcomes detected
-                self.extract_summary_data(nextSpeechSegment, nextSpeechSegment.segmentIssuesDetected,
-                                          self.analytics.issues_detected, "IssuesDetected", turn)
-                self.extract_summary_data(nextSpeechSegment, nextSpeechSegment.segmentActionItemsDetected,
-                                          self.analytics.actions_detected, "ActionItemsDetected", turn)
-                self.extract_summary_data(nextSpeechSegment, nextSpeechSegment.segmentOutcomesDetected,
-                                          self.analytics.outcomes_detected, "OutcomesDetected", turn)
-
-                # Tag on the sentiment - analytics has no per-turn numbers, so max out the
-                # positive and negative, which effectively is 1.0 * COMPREHEND_SENTIMENT_SCALER
-                turn_sentiment = turn["Sentiment"]
-                if turn_sentiment == "POSITIVE":
-                    nextSpeechSegment.segmentIsPositive = True
-                    nextSpeechSegment.segmentPositive = 1.0
-                    nextSpeechSegment.segmentSentimentScore = COMPREHEND_SENTIMENT_SCALER
-                elif turn_sentiment == "NEGATIVE":
-                    nextSpeechSegment.segmentIsNegative = True
-                    nextSpeechSegment.segmentNegative = 1.0
-                    nextSpeechSegment.segmentSentimentScore = COMPREHEND_SENTIMENT_SCALER
+            # Check if each turn is within an interruption block for the speaker
+            for nextSpeechSegment, (role, turnStart, turnEnd) in zip(speechSegmentList, turn_windows):
+                if role in interruption_index:
+                    if interruption_index[role].any_in_window(turnStart, turnEnd):
+                        nextSpeechSegment.segmentInterruption = True
 
         # Inject sentiments into the segment list
         self.extract_nlp(speechSegmentList)
@@ -820,7 +1079,7 @@ class TranscribeParser:
 
         # Now set the overall call duration if we actually had any speech
         if len(speechSegmentList) > 0:
-            self.analytics.duration = float(speechSegmentList[-1].segmentConfidence[-1]["EndTime"])
+            self.analytics.duration = float(speechSegmentList[-1].segmentConfidence.end_times[-1])
 
         # Return our full turn-by-turn speaker segment list with sentiment
         return speechSegmentList
@@ -856,50 +1115,38 @@ class TranscribeParser:
         """
         Searches through the speech segments given and updates them with any of the simple entity mapping
         entries that we've found.  It also updates the line-level items.  Both methods simulate the same
-        response that we'd generate if this was via Standard or Custom Comprehend Entities
+        response that we'd generate if this was via Standard or Custom Comprehend Entities.  Each segment is
+        scanned just once by the compiled entity matcher, which only matches whole words (or their plurals)
         """
 
-        # Need to check each of our speech segments for each of our entity blocks
-        # TODO We need to match words, not partials!  See notes below
-        for nextTurn in speech_segments:
-            # Now check this turn for each entity
-            turnText = nextTurn.segmentText.lower()
-            for nextEntity in self.simpleEntityMap:
-                if nextEntity in turnText:
-                    self.matchedSimpleEntities[nextEntity] = self.simpleEntityMap[nextEntity]
-
-        # Loop through each segment looking for matches in our cut-down entity list
+        # Find all of the entities in each of our speech segments
+        segmentMatches = [self.simpleEntityMatcher.find_matches(segment.segmentText.lower())
+                          for segment in speech_segments]
+
+        # Build our cut-down entity list in order of first appearance, taking entities
+        # within a segment in entity map order, and then record them in the header
+        mapRank = {entity: rank for rank, entity in enumerate(self.simpleEntityMap)}
+        for matches in segmentMatches:
+            for entity in sorted(set(match[0] for match in matches), key=lambda x: mapRank[x]):
+                if entity not in self.matchedSimpleEntities:
+                    self.matchedSimpleEntities[entity] = self.simpleEntityMap[entity]
         for entity in self.matchedSimpleEntities:
-
-            # Start by recording this in the header
             entityEntry = self.matchedSimpleEntities[entity]
             self.update_header_entity_count(entityEntry["Type"], entityEntry["Original"])
 
-            # Work through each segment
-            # TODO Need to check we don't highlight characters in the middle of transcribed word
-            # TODO Need to try and handle simple plurals (e.g. type="log" should match "logs")
-            for segment in speech_segments:
-                # Check if the entity text appear somewhere
-                turnText = segment.segmentText.lower()
-                searchFrom = 0
-                index = turnText.find(entity, searchFrom)
-                entityTextLength = len(entity)
-
-                # If found then add the data in the segment, and keep going until we don't find one
-                while index != -1:
-                    # Got a match - add this one on, then look for another
-                    # TODO if entityText is capitalised then use it, otherwise use segment text
-                    nextSearchFrom = index + entityTextLength
-                    newLineEntity = {}
-                    newLineEntity["Score"] = 1.0
-                    newLineEntity["Type"] = entityEntry["Type"]
-                    newLineEntity["Text"] = entityEntry["Original"]  # TODO fix as per the above
-                    newLineEntity["BeginOffset"] = index
-                    newLineEntity["EndOffset"] = nextSearchFrom
-                    segment.segmentCustomEntities.append(newLineEntity)
-
-                    # Now look to see if it's repeated in this segment
-                    index = turnText.find(entity, nextSearchFrom)
+        # Add the matches to each segment, grouped by entity in the order of our cut-down list and then by position
+        entityRank = {entity: rank for rank, entity in enumerate(self.matchedSimpleEntities)}
+        for segment, matches in zip(speech_segments, segmentMatches):
+            for entity, beginOffset, endOffset in sorted(matches, key=lambda x: (entityRank[x[0]], x[1])):
+                # TODO if entityText is capitalised then use it, otherwise use segment text
+                entityEntry = self.matchedSimpleEntities[entity]
+                newLineEntity = {}
+                newLineEntity["Score"] = 1.0
+                newLineEntity["Type"] = entityEntry["Type"]
+                newLineEntity["Text"] = entityEntry["Original"]  # TODO fix as per the above
+                newLineEntity["BeginOffset"] = beginOffset
+                newLineEntity["EndOffset"] = endOffset
+                segment.segmentCustomEntities.append(newLineEntity)
 
     def calculate_transcribe_conversation_time(self, filename):
         '''
@@ -1011,22 +1258,53 @@ class TranscribeParser:
             if (self.comprehendLanguageCode != ""):
                 key = key.split('.csv')[0] + "-" + self.comprehendLanguageCode + ".csv"
 
-            # Then check that the language-specific mapping file actually exists
-            s3 = boto3.client("s3")
+            # Use our cached copy if we've recently checked that it's current
             bucket = cf.appConfig[cf.CONF_SUPPORT_BUCKET]
+            cached_entry = entity_map_cache.get((bucket, key))
+            if (cached_entry is not None) and (time.time() - cached_entry["CheckedAt"] < ENTITY_CACHE_TTL_SECS):
+                self.use_cached_entity_map(cached_entry)
+                return
+            elif (cached_entry is not None) and (cached_entry["ETag"] is None):
+                # We didn't find a file last time, so there's nothing to compare against
+                cached_entry = None
+
+            # Then check that the language-specific mapping file actually exists, only downloading it if it
+            # has changed since we cached it - S3 responds with a 304 Not Modified error if it hasn't
+            s3 = pcacommon.get_s3_client()
             try:
-                response = s3.get_object(Bucket=bucket, Key=key)
+                if cached_entry is not None:
+                    response = s3.get_object(Bucket=bucket, Key=key, IfNoneMatch=cached_entry["ETag"])
+                else:
+                    response = s3.get_object(Bucket=bucket, Key=key)
                 print(f"Loaded Entity Mapping file: s3://{bucket}/{key}.")
             except Exception as e:
-                # Mapping file doesn't exist, so just quietly exit
-                print(f"Unable to load Entity Mapping file: s3://{bucket}/{key}. EntityMapping disabled.")
-                self.simpleEntityMatchingUsed = False
+                try:
+                    error_code = e.response["Error"]["Code"]
+                except:
+                    error_code = None
+                if error_code in ["304", "NotModified"]:
+                    cached_entry["CheckedAt"] = time.time()
+                    self.use_cached_entity_map(cached_entry)
+                elif error_code in ["NoSuchKey", "404"]:
+                    # Mapping file doesn't exist, so just quietly exit, and remember that for a while
+                    print(f"Unable to load Entity Mapping file: s3://{bucket}/{key}. EntityMapping disabled.")
+                    self.simpleEntityMatchingUsed = False
+                    entity_map_cache[(bucket, key)] = {"ETag": None, "CheckedAt": time.time(),
+                                                       "EntityMap": {}, "Matcher": None}
+                elif cached_entry is not None:
+                    # Any other error, such as throttling, may well be transient, so carry on with the map that
+                    # we already have, and check it again on the next call
+                    print(f"Unable to check Entity Mapping file: s3://{bucket}/{key}, using cached copy: {e}")
+                    self.use_cached_entity_map(cached_entry)
+                else:
+                    # Nothing cached to fall back on, so skip entity mapping just for this call
+                    print(f"Unable to load Entity Mapping file: s3://{bucket}/{key}. EntityMapping disabled "
+                          f"for this call: {e}")
+                    self.simpleEntityMatchingUsed = False
                 return
 
-            # Go download the mapping file and get it into a structure
-            mapFilepath = TMP_DIR + '/' + cf.appConfig[cf.CONF_ENTITY_FILE]
-            s3.download_file(bucket, key, mapFilepath)
-            reader = csv.DictReader(open(mapFilepath, errors="ignore"))
+            # Read the mapping file straight from the response and get it into a structure
+            reader = csv.DictReader(io.StringIO(response["Body"].read().decode("utf-8", errors="ignore")))
             try:
                 for row in reader:
                     origTerm = row.pop("Text")
@@ -1037,11 +1315,33 @@ class TranscribeParser:
                 # Something went wrong loading in the spreadsheet - disable the entities
                 self.simpleEntityMatchingUsed = False
                 self.simpleEntityMap = {}
+                entity_map_cache.pop((bucket, key), None)
                 print(f"Failed to load in entity file {cf.appConfig[cf.CONF_ENTITY_FILE]}")
                 print(e)
-            finally:
-                # Remove our temporary in case of Lambda container re-use
-                pcacommon.remove_temp_file(mapFilepath)
+                return
+
+            # Compile the entity map so that each speech segment only needs to be scanned once,
+            # and cache it all for later invocations of this container
+            if self.simpleEntityMap != {}:
+                self.simpleEntityMatcher = pcaentitymatcher.EntityMatcher(self.simpleEntityMap)
+            entity_map_cache[(bucket, key)] = {"ETag": response["ETag"], "CheckedAt": time.time(),
+                                               "EntityMap": self.simpleEntityMap, "Matcher": self.simpleEntityMatcher}
+
+    def use_cached_entity_map(self, cached_entry):
+        """
+        Sets our simple entity map and its compiled matcher from a cached entry.  These are shared with
+        the cache, but neither is changed once the map has been loaded.  If the cache entry records that
+        there was no mapping file then entity mapping is disabled
+
+        :param cached_entry: Entity map cache entry
+        """
+        if cached_entry["ETag"] is None:
+            self.simpleEntityMatchingUsed = False
+            return
+
+        print("Using cached Entity Mapping file.")
+        self.simpleEntityMap = cached_entry["EntityMap"]
+        self.simpleEntityMatcher = cached_entry["Matcher"]
 
     def create_playback_mp3_audio(self, audio_uri):
         """
@@ -1060,7 +1360,7 @@ class TranscribeParser:
         fileObject = s3Object.path.lstrip('/')
         inputFilename = TMP_DIR + '/' + fileObject.split('/')[-1]
         outputFilename = inputFilename.split('.wav')[0] + '.mp3'
-        s3Client = boto3.client('s3')
+        s3Client = pcacommon.get_s3_client()
         s3Client.download_file(bucket, fileObject, inputFilename)
 
         # Transform the file via FFMPEG - this will exception if not installed
@@ -1082,15 +1382,25 @@ class TranscribeParser:
             pcacommon.remove_temp_file(inputFilename)
             pcacommon.remove_temp_file(outputFilename)
 
-    def parse_transcribe_file(self, sf_event):
+    def parse_transcribe_file(self, sf_event, pca_results=None):
         """
-        Parses the output from the specified Transcribe job
+        Parses the output from the specified Transcribe job.  Normally the header results are read in from the
+        interim results file and the full results are written back to it, but in fused mode the header results
+        are passed in and are left to be written out by the caller
+
+        :param sf_event: Step Functions event data
+        :param pca_results: Header results to use instead of reading the interim results file
         """
 
-        # First, load in what interim results we have so far
+        # First, load in what interim results we have so far - that's just the header, as we create the segments
         output_bucket = cf.appConfig[cf.CONF_S3BUCKET_OUTPUT]
         input_bucket = cf.appConfig[cf.CONF_S3BUCKET_INPUT]
-        self.pca_results.read_results_from_s3(output_bucket, sf_event["interimResultsFile"])
+        if pca_results is None:
+            self.pca_results.read_results_from_s3(output_bucket, sf_event["interimResultsFile"], header_only=True)
+        else:
+            self.pca_results = pca_results
+            self.analytics = pca_results.get_conv_analytics()
+            self.transcribe_job_info = self.analytics.get_transcribe_job()
         self.api_mode = self.pca_results.analytics.transcribe_job.api_mode
 
         # Put a playback audio file in the correct folder - this can have multiple sources
@@ -1098,20 +1408,20 @@ class TranscribeParser:
             # If we have redacted audio output from TCA then copy that to the playback folder
             redacted_url = "s3://" + "/".join(sf_event["redactedMediaFileUri"].split("/")[3:])
             s3_object = urlparse(redacted_url)
-            s3_client = boto3.resource("s3")
+            s3_client = pcacommon.get_s3_client()
             source = {"Bucket": s3_object.netloc, "Key": s3_object.path[1:]}
             dest_key = cf.appConfig[cf.CONF_PREFIX_AUDIO_PLAYBACK] + '/' + redacted_url.split('/')[-1]
-            s3_client.meta.client.copy(source, input_bucket, dest_key)
+            s3_client.copy(source, input_bucket, dest_key)
             self.audioPlaybackUri = "s3://" + input_bucket + "/" + dest_key
         elif (self.transcribe_job_info.media_format == "wav") and (self.transcribe_job_info.media_sample_rate == 8000):
                 # Certain type of WAV don't play nicely with the HTML playback control
                 self.create_playback_mp3_audio(self.analytics.transcribe_job.media_playback_uri)
         else:
             # Copy the original input file to the playback folder
-            s3_client = boto3.resource("s3")
+            s3_client = pcacommon.get_s3_client()
             source = {"Bucket": input_bucket, "Key": sf_event["key"]}
             dest_key = cf.appConfig[cf.CONF_PREFIX_AUDIO_PLAYBACK] + '/' + sf_event["key"].split('/')[-1]
-            s3_client.meta.client.copy(source, input_bucket, dest_key)
+            s3_client.copy(source, input_bucket, dest_key)
             self.audioPlaybackUri = "s3://" + input_bucket + "/" + dest_key
 
         # Pick out the config parameters that we need
@@ -1123,8 +1433,8 @@ class TranscribeParser:
         self.set_cust(job_name)
         self.calculate_transcribe_conversation_time(job_name)
 
-        # Download the job JSON results file to a local temp file - different Transcribe modes put the files in
-        # different folder structures, so strip everything past the bucket name to be the location of the tmp file
+        # Work out where the job JSON results file is - different Transcribe modes put the files in different
+        # folder structures, so strip everything past the bucket name to be the location of the tmp file
         json_filepath = TMP_DIR + '/' + sf_event["transcriptUri"].split("/")[-1]
         if sf_event["transcriptUri"].startswith("https"):
             # HTTPS URI came from Transcribe, so https://<region>/<bucket>/<key>
@@ -1133,17 +1443,26 @@ class TranscribeParser:
             # S3 URI came from Transcribe, so s3://<bucket>/<key>
             transcriptResultsKey = "/".join(sf_event["transcriptUri"].split("/")[3:])
 
-        # Now download - this has been known to get a "404 HeadObject Not Found",
+        # Now open or download it - this has been known to get a "404 HeadObject Not Found",
         # which makes no sense, so if that happens then re-try in a sec.  Only once.
-        s3Client = boto3.client('s3')
-        try:
-            s3Client.download_file(output_bucket, transcriptResultsKey, json_filepath)
-        except:
-            time.sleep(3)
-            s3Client.download_file(output_bucket, transcriptResultsKey, json_filepath)
+        s3Client = pcacommon.get_s3_client()
+        if TRANSCRIPT_STREAMING:
+            # The transcript arrays are streamed while the turn-by-turn segments are being created
+            try:
+                results_body = s3Client.get_object(Bucket=output_bucket, Key=transcriptResultsKey)["Body"]
+            except:
+                time.sleep(3)
+                results_body = s3Client.get_object(Bucket=output_bucket, Key=transcriptResultsKey)["Body"]
+            self.asr_stream = pcajsonstream.JSONStreamReader(results_body, TRANSCRIPT_ARRAY_PATHS)
+        else:
+            try:
+                s3Client.download_file(output_bucket, transcriptResultsKey, json_filepath)
+            except:
+                time.sleep(3)
+                s3Client.download_file(output_bucket, transcriptResultsKey, json_filepath)
 
-        # Load in the JSON file for processing, and set our language codes for the file and Comprehend
-        self.asr_output = json.load(open(Path(json_filepath).absolute(), "r", encoding="utf-8"))
+            # Load in the JSON file for processing
+            self.asr_output = json.load(open(Path(json_filepath).absolute(), "r", encoding="utf-8"))
 
         # Before we process, let's load up any required simply entity map, which needs the base language code
         self.set_comprehend_language_code()
@@ -1158,16 +1477,21 @@ class TranscribeParser:
         # Update summary structures
         self.process_tca_summary()
 
-        # Write out the JSON data back to our interim S3 location
-        json_output, output_filename = self.pca_results.write_results_to_s3(bucket=output_bucket,
-                                                                            object_key=sf_event["interimResultsFile"])
+        # Write out the JSON data back to our interim S3 location, unless our caller is going to write it
+        if pca_results is None:
+            json_output, output_filename = self.pca_results.write_results_to_s3(
+                bucket=output_bucket, object_key=sf_event["interimResultsFile"])
+            conversationAnalytics = json_output["ConversationAnalytics"]
 
         # Index transcript in Kendra, if transcript search is enable
         kendraIndexId = cf.appConfig[cf.CONF_KENDRA_INDEX_ID]
         if kendraIndexId != "None":
+            # Kendra support is only loaded when it's enabled, as nothing else needs it
+            from pcakendrasearch import prepare_transcript, put_kendra_document
             analysisUri = f"{cf.appConfig[cf.CONF_WEB_URI]}dashboard/parsedFiles/{json_filepath.split('/')[-1]}"
             transcript_with_markers = prepare_transcript(self.pca_results)
-            conversationAnalytics = json_output["ConversationAnalytics"]
+            if pca_results is not None:
+                conversationAnalytics = self.analytics.create_json_output()
             put_kendra_document(kendraIndexId, analysisUri, conversationAnalytics, transcript_with_markers)
 
         # Finally, remove any Step Functions data that we don't need to pass on (they won't all exist)
@@ -1182,7 +1506,7 @@ class TranscribeParser:
 def lambda_handler(event, context):
     # Load our configuration data
     sf_data = copy.deepcopy(event)
-    cf.loadConfiguration()
+    cf.loadEventConfiguration(sf_data)
 
     # Instantiate our parser and write out our processed file
     transcribeParser = TranscribeParser(cf.appConfig[cf.CONF_MINPOSITIVE],
@@ -8,23 +8,23 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import copy
-import boto3
-from botocore.config import Config
+import json
 import subprocess
 import pcaconfiguration as cf
 import pcacommon
+import pcaaudioheader
 import os
 import time
 
 # Local temporary folder for file-based operations
 TMP_DIR = "/tmp/"
 
-config = Config(
-   retries = {
+config = {
+   'retries': {
       'max_attempts': 100,
       'mode': 'adaptive'
    }
-)
+}
 
 def check_existing_job_status(job_name, transcribe, api_mode):
     """
@@ -70,48 +70,67 @@ def delete_existing_job(job_name, transcribe, api_mode):
         print(f"Unable to delete previous Transcribe job {job_name}: {e}")
 
 
-def extract_audio_metadata(bucket, key):
+def ffprobe_audio_metadata(bucket, key):
     """
-    Examines an audio file using the FFPROBE utility to determine (1) the number of audio channels in the file, and
-    (2) if the audio is a NarrowBand audio file < 16000 Hz sample rate.  If errors occur these will default to
-    1 (mono audio) and True (NarrowBand) respectively
+    Downloads an audio file and uses a single call to the FFPROBE utility to find the number of audio channels and
+    the sample rate of its first audio stream.  This is only used for files whose headers we can't read directly
 
     @param bucket: Bucket holding the audio file to be tested
     @param key: Key for the audio file in the bucket
-    @return: Number of audio channels found in the file
-    @return: Flag indicating if audio is sub-8khz/NarrowBand (True) or 16khz+/WideBand (False)
+    @return: Number of audio channels found in the file, or None if it couldn't be found
+    @return: Sample rate of the audio, or None if it couldn't be found
     """
-
     # First, we need to download the original audio file
     ffmpegInputFilename = TMP_DIR + key.split('/')[-1]
-    s3Client = boto3.client('s3')
+    s3Client = pcacommon.get_s3_client()
     s3Client.download_file(bucket, key, ffmpegInputFilename)
 
-    # Use ffprobe to count the number of channels in the audio file
-    try:
-        command = ['ffprobe', '-i', ffmpegInputFilename, '-show_entries', 'stream=channels', '-select_streams',
-                   'a:0', '-of', 'compact=p=0:nk=1', '-v', '0']
-        probResult = subprocess.check_output(command, stderr=subprocess.STDOUT).decode()
-        channels_found = int(probResult)
-    except Exception as e:
-        print(f'Failed to get number of audio streams from input file: {str(e)}')
-        channels_found = 1
-
-
-    # Use ffprobe to get the sample rate and decide if it's wideband or narrowband
+    channels_found = None
+    sample_rate = None
     try:
-        command = ['ffprobe', '-i', ffmpegInputFilename, '-show_entries', 'stream=sample_rate', '-select_streams',
-                   'a:0', '-of', 'compact=p=0:nk=1', '-v', '0']
+        command = ['ffprobe', '-i', ffmpegInputFilename, '-show_entries', 'stream=channels,sample_rate',
+                   '-select_streams', 'a:0', '-of', 'json', '-v', '0']
         probResult = subprocess.check_output(command, stderr=subprocess.STDOUT).decode()
-        sample_rate = int(probResult)
-        is_narrowband = (sample_rate < 16000)
+        stream = json.loads(probResult)["streams"][0]
+        try:
+            channels_found = int(stream["channels"])
+        except Exception as e:
+            print(f'Failed to get number of audio channels from input file: {str(e)}')
+        try:
+            sample_rate = int(stream["sample_rate"])
+        except Exception as e:
+            print(f'Failed to get sample rate from input file: {str(e)}')
     except Exception as e:
-        print(f'Failed to get number of audio streams from input file: {str(e)}')
-        is_narrowband = True
+        print(f'Failed to probe the audio streams of input file: {str(e)}')
     finally:
         # Delete our downloaded audio
         pcacommon.remove_temp_file(ffmpegInputFilename)
 
+    return channels_found, sample_rate
+
+
+def extract_audio_metadata(bucket, key):
+    """
+    Examines an audio file to determine (1) the number of audio channels in the file, and (2) if the audio is a
+    NarrowBand audio file < 16000 Hz sample rate.  These are read from the file's headers if it's a format that we
+    understand, which only needs the start of the file, otherwise the file is downloaded and examined using the
+    FFPROBE utility.  If errors occur these will default to 1 (mono audio) and True (NarrowBand) respectively
+
+    @param bucket: Bucket holding the audio file to be tested
+    @param key: Key for the audio file in the bucket
+    @return: Number of audio channels found in the file
+    @return: Flag indicating if audio is sub-8khz/NarrowBand (True) or 16khz+/WideBand (False)
+    """
+    audio_header = pcaaudioheader.read_s3_audio_header(bucket, key)
+    if audio_header is not None:
+        channels_found, sample_rate = audio_header
+    else:
+        channels_found, sample_rate = ffprobe_audio_metadata(bucket, key)
+
+    if channels_found is None:
+        channels_found = 1
+    is_narrowband = (sample_rate is None) or (sample_rate < 16000)
+
     return channels_found, is_narrowband
 
 
@@ -157,7 +176,7 @@ def submitTranscribeJob(bucket, key):
     """
 
     # Work out our API mode for Transcribe, and get our boto3 client
-    transcribe = boto3.client('transcribe', config=config)
+    transcribe = pcacommon.get_client('transcribe', config_options=config)
     api_mode, channel_ident, base_model_name = evaluate_transcribe_mode(bucket, key)
 
     # Generate job-name - delete if it already exists
@@ -429,8 +448,8 @@ def evaluate_transcribe_mode(bucket, key):
 
 def lambda_handler(event, context):
     # Load our configuration data
-    cf.loadConfiguration()
     sfData = copy.deepcopy(event)
+    cf.loadEventConfiguration(sfData)
 
     # Get the object from the event and show its content type
     bucket = sfData["bucket"]
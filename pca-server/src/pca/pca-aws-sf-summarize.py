@@ -5,15 +5,13 @@ It performs summarization of the call if summarization was enabled.
 Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
-import boto3
 import os
 import pcaconfiguration as cf
+import pcacommon
 import pcaresults
 import json
 import re
-import requests
 from botocore.exceptions import ClientError
-from botocore.config import Config
 
 
 AWS_REGION = os.environ["AWS_REGION_OVERRIDE"] if "AWS_REGION_OVERRIDE" in os.environ else os.environ["AWS_REGION"]
@@ -30,21 +28,18 @@ LLM_TABLE_NAME = os.getenv('LLM_TABLE_NAME')
 
 MAX_TOKENS = int(os.getenv('MAX_TOKENS','256'))
 
-lambda_client = boto3.client('lambda')
 bedrock_client = None
-s3Client = boto3.client('s3')
-dynamodb_client = boto3.client('dynamodb')
 
-config = Config(
-   retries = {
+config = {
+   'retries': {
       'max_attempts': 100,
       'mode': 'adaptive'
    }
-)
+}
 
 def get_third_party_llm_secret():
     print("Getting API key from Secrets Manager")
-    secrets_client = boto3.client('secretsmanager')
+    secrets_client = pcacommon.get_client('secretsmanager')
     try:
         response = secrets_client.get_secret_value(
             SecretId=ANTHROPIC_API_KEY
@@ -56,7 +51,7 @@ def get_third_party_llm_secret():
 
 def get_bedrock_client():
     print("Connecting to Bedrock Service: ", BEDROCK_ENDPOINT_URL)
-    client = boto3.client(service_name='bedrock-runtime', region_name=AWS_REGION, endpoint_url=BEDROCK_ENDPOINT_URL, config=config)
+    client = pcacommon.get_client('bedrock-runtime', region_name=AWS_REGION, endpoint_url=BEDROCK_ENDPOINT_URL, config_options=config)
     return client
     
 def get_bedrock_request_body(modelId, parameters, prompt):
@@ -119,7 +114,7 @@ def call_bedrock(parameters, prompt):
 def generate_sagemaker_summary(transcript):
     summary = 'An error occurred generating Sagemaker summary.'
     endpoint = os.getenv('SUMMARY_SAGEMAKER_ENDPOINT','')
-    runtime = boto3.Session().client('sagemaker-runtime')
+    runtime = pcacommon.get_client('sagemaker-runtime')
     payload = {'inputs': transcript}
 
     response = runtime.invoke_endpoint(EndpointName=endpoint, 
@@ -139,6 +134,7 @@ def generate_sagemaker_summary(transcript):
 def get_templates_from_dynamodb():
     templates = []
     try:
+        dynamodb_client = pcacommon.get_client('dynamodb')
         SUMMARY_PROMPT_TEMPLATE = dynamodb_client.get_item(Key={'LLMPromptTemplateId': {'S': 'LLMPromptSummaryTemplate'}},
                                                      TableName=LLM_TABLE_NAME)
 
@@ -158,6 +154,8 @@ def get_templates_from_dynamodb():
     return templates
 
 def generate_anthropic_summary(transcript):
+    # Only the Anthropic summarizer needs requests, so it isn't loaded unless it is used
+    import requests
 
     # first check to see if this is one prompt, or many prompts as a json
     templates = get_templates_from_dynamodb()
@@ -237,7 +235,9 @@ def get_transcript_str(interimResultsFile):
         'tokenCount': TOKEN_COUNT 
     }
     print(payload)
-    transcript_response = lambda_client.invoke(
+    if cf.CONFIG_SNAPSHOTS:
+        payload[cf.CONFIG_SNAPSHOT_KEY] = cf.createConfigSnapshot()
+    transcript_response = pcacommon.get_client('lambda').invoke(
         FunctionName=FETCH_TRANSCRIPT_LAMBDA_ARN,
         InvocationType='RequestResponse',
         Payload=json.dumps(payload)
@@ -252,7 +252,7 @@ def generate_custom_lambda_summary(interimResultsFile):
         'interimResultsFile': interimResultsFile,
     }
     print(payload)
-    lambda_response = lambda_client.invoke(
+    lambda_response = pcacommon.get_client('lambda').invoke(
         FunctionName=SUMMARY_LAMBDA_ARN,
         InvocationType='RequestResponse',
         Payload=json.dumps(payload)
@@ -262,23 +262,18 @@ def generate_custom_lambda_summary(interimResultsFile):
     print(response_json)
     return response_json
 
-def lambda_handler(event, context):
-    """
-    Lambda function entrypoint
+def summarize_results(pca_results, interim_results_file, transcript_str=None):
     """
-    
-    print(event)
-
-    # Load our configuration data
-    cf.loadConfiguration()
+    Generates the call summary using the configured summarizer and adds it to the results.  The custom Lambda
+    summarizer reads the interim results file itself, so that must be up to date before this is called
 
-    # Load in our existing interim CCA results
-    pca_results = pcaresults.PCAResults()
-    pca_results.read_results_from_s3(cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], event["interimResultsFile"])
-
-    # --------- Summarize Here ----------
+    :param pca_results: PCA results to be summarized
+    :param interim_results_file: Key of the interim results file in the output bucket
+    :param transcript_str: Text transcript to summarize - if not supplied it comes from the fetch transcript Lambda
+    """
     summary = 'No Summary Available'
-    transcript_str = get_transcript_str(event["interimResultsFile"])
+    if transcript_str is None:
+        transcript_str = get_transcript_str(interim_results_file)
     summary_json = None
 
     if SUMMARIZE_TYPE == 'SAGEMAKER':
@@ -308,7 +303,11 @@ def lambda_handler(event, context):
             print(err)
     elif SUMMARIZE_TYPE == 'LAMBDA':
         try:
-            summary_json = generate_custom_lambda_summary(event["interimResultsFile"])
+            # The custom Lambda reads the interim results file itself, so it can't see a header patch
+            if pca_results.source_has_patch:
+                pca_results.write_results_to_s3(bucket=cf.appConfig[cf.CONF_S3BUCKET_OUTPUT],
+                                                object_key=interim_results_file, delta=False)
+            summary_json = generate_custom_lambda_summary(interim_results_file)
         except Exception as err:
             summary = 'An error occurred generating summary with custom Lambda function'
             print(err)
@@ -324,7 +323,28 @@ def lambda_handler(event, context):
         pca_results.analytics.summary = {}
         pca_results.analytics.summary['Summary'] = summary
         print("Summary: " + summary)
+
+
+def lambda_handler(event, context):
+    """
+    Lambda function entrypoint
+    """
     
+    print(event)
+
+    # Load our configuration data
+    cf.loadEventConfiguration(event)
+
+    # Load in our existing interim CCA results - the summary only changes the header, so with delta writes we
+    # only need to read that, unless a custom Lambda needs the file to be complete
+    pca_results = pcaresults.PCAResults()
+    header_only = pcaresults.RESULTS_DELTA_WRITES and (SUMMARIZE_TYPE != 'LAMBDA')
+    pca_results.read_results_from_s3(cf.appConfig[cf.CONF_S3BUCKET_OUTPUT], event["interimResultsFile"],
+                                     header_only=header_only)
+
+    # --------- Summarize Here ----------
+    summarize_results(pca_results, event["interimResultsFile"])
+
     # Write out back to interim file
     pca_results.write_results_to_s3(bucket=cf.appConfig[cf.CONF_S3BUCKET_OUTPUT],
                                     object_key=event["interimResultsFile"])
@@ -6,17 +6,16 @@ associated with this execution.
 Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
-import boto3
 import pcaconfiguration as cf
+import pcacommon
 
 def lambda_handler(event, context):
     """
     When a file has failed to transcribe then we need to move the original audio to the "failed" bucket
     """
     # Extract params and ready our client
-    cf.loadConfiguration()
-    s3Client = boto3.client("s3")
-    s3 = boto3.resource('s3')
+    cf.loadEventConfiguration(event)
+    s3Client = pcacommon.get_s3_client()
     origBucket = event["bucket"]
     origFileKey = event["key"]
 
@@ -28,7 +27,7 @@ def lambda_handler(event, context):
             'Bucket': origBucket,
             'Key': origFileKey
         }
-        s3.meta.client.copy(copy_source, origBucket, copyDestnKey)
+        s3Client.copy(copy_source, origBucket, copyDestnKey)
         s3Client.delete_object(Bucket=origBucket, Key=origFileKey)
     except Exception as e:
         print(e)
@@ -7,8 +7,8 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import json
-import boto3
 import os
+import pcacommon
 
 
 def lambda_handler(event, context):
@@ -33,7 +33,7 @@ def lambda_handler(event, context):
         raise Exception('No Transcribe job called \'{}\' exists.'.format(jobName))
 
     # Insert/Update tracking entry between Transcribe job and the Step Function
-    ddbClient = boto3.client("dynamodb")
+    ddbClient = pcacommon.get_client("dynamodb")
     response = ddbClient.put_item(Item={
                                     'PKJobId': {'S': jobName},
                                     'SKApiMode': {'S': api_mode},
@@ -7,10 +7,10 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import json
-import boto3
 import time
 import os
 import pcaconfiguration as cf
+import pcacommon
 
 # Total number of retry attempts to make
 RETRY_LIMIT = 2
@@ -22,7 +22,7 @@ def lambda_handler(event, context):
 
     # Mapping of event type to Transcribe API type, which defines the
     # Transcribe call method and tags to use when looking up the jobs status
-    transcribe = boto3.client("transcribe")
+    transcribe = pcacommon.get_client("transcribe")
     TRANSCRIBE_API_MAP = {
         "Transcribe Job State Change": {
             "mode": cf.API_STANDARD,
@@ -57,7 +57,7 @@ def lambda_handler(event, context):
             job_status = response[api_map["status_tag"]]
 
             # Read tracking entry between Transcribe job and its Step Function
-            ddbClient = boto3.client("dynamodb")
+            ddbClient = pcacommon.get_client("dynamodb")
             tracking = ddbClient.get_item(Key={'PKJobId': {'S': job_name}, 'SKApiMode': {'S': api_mode}},
                                           TableName=DDB_TRACKING_TABLE)
 
@@ -100,7 +100,7 @@ def lambda_handler(event, context):
 
             # All complete - continue our workflow with this status/retry count
             eventStatus["transcribeStatus"] = finalResponse
-            sfnClient = boto3.client("stepfunctions")
+            sfnClient = pcacommon.get_client("stepfunctions")
             sfnClient.send_task_success(taskToken=taskToken,
                                         output=json.dumps(eventStatus))
 
@@ -0,0 +1,306 @@
+"""
+This python function is part of the main processing workflow.  It reads the number of channels and the sample rate
+of an audio file straight from the headers of WAV, MP3, FLAC and Ogg (Vorbis, Opus or FLAC) files.  Only the start of
+the file is needed, which is read from S3 with ranged GETs, so the audio never has to be downloaded - if a header is
+further into the file than the first read, such as after a large ID3 tag, then just that part is read as well.
+
+Any other format, or a file whose headers we can't make sense of, returns None so that the caller can fall back to
+probing the whole file with FFPROBE.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import struct
+import pcacommon
+
+# Number of bytes fetched by each ranged GET - the headers that we need are almost always in the first one
+AUDIO_HEADER_READ_SIZE = int(os.getenv("AUDIO_HEADER_READ_SIZE", str(16 * 1024)))
+
+# Maximum number of ranged GETs for one file before we give up and let FFPROBE deal with it
+AUDIO_HEADER_MAX_READS = 4
+
+# Number of bytes of an MP3 file that we search for the first frame, after any ID3 tag
+MP3_FRAME_SEARCH_SIZE = AUDIO_HEADER_READ_SIZE
+
+# MP3 frame header lookup tables, indexed by the fields of the header - a bitrate of 0 means a free-format stream
+MP3_VERSION_MPEG1 = 3
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+MP3_BITRATES = {
+    (MP3_VERSION_MPEG1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (MP3_VERSION_MPEG1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (MP3_VERSION_MPEG1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    ("MPEG2", 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    ("MPEG2", 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    ("MPEG2", 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+MP3_CHANNEL_MODE_MONO = 3
+
+# Opus always decodes at 48kHz, whatever the rate of the original audio was, and FFPROBE reports it that way too
+OPUS_SAMPLE_RATE = 48000
+
+
+class S3RangeReader:
+    """
+    Reads parts of an S3 object with ranged GETs, remembering what has already been read so that overlapping
+    reads of the headers don't go back to S3
+    """
+    def __init__(self, bucket, key, read_size=AUDIO_HEADER_READ_SIZE):
+        """
+        :param bucket: Bucket holding the object
+        :param key: Key of the object
+        :param read_size: Minimum number of bytes to fetch with each ranged GET
+        """
+        self.bucket = bucket
+        self.key = key
+        self.read_size = read_size
+        self.object_size = None
+        self.ranges = []
+        self.request_count = 0
+        self.bytes_read = 0
+
+    def read(self, offset, length):
+        """
+        Returns the requested bytes of the object, which will be shorter than asked for at the end of the object
+
+        :param offset: Offset of the first byte to read
+        :param length: Number of bytes to read
+        :return: Bytes that were read
+        """
+        # See if we have already read this part of the object
+        for range_start, range_data in self.ranges:
+            if range_start <= offset and offset + length <= range_start + len(range_data):
+                return range_data[offset - range_start:offset + length - range_start]
+            if range_start <= offset and range_start + len(range_data) == self.object_size:
+                return range_data[offset - range_start:]
+        if ((self.object_size is not None) and (offset >= self.object_size)) or (length <= 0):
+            return b""
+        if self.request_count >= AUDIO_HEADER_MAX_READS:
+            raise ValueError(f"Audio header of {self.key} needs more than {AUDIO_HEADER_MAX_READS} reads")
+
+        # Fetch a new block, which will be at least our read size
+        range_end = offset + max(length, self.read_size) - 1
+        response = pcacommon.get_s3_client().get_object(Bucket=self.bucket, Key=self.key,
+                                                        Range=f"bytes={offset}-{range_end}")
+        range_data = response["Body"].read()
+        self.request_count += 1
+        self.bytes_read += len(range_data)
+        if "ContentRange" in response:
+            self.object_size = int(response["ContentRange"].split("/")[-1])
+        else:
+            # Whole object was returned, which S3 does if the object is smaller than the range
+            self.object_size = offset + len(range_data)
+        self.ranges.append((offset, range_data))
+        return range_data[:length]
+
+
+class BytesRangeReader:
+    """
+    Reads parts of audio data that is already held in memory, in the same way as S3RangeReader
+    """
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, offset, length):
+        return self.data[offset:offset + length]
+
+
+def get_id3_tag_size(reader, offset=0):
+    """
+    Returns the size of any ID3v2 tag at the given offset, which is found at the start of many MP3 files and
+    some FLAC files, and has to be skipped to reach the audio headers
+
+    :param reader: Reader for the audio data
+    :param offset: Offset to look for the tag
+    :return: Size of the tag, including its header and any footer, or 0 if there isn't one
+    """
+    header = reader.read(offset, 10)
+    if (len(header) < 10) or (header[:3] != b"ID3"):
+        return 0
+    tag_size = 10 + ((header[6] & 0x7f) << 21) + ((header[7] & 0x7f) << 14) + ((header[8] & 0x7f) << 7) + \
+        (header[9] & 0x7f)
+    if header[5] & 0x10:
+        tag_size += 10
+    return tag_size
+
+
+def parse_wav_header(reader):
+    """
+    Reads the channels and sample rate from the fmt chunk of a RIFF, RIFX or RF64 WAV file, walking along the chunks
+    until we find it.  WAVE_FORMAT_EXTENSIBLE files keep these fields in the same place as other WAV files
+
+    :param reader: Reader for the audio data
+    :return: Number of channels and sample rate, or None if this isn't a WAV file that we can read
+    """
+    header = reader.read(0, 12)
+    if (len(header) < 12) or (header[:4] not in [b"RIFF", b"RIFX", b"RF64"]) or (header[8:12] != b"WAVE"):
+        return None
+    endian = ">" if header[:4] == b"RIFX" else "<"
+
+    offset = 12
+    while True:
+        chunk_header = reader.read(offset, 8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id = chunk_header[:4]
+        chunk_size = struct.unpack(endian + "I", chunk_header[4:8])[0]
+        if chunk_id == b"fmt ":
+            fmt_data = reader.read(offset + 8, 8)
+            if len(fmt_data) < 8:
+                return None
+            audio_format, channels, sample_rate = struct.unpack(endian + "HHI", fmt_data)
+            return channels, sample_rate
+        elif chunk_id == b"data":
+            # The format has to come before the audio data
+            return None
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+
+def parse_flac_streaminfo(streaminfo):
+    """
+    Reads the channels and sample rate from a FLAC STREAMINFO metadata block
+
+    :param streaminfo: Data of the STREAMINFO block, without its block header
+    :return: Number of channels and sample rate, or None if the block is too short
+    """
+    if len(streaminfo) < 18:
+        return None
+    packed_fields = int.from_bytes(streaminfo[10:13], "big")
+    sample_rate = packed_fields >> 4
+    channels = ((packed_fields >> 1) & 0x07) + 1
+    return channels, sample_rate
+
+
+def parse_flac_header(reader):
+    """
+    Reads the channels and sample rate from a FLAC file, whose first metadata block must be STREAMINFO
+
+    :param reader: Reader for the audio data
+    :return: Number of channels and sample rate, or None if this isn't a FLAC file that we can read
+    """
+    offset = get_id3_tag_size(reader)
+    header = reader.read(offset, 4 + 4 + 34)
+    if (len(header) < 8) or (header[:4] != b"fLaC") or ((header[4] & 0x7f) != 0):
+        return None
+    return parse_flac_streaminfo(header[8:])
+
+
+def parse_ogg_header(reader):
+    """
+    Reads the channels and sample rate from the identification header of an Ogg file, which is the first packet
+    of the first page, and can be Vorbis, Opus or FLAC
+
+    :param reader: Reader for the audio data
+    :return: Number of channels and sample rate, or None if this isn't an Ogg file that we can read
+    """
+    page_header = reader.read(0, 27)
+    if (len(page_header) < 27) or (page_header[:4] != b"OggS"):
+        return None
+    segment_count = page_header[26]
+    packet = reader.read(27 + segment_count, 64)
+
+    if packet[:7] == b"\x01vorbis" and len(packet) >= 16:
+        channels = packet[11]
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        return channels, sample_rate
+    elif packet[:8] == b"OpusHead" and len(packet) >= 10:
+        channels = packet[9]
+        return channels, OPUS_SAMPLE_RATE
+    elif packet[:5] == b"\x7fFLAC" and packet[9:13] == b"fLaC":
+        return parse_flac_streaminfo(packet[17:])
+    return None
+
+
+def parse_mp3_frame_header(frame_header):
+    """
+    Decodes an MPEG audio frame header
+
+    :param frame_header: Four bytes that might be a frame header
+    :return: Number of channels, sample rate and frame length, or None if this isn't a valid frame header.  The
+             frame length is 0 for free-format frames, as we can't tell how long they are
+    """
+    if (len(frame_header) < 4) or (frame_header[0] != 0xff) or ((frame_header[1] & 0xe0) != 0xe0):
+        return None
+    version = (frame_header[1] >> 3) & 0x03
+    layer = 4 - ((frame_header[1] >> 1) & 0x03)
+    bitrate_index = frame_header[2] >> 4
+    sample_rate_index = (frame_header[2] >> 2) & 0x03
+    padding = (frame_header[2] >> 1) & 0x01
+    channel_mode = frame_header[3] >> 6
+    if (version == 1) or (layer == 4) or (bitrate_index == 0x0f) or (sample_rate_index == 3):
+        return None
+
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    bitrate = MP3_BITRATES[(version if version == MP3_VERSION_MPEG1 else "MPEG2", layer)][bitrate_index] * 1000
+    if layer == 1:
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif (layer == 3) and (version != MP3_VERSION_MPEG1):
+        frame_length = 72 * bitrate // sample_rate + padding
+    else:
+        frame_length = 144 * bitrate // sample_rate + padding
+    channels = 1 if channel_mode == MP3_CHANNEL_MODE_MONO else 2
+    return channels, sample_rate, frame_length
+
+
+def parse_mp3_header(reader):
+    """
+    Reads the channels and sample rate from the first frame of an MP3 file, after any ID3 tag.  As a frame header
+    is just a few bits, a match only counts if the next frame header straight after it matches as well
+
+    :param reader: Reader for the audio data
+    :return: Number of channels and sample rate, or None if this isn't an MP3 file that we can read
+    """
+    offset = get_id3_tag_size(reader)
+    data = reader.read(offset, MP3_FRAME_SEARCH_SIZE)
+    position = data.find(b"\xff")
+    while 0 <= position < len(data) - 4:
+        frame = parse_mp3_frame_header(data[position:position + 4])
+        if frame is not None:
+            channels, sample_rate, frame_length = frame
+            next_frame = data[position + frame_length:position + frame_length + 4]
+            if (frame_length == 0) or (len(next_frame) < 4):
+                # Can't check the next frame, so only believe this one if it's right at the start
+                if position == 0:
+                    return channels, sample_rate
+            else:
+                next_frame = parse_mp3_frame_header(next_frame)
+                if (next_frame is not None) and (next_frame[1] == sample_rate):
+                    return channels, sample_rate
+        position = data.find(b"\xff", position + 1)
+    return None
+
+
+def read_audio_header(reader):
+    """
+    Reads the number of channels and the sample rate from the headers of an audio file, trying each of the
+    formats that we understand in turn.  The format is picked by the file's contents, not its name
+
+    :param reader: Reader for the audio data, either S3RangeReader or BytesRangeReader
+    :return: Number of channels and sample rate, or None if the format isn't one that we can read
+    """
+    for parser in [parse_wav_header, parse_flac_header, parse_ogg_header, parse_mp3_header]:
+        header = parser(reader)
+        if header is not None:
+            channels, sample_rate = header
+            if (channels > 0) and (sample_rate > 0):
+                return channels, sample_rate
+    return None
+
+
+def read_s3_audio_header(bucket, key):
+    """
+    Reads the number of channels and the sample rate from the headers of an audio file in S3, reading just the
+    start of the file.  Any failure returns None, so that the caller can fall back to FFPROBE
+
+    :param bucket: Bucket holding the audio file
+    :param key: Key for the audio file in the bucket
+    :return: Number of channels and sample rate, or None if they couldn't be read from the headers
+    """
+    reader = S3RangeReader(bucket, key)
+    try:
+        header = read_audio_header(reader)
+    except Exception as e:
+        print(f"Unable to read the audio header of {key}: {str(e)}")
+        header = None
+    print(f"Audio header of {key}: {header}, using {reader.request_count} ranged GETs for {reader.bytes_read} bytes")
+    return header
@@ -6,10 +6,62 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import os
-import time
+import json
+import threading
 import subprocess
+import boto3
+from botocore.config import Config
 import pcaconfiguration as cf
 
+# Settings for all of the boto3 clients created by get_client() - the pool is large enough for our worker threads,
+# TCP keepalive stops idle connections being dropped between the invocations of a warm Lambda, and adaptive
+# retries back off when a service starts to throttle us
+CLIENT_MAX_POOL_CONNECTIONS = int(os.getenv("CLIENT_MAX_POOL_CONNECTIONS", "32"))
+CLIENT_TCP_KEEPALIVE = os.getenv("CLIENT_TCP_KEEPALIVE", "true").lower() == "true"
+CLIENT_MAX_ATTEMPTS = int(os.getenv("CLIENT_MAX_ATTEMPTS", "10"))
+
+# boto3 clients are thread-safe, so one client per service, region, endpoint and config is shared by everything
+# in the container, and its connection pool is re-used across invocations
+_boto3_clients = {}
+_boto3_clients_lock = threading.Lock()
+
+
+def get_client(service_name, region_name=None, endpoint_url=None, config_options=None):
+    """
+    Returns the shared boto3 client for a service, creating it the first time that it is asked for.  The client
+    uses our default client settings, along with any overrides given in config_options
+
+    :param service_name: Name of the AWS service, e.g. "s3"
+    :param region_name: Region to use, or None for the Lambda's own region
+    :param endpoint_url: Endpoint URL to use, or None for the service's default endpoint
+    :param config_options: Dictionary of botocore Config settings that override the defaults
+    :return: boto3 client
+    """
+    config_options = config_options or {}
+    client_key = (service_name, region_name, endpoint_url, json.dumps(config_options, sort_keys=True))
+    client = _boto3_clients.get(client_key)
+    if client is None:
+        with _boto3_clients_lock:
+            client = _boto3_clients.get(client_key)
+            if client is None:
+                config = Config(max_pool_connections=CLIENT_MAX_POOL_CONNECTIONS,
+                                tcp_keepalive=CLIENT_TCP_KEEPALIVE,
+                                retries={"max_attempts": CLIENT_MAX_ATTEMPTS, "mode": "adaptive"})
+                client = boto3.client(service_name, region_name=region_name, endpoint_url=endpoint_url,
+                                      config=config.merge(Config(**config_options)))
+                _boto3_clients[client_key] = client
+    return client
+
+
+def get_s3_client():
+    """
+    Returns the shared S3 client.  This also handles managed transfers, such as copy() and download_file(),
+    so there is no need for an S3 resource object
+
+    :return: boto3 S3 client
+    """
+    return get_client("s3")
+
 
 def generate_job_name(object_path):
     """
@@ -60,36 +112,21 @@ def ffprobe_get_stream_entries(select_data, filename):
     return prob_result.strip('\n')
 
 
-def comprehend_single_sentiment(text, lang_code, scalar=1.0, client=None):
+def get_comprehend_language_code(language_code):
     """
-    Perform sentiment analysis of the text against the current language.  A pre-initialised boto3
-    instance can be provided for Comprehend, but a new one will be created if required.  All sentiment
-    values are scaled, as Transcribe Call Analytics sentiment trends assume +/- 5.0 for the range,
-    whereas Comprehend uses +/- 1.0.
-
-    :param text: Text to be examined for sentiment
-    :param lang_code: Language for the Comprehend API check
-    :param scalar: Scaling factor to use
-    :param client: Pre-initialised boto3 client for the Comprehend APIs
-    :return:
-    """
-    sentimentResponse = {}
-    counter = 0
-    while sentimentResponse == {}:
-        try:
-            # Get the sentiment, and strip off the MIXED response (as we won't be using it)
-            sentimentResponse = client.detect_sentiment(Text=text, LanguageCode=lang_code)
-            sentimentResponse["SentimentScore"].pop("Mixed", None)
-
-            # Now scale our remaining values
-            for sentiment_key in sentimentResponse["SentimentScore"]:
-                sentimentResponse["SentimentScore"][sentiment_key] *= scalar
-        except Exception as e:
-            if counter < cf.NLP_THROTTLE_RETRIES:
-                counter += 1
-                time.sleep(3)
-            else:
-                raise e
-
-    return sentimentResponse
+    Returns the best-match language code for Comprehend to use for a conversation in the specified language.
+    It is "best-match" as Comprehend can model in EN, but has no differentiation between EN-US and EN-GB.  If
+    we cannot determine a language then an empty string is returned, as Comprehend standard models cannot be used
 
+    :param language_code: Language code of the conversation, e.g. en-US
+    :return: Comprehend language code, or an empty string if there isn't one
+    """
+    try:
+        for checkLangCode in cf.appConfig[cf.CONF_COMP_LANGS]:
+            if language_code.startswith(checkLangCode):
+                return checkLangCode
+    except:
+        # If anything fails - e.g. no language  string - then we have no language for Comprehend
+        pass
+
+    return ""
@@ -6,8 +6,12 @@ functions to check some logical conditions of some of these configuration parame
 Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
-import boto3
-from botocore.config import Config
+import os
+import copy
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 # Parameter Store Field Names used by main workflow
 CONF_COMP_LANGS = "ComprehendLanguages"
@@ -70,18 +74,79 @@ SPEAKER_MODES = [SPEAKER_MODE_SPEAKER, SPEAKER_MODE_CHANNEL, SPEAKER_MODE_AUTO]
 # Vocabulary filter modes - gets reset to "" if configured value is not one of the list
 VOCAB_FILTER_MODES = {"remove", "mask", "tag"}
 
-# Other defined constant values
-NLP_THROTTLE_RETRIES = 3
-
 # Configuration data
 appConfig = {}
 
-config = Config(
-   retries = {
+# The configuration is cached for the life of a warm Lambda container, and is only re-loaded from Parameter Store
+# once it is older than this TTL, or if the cache is invalidated.  A TTL of 0 re-loads it every time
+CONFIG_CACHE_TTL_SECS = int(os.getenv("CONFIG_CACHE_TTL_SECS", "300"))
+config_loaded_at = None
+
+# The first step of a workflow attaches a snapshot of the configuration to the Step Functions event, under this key,
+# and later steps use that rather than re-loading it from Parameter Store, so every step of a call sees the same
+# configuration.  Snapshots from a different version of this code are ignored and the configuration is re-loaded
+CONFIG_SNAPSHOTS = os.getenv("CONFIG_SNAPSHOTS", "true").lower() == "true"
+CONFIG_SNAPSHOT_KEY = "configSnapshot"
+CONFIG_SNAPSHOT_VERSION = 1
+
+# Parameters used by the main workflow, in batches of up to 10 for Parameter Store
+CONFIG_PARAMETER_BATCHES = [
+    [
+        CONF_COMP_LANGS,
+        CONF_REDACTION_LANGS,
+        CONF_ENTITYENDPOINT,
+        CONF_ENTITY_FILE,
+        CONF_ENTITYCONF,
+        CONF_PREFIX_AUDIO_PLAYBACK,
+        CONF_S3BUCKET_INPUT,
+        CONF_PREFIX_RAW_AUDIO,
+        CONF_PREFIX_FAILED_AUDIO,
+        CONF_PREFIX_INPUT_TRANSCRIPTS,
+    ],
+    [
+        CONF_MAX_SPEAKERS,
+        CONF_MINNEGATIVE,
+        CONF_MINPOSITIVE,
+        CONF_S3BUCKET_OUTPUT,
+        CONF_PREFIX_PARSED_RESULTS,
+        CONF_SPEAKER_NAMES,
+        CONF_SPEAKER_MODE,
+        COMP_SFN_NAME,
+        CONF_SUPPORT_BUCKET,
+        CONF_TRANSCRIBE_LANG,
+    ],
+    [
+        CONF_PREFIX_TRANSCRIBE_RESULTS,
+        CONF_VOCABNAME,
+        CONF_CLMNAME,
+        CONF_CONVO_LOCATION,
+        CONF_ENTITY_TYPES,
+        CONF_FILTER_MODE,
+        CONF_FILTER_NAME,
+        CONF_FILENAME_DATETIME_REGEX,
+        CONF_FILENAME_DATETIME_FIELDMAP,
+        CONF_FILENAME_GUID_REGEX,
+    ],
+    [
+        CONF_FILENAME_AGENT_REGEX,
+        CONF_FILENAME_CUST_REGEX,
+        CONF_KENDRA_INDEX_ID,
+        CONF_WEB_URI,
+        CONF_TRANSCRIBE_API,
+        CONF_REDACTION_TRANSCRIPT,
+        CONF_REDACTION_AUDIO,
+        CONF_TELEPHONY_CTR,
+        CONF_TELEPHONY_CTR_SUFFIX,
+        CONF_CALL_SUMMARIZATION
+    ]
+]
+
+config = {
+   'retries': {
       'max_attempts': 100,
       'mode': 'adaptive'
    }
-)
+}
 
 def extractParameters(ssmResponse, useTagName):
     """
@@ -103,76 +168,30 @@ def extractParameters(ssmResponse, useTagName):
             appConfig[paramName] = ""
 
 
-def loadConfiguration():
+def loadConfiguration(force=False):
     """
-    Loads in the configuration values from Parameter Store.  Bulk loads them in batches of 10,
+    Loads in the configuration values from Parameter Store, unless we already have a copy that is younger than the
+    cache TTL.  Bulk loads them in parallel batches of 10, which is the most that Parameter Store allows per call,
     and any that are missing are set to an empty string or to the tag-name.
+
+    :param force: Re-load the configuration even if the cached copy hasn't expired
     """
+    global config_loaded_at
 
-    # Load the the core ones in from Parameter Store in batches of up to 10
-    ssm = boto3.client("ssm", config=config)
-    fullParamList1 = ssm.get_parameters(
-        Names=[
-            CONF_COMP_LANGS,
-            CONF_REDACTION_LANGS,
-            CONF_ENTITYENDPOINT,
-            CONF_ENTITY_FILE,
-            CONF_ENTITYCONF,
-            CONF_PREFIX_AUDIO_PLAYBACK,
-            CONF_S3BUCKET_INPUT,
-            CONF_PREFIX_RAW_AUDIO,
-            CONF_PREFIX_FAILED_AUDIO,
-            CONF_PREFIX_INPUT_TRANSCRIPTS,
-        ]
-    )
-    fullParamList2 = ssm.get_parameters(
-        Names=[
-            CONF_MAX_SPEAKERS,
-            CONF_MINNEGATIVE,
-            CONF_MINPOSITIVE,
-            CONF_S3BUCKET_OUTPUT,
-            CONF_PREFIX_PARSED_RESULTS,
-            CONF_SPEAKER_NAMES,
-            CONF_SPEAKER_MODE,
-            COMP_SFN_NAME,
-            CONF_SUPPORT_BUCKET,
-            CONF_TRANSCRIBE_LANG,
-        ]
-    )
-    fullParamList3 = ssm.get_parameters(
-        Names=[
-            CONF_PREFIX_TRANSCRIBE_RESULTS,
-            CONF_VOCABNAME,
-            CONF_CLMNAME,
-            CONF_CONVO_LOCATION,
-            CONF_ENTITY_TYPES,
-            CONF_FILTER_MODE,
-            CONF_FILTER_NAME,
-            CONF_FILENAME_DATETIME_REGEX,
-            CONF_FILENAME_DATETIME_FIELDMAP,
-            CONF_FILENAME_GUID_REGEX,
-        ]
-    )
-    fullParamList4 = ssm.get_parameters(
-        Names=[
-            CONF_FILENAME_AGENT_REGEX,
-            CONF_FILENAME_CUST_REGEX,
-            CONF_KENDRA_INDEX_ID,
-            CONF_WEB_URI,
-            CONF_TRANSCRIBE_API,
-            CONF_REDACTION_TRANSCRIPT,
-            CONF_REDACTION_AUDIO,
-            CONF_TELEPHONY_CTR,
-            CONF_TELEPHONY_CTR_SUFFIX,
-            CONF_CALL_SUMMARIZATION
-        ]
-    )
+    # Use the cached configuration if we have one and it hasn't expired
+    if (not force) and (config_loaded_at is not None) and (time.time() - config_loaded_at < CONFIG_CACHE_TTL_SECS):
+        return
+
+    # Load the the core ones in from Parameter Store in batches of up to 10, all at the same time.  pcacommon is
+    # imported here as it is built on top of this module, so importing it at the top would create an import cycle
+    import pcacommon
+    ssm = pcacommon.get_client("ssm", config_options=config)
+    with ThreadPoolExecutor(max_workers=len(CONFIG_PARAMETER_BATCHES)) as pool:
+        responses = list(pool.map(lambda names: ssm.get_parameters(Names=names), CONFIG_PARAMETER_BATCHES))
 
     # Extract our parameters into our config
-    extractParameters(fullParamList1, False)
-    extractParameters(fullParamList2, False)
-    extractParameters(fullParamList3, False)
-    extractParameters(fullParamList4, False)
+    for response in responses:
+        extractParameters(response, False)
 
     # If any important empty values to something
     if (appConfig[CONF_MINNEGATIVE]) == "":
@@ -201,6 +220,87 @@ def loadConfiguration():
     appConfig[CONF_SPEAKER_NAMES] = appConfig[CONF_SPEAKER_NAMES].split(" | ")
     appConfig[CONF_TELEPHONY_CTR_SUFFIX] = appConfig[CONF_TELEPHONY_CTR_SUFFIX].split(" | ")
 
+    # Finally, note when we loaded it for our cache
+    config_loaded_at = time.time()
+
+
+def invalidateConfiguration():
+    """
+    Invalidates the cached configuration, so that the next call to loadConfiguration() re-loads it from
+    Parameter Store
+    """
+    global config_loaded_at
+    config_loaded_at = None
+
+
+def getConfigurationHash(config_values):
+    """
+    Returns a short hash of a set of configuration values, which identifies that version of the configuration
+    """
+    config_json = json.dumps(config_values, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(config_json.encode("utf-8")).hexdigest()[:16]
+
+
+def createConfigSnapshot():
+    """
+    Creates a snapshot of the currently loaded configuration that can be passed along in a Step Functions event.
+    Only the workflow parameters are included, and empty values are left out to keep it compact
+
+    :return: Dictionary holding the snapshot version, its creation time, a hash of the values and the values
+    """
+    config_values = {name: appConfig[name] for batch in CONFIG_PARAMETER_BATCHES for name in batch
+                     if appConfig.get(name, "") != ""}
+    return {
+        "Version": CONFIG_SNAPSHOT_VERSION,
+        "CreatedAt": config_loaded_at if config_loaded_at is not None else time.time(),
+        "Hash": getConfigurationHash(config_values),
+        "Config": config_values
+    }
+
+
+def loadConfigurationFromSnapshot(snapshot):
+    """
+    Loads the configuration from a snapshot created by createConfigSnapshot().  The snapshot is treated as if it
+    had been loaded from Parameter Store when it was created, so it still only lives for the cache TTL
+
+    :param snapshot: Configuration snapshot
+    :return: True if the configuration was loaded, or False if the snapshot isn't usable
+    """
+    global config_loaded_at
+
+    # Ignore any snapshot from a different version, or that has been altered on the way
+    if (not isinstance(snapshot, dict)) or (snapshot.get("Version") != CONFIG_SNAPSHOT_VERSION):
+        return False
+    config_values = snapshot.get("Config", {})
+    if getConfigurationHash(config_values) != snapshot.get("Hash"):
+        print("Configuration snapshot hash doesn't match its contents, so ignoring it")
+        return False
+
+    # Missing values were empty ones, so put those back too
+    for name in [name for batch in CONFIG_PARAMETER_BATCHES for name in batch]:
+        appConfig[name] = copy.deepcopy(config_values.get(name, ""))
+    config_loaded_at = snapshot.get("CreatedAt", time.time())
+    return True
+
+
+def loadEventConfiguration(sf_event):
+    """
+    Loads the configuration for a Step Functions workflow step.  If the event already holds a configuration
+    snapshot then that is used, otherwise the configuration is loaded as normal and a snapshot of it is added to
+    the event, so that the later steps in the workflow can use it
+
+    :param sf_event: Step Functions event data, which is updated with the snapshot if it doesn't have one
+    """
+    if CONFIG_SNAPSHOTS and (CONFIG_SNAPSHOT_KEY in sf_event):
+        if loadConfigurationFromSnapshot(sf_event[CONFIG_SNAPSHOT_KEY]):
+            return
+        print("Unable to use the configuration snapshot in the event, so re-loading the configuration")
+        invalidateConfiguration()
+
+    loadConfiguration()
+    if CONFIG_SNAPSHOTS:
+        sf_event[CONFIG_SNAPSHOT_KEY] = createConfigSnapshot()
+
 
 def isAutoLanguageDetectionSet():
     """
@@ -0,0 +1,148 @@
+"""
+This python function is part of the main processing workflow.  It provides a multi-pattern string matcher for the
+simple entity string maps, which finds every entity in a piece of text with a single pass over that text.  This is
+an Aho-Corasick automaton, built once from the entity map, and matches are only reported if they start and end on
+word boundaries.  Simple plurals of each entity can optionally be matched as well, but this is opt-in, as the
+plurals are generated by rule and irregular ones (e.g. "child" and "children") are never matched.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+
+# Set to "true" in the environment to also match plurals (e.g. "logs" for the entity "log")
+ENTITY_MATCH_PLURALS = os.getenv("ENTITY_MATCH_PLURALS", "false").lower() == "true"
+
+# Endings of words that take "es" rather than "s" as their plural
+PLURAL_ES_ENDINGS = ("s", "x", "z", "ch", "sh")
+
+# Letters that keep the "y" of a word ending in "y" when it is pluralised, e.g. "day" and "days"
+PLURAL_Y_KEEP_PRECEDING = "aeiou"
+
+
+def is_word_character(character):
+    """
+    Checks if a character is part of a word, rather than a space or punctuation
+    """
+    return character.isalnum() or (character == "_")
+
+
+def generate_plurals(term):
+    """
+    Generates the simple plural forms of a term, which is the term with "s" or "es" added, or for a term ending in a
+    consonant and "y" then "y" is replaced by "ies", e.g. "policy" and "policies"
+
+    :param term: Lowercase entity term
+    :return: List of plural forms for the term
+    """
+    if not is_word_character(term[-1]):
+        return []
+    elif term.endswith(PLURAL_ES_ENDINGS):
+        return [term + "es"]
+    elif (len(term) > 1) and term.endswith("y") and term[-2].isalpha() and (term[-2] not in PLURAL_Y_KEEP_PRECEDING):
+        return [term[:-1] + "ies"]
+    else:
+        return [term + "s"]
+
+
+class EntityMatcher:
+    """
+    Aho-Corasick automaton built from the keys of a simple entity map.  Each node in the trie holds its child
+    transitions, its failure link, and the (pattern length, entity key) outputs that end at that node
+    """
+    def __init__(self, entity_map, match_plurals=ENTITY_MATCH_PLURALS):
+        self.transitions = [{}]
+        self.failure = [0]
+        self.outputs = [[]]
+
+        # Work out which patterns we need - an entity's own term always wins over another entity's plural
+        patterns = {}
+        for term in entity_map:
+            if term != "":
+                patterns[term] = term
+        if match_plurals:
+            for term in entity_map:
+                if term != "":
+                    for plural in generate_plurals(term):
+                        if plural not in patterns:
+                            patterns[plural] = term
+
+        # Build the trie, then add the failure links
+        for pattern, entity_key in patterns.items():
+            self.add_pattern(pattern, entity_key)
+        self.build_failure_links()
+
+    def add_pattern(self, pattern, entity_key):
+        """
+        Adds a pattern to the trie, recording which entity it matches at its final node
+        """
+        node = 0
+        for character in pattern:
+            next_node = self.transitions[node].get(character)
+            if next_node is None:
+                next_node = len(self.transitions)
+                self.transitions[node][character] = next_node
+                self.transitions.append({})
+                self.failure.append(0)
+                self.outputs.append([])
+            node = next_node
+        self.outputs[node].append((len(pattern), entity_key))
+
+    def build_failure_links(self):
+        """
+        Sets the failure link of each node to the node for its longest proper suffix that is also in the trie,
+        working breadth-first from the root.  Each node's outputs are extended with those of its failure node,
+        so all patterns ending at a position are found without following the failure chain during a scan
+        """
+        queue = list(self.transitions[0].values())
+        queue_index = 0
+        while queue_index < len(queue):
+            node = queue[queue_index]
+            queue_index += 1
+            for character, child in self.transitions[node].items():
+                fallback = self.failure[node]
+                while (fallback != 0) and (character not in self.transitions[fallback]):
+                    fallback = self.failure[fallback]
+                self.failure[child] = self.transitions[fallback].get(character, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.failure[child]]
+                queue.append(child)
+
+    def find_matches(self, text):
+        """
+        Finds all entity matches in the text that sit on word boundaries.  As with a repeated str.find(), the
+        matches for any one entity never overlap, with the earliest (and then the longest) match winning
+
+        :param text: Lowercase text to be searched
+        :return: List of (entity key, begin offset, end offset) tuples, ordered by begin offset
+        """
+        candidates = []
+        node = 0
+        for position, character in enumerate(text):
+            while (node != 0) and (character not in self.transitions[node]):
+                node = self.failure[node]
+            node = self.transitions[node].get(character, 0)
+            for pattern_length, entity_key in self.outputs[node]:
+                begin = position + 1 - pattern_length
+                end = position + 1
+                if self.on_word_boundaries(text, begin, end):
+                    candidates.append((begin, -pattern_length, entity_key))
+
+        # Drop any match that overlaps an earlier match of the same entity
+        matches = []
+        entity_ends = {}
+        for begin, negative_length, entity_key in sorted(candidates):
+            if begin >= entity_ends.get(entity_key, 0):
+                entity_ends[entity_key] = begin - negative_length
+                matches.append((entity_key, begin, begin - negative_length))
+
+        return matches
+
+    def on_word_boundaries(self, text, begin, end):
+        """
+        Checks that a match doesn't start or end in the middle of a word
+        """
+        if (begin > 0) and is_word_character(text[begin - 1]) and is_word_character(text[begin]):
+            return False
+        if (end < len(text)) and is_word_character(text[end]) and is_word_character(text[end - 1]):
+            return False
+        return True
@@ -0,0 +1,194 @@
+"""
+This python function is part of the main processing workflow.  It provides the JSON codec that is used to read
+and write the PCA results files.  If the orjson library is available then it is used, as it serialises straight to
+UTF-8 bytes and parses much faster than the standard library, otherwise the standard library json module is used.
+The codec can be forced via the JSON_CODEC environment variable, which can be "auto", "orjson" or "json".
+
+It also handles the optional gzip or zstd compression of results files, along with working out how a file was
+compressed, either from its S3 Content-Encoding or from its first few bytes.
+
+Both orjson and zstandard are installed by the PyUtils Lambda layer, which every function that reads or writes
+results files uses.  Anywhere that they are not installed we fall back to the standard library json module and
+to gzip compression.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Which codec to use - "auto" picks orjson if it is installed
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+# Supported compression types, which are also the S3 Content-Encoding values, and how to spot them in a file
+CONTENT_ENCODING_GZIP = "gzip"
+CONTENT_ENCODING_ZSTD = "zstd"
+CONTENT_ENCODINGS = [CONTENT_ENCODING_GZIP, CONTENT_ENCODING_ZSTD]
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_COMPRESSION_LEVEL = int(os.getenv("GZIP_COMPRESSION_LEVEL", "6"))
+ZSTD_COMPRESSION_LEVEL = int(os.getenv("ZSTD_COMPRESSION_LEVEL", "3"))
+
+
+class StdlibJSONCodec:
+    """
+    JSON codec using the standard library json module
+    """
+    name = "json"
+
+    def dumps(self, data):
+        """
+        Serialises the data to UTF-8 encoded JSON bytes
+        """
+        return json.dumps(data).encode("utf-8")
+
+    def loads(self, json_bytes):
+        """
+        Parses UTF-8 encoded JSON bytes or a JSON string
+        """
+        return json.loads(json_bytes)
+
+
+class OrjsonJSONCodec:
+    """
+    JSON codec using the orjson library, which works directly with UTF-8 bytes
+    """
+    name = "orjson"
+
+    def dumps(self, data):
+        """
+        Serialises the data to UTF-8 encoded JSON bytes
+        """
+        return orjson.dumps(data)
+
+    def loads(self, json_bytes):
+        """
+        Parses UTF-8 encoded JSON bytes or a JSON string
+        """
+        return orjson.loads(json_bytes)
+
+
+def get_json_codec(codec_name=JSON_CODEC):
+    """
+    Returns the JSON codec to use.  If orjson is asked for but is not installed then we fall back to the
+    standard library, rather than failing
+
+    :param codec_name: Name of the codec - "auto", "orjson" or "json"
+    :return: JSON codec
+    """
+    if (codec_name in ["auto", "orjson"]) and (orjson is not None):
+        return OrjsonJSONCodec()
+    if codec_name == "orjson":
+        print("orjson is not installed, so using the standard library JSON codec")
+    return StdlibJSONCodec()
+
+
+# Single codec instance for this container
+json_codec = get_json_codec()
+
+
+def dumps(data):
+    """
+    Serialises the data to UTF-8 encoded JSON bytes using the current codec
+
+    :param data: Data to be serialised
+    :return: JSON bytes
+    """
+    return json_codec.dumps(data)
+
+
+def loads(json_bytes):
+    """
+    Parses JSON bytes or a JSON string using the current codec
+
+    :param json_bytes: JSON data to be parsed
+    :return: Parsed data
+    """
+    return json_codec.loads(json_bytes)
+
+
+def load_stream(stream):
+    """
+    Parses JSON straight from a binary stream, such as an S3 object body, without writing it to a file first
+
+    :param stream: Binary stream holding the JSON data
+    :return: Parsed data
+    """
+    return json_codec.loads(stream.read())
+
+
+def get_content_encoding(compression):
+    """
+    Works out the S3 Content-Encoding to use for a configured compression setting.  If zstd is asked for but the
+    zstandard library is not installed then gzip is used instead, and any unknown setting means no compression
+
+    :param compression: Compression setting - "none", "gzip" or "zstd"
+    :return: Content-Encoding value, or None if the data should not be compressed
+    """
+    compression = (compression or "none").lower()
+    if compression == CONTENT_ENCODING_ZSTD and zstandard is None:
+        print("zstandard is not installed, so using gzip compression instead")
+        compression = CONTENT_ENCODING_GZIP
+    if compression not in CONTENT_ENCODINGS:
+        if compression != "none":
+            print(f"Unknown compression setting {compression}, so not compressing")
+        return None
+    return compression
+
+
+def compress(data, content_encoding):
+    """
+    Compresses data with the given Content-Encoding
+
+    :param data: Bytes to be compressed
+    :param content_encoding: Content-Encoding from get_content_encoding, or None for no compression
+    :return: Compressed bytes
+    """
+    if content_encoding == CONTENT_ENCODING_GZIP:
+        return gzip.compress(data, compresslevel=GZIP_COMPRESSION_LEVEL)
+    elif content_encoding == CONTENT_ENCODING_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).compress(data)
+    return data
+
+
+def detect_content_encoding(header_bytes):
+    """
+    Works out the Content-Encoding of some data from its first few bytes, for data without any S3 metadata
+
+    :param header_bytes: First four or more bytes of the data
+    :return: Content-Encoding, or None if the data is not compressed
+    """
+    if header_bytes.startswith(GZIP_MAGIC):
+        return CONTENT_ENCODING_GZIP
+    elif header_bytes.startswith(ZSTD_MAGIC):
+        return CONTENT_ENCODING_ZSTD
+    return None
+
+
+def decompressing_stream(stream, content_encoding):
+    """
+    Wraps a binary stream so that reading from it returns the decompressed data, so compressed data never
+    has to be held in memory in one piece
+
+    :param stream: Binary stream holding the data, such as an S3 object body
+    :param content_encoding: Content-Encoding of the data, or None if it is not compressed
+    :return: Binary stream of the decompressed data
+    """
+    if content_encoding == CONTENT_ENCODING_GZIP:
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    elif content_encoding == CONTENT_ENCODING_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Unable to read zstd-compressed data as zstandard is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    return stream
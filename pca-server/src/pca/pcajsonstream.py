@@ -0,0 +1,260 @@
+"""
+This python function is part of the main processing workflow.  It provides a streaming reader for large JSON
+documents, such as the output from Transcribe, so that the big arrays in those documents never need to be held
+in memory all at once.  Each element of a chosen array is decoded on its own and handed back as soon as it has been
+read from the stream, and everything else in the document is returned as a normal dictionary at the end.
+
+Arrays are chosen by their path from the top of the document, e.g. ("results", "items"), where ANY_ELEMENT in a path
+matches every element of an array - so ("results", "channel_labels", "channels", ANY_ELEMENT, "items") picks out the
+items of each channel.  Streamed arrays are left out of the dictionaries that hold them.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import re
+import json
+import codecs
+
+# Number of bytes to read from the stream each time we need more data
+JSON_STREAM_CHUNK_SIZE = int(os.getenv("JSON_STREAM_CHUNK_SIZE", str(1024 * 1024)))
+
+# Path component that matches every element of an array
+ANY_ELEMENT = "*"
+
+# Whitespace that is allowed between JSON tokens
+WHITESPACE_REGEX = re.compile(r"[ \t\n\r]*")
+
+
+def get_walk_paths(array_paths):
+    """
+    Returns every path that has to be walked through to reach the streamed arrays, which are all of the
+    proper prefixes of the array paths, including the empty path for the top of the document
+    """
+    return set(path[:length] for path in array_paths for length in range(len(path)))
+
+
+class JSONStreamReader:
+    """
+    Reads a JSON document from a binary stream, such as an S3 object body, returning the elements of
+    the requested arrays one by one.  Only the current element, plus one chunk of the stream, is held in memory
+    """
+    def __init__(self, stream, array_paths, chunk_size=JSON_STREAM_CHUNK_SIZE):
+        """
+        :param stream: Binary stream that the document is read from - anything with a read(size) method
+        :param array_paths: List of paths, as tuples, for the arrays whose elements should be streamed
+        :param chunk_size: Number of bytes to read from the stream at a time
+        """
+        self.stream = stream
+        self.array_paths = set(tuple(path) for path in array_paths)
+        self.walk_paths = get_walk_paths(self.array_paths)
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.end_of_stream = False
+        self.document = None
+
+    def elements(self):
+        """
+        Reads the whole document, yielding a (path, element) tuple for each element of the streamed arrays in the
+        order that they appear.  Once this is finished the rest of the document is available in self.document
+        """
+        self.document = yield from self.read_value(())
+        if self.peek() != "":
+            raise ValueError("Unexpected data after the end of the JSON document")
+
+    def read_leading_fields(self, keys):
+        """
+        Reads the fields of the top-level object up to the last of the given keys, and then stops, so nothing after
+        them is ever read from the stream.  Any other fields that come before them are read as well, so this is only
+        worthwhile when the wanted fields are near the start of the document
+
+        :param keys: Names of the top-level fields that are wanted
+        :return: Dictionary of all of the fields that were read
+        """
+        wanted_keys = set(keys)
+        result = {}
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return result
+
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            result[key] = self.decode_value()
+            wanted_keys.discard(key)
+            if not wanted_keys:
+                return result
+
+            separator = self.peek()
+            self.position += 1
+            if separator == "}":
+                return result
+            elif separator != ",":
+                raise ValueError(f"Expected ',' or '}}' but found '{separator}' in JSON stream")
+
+    def read_more(self, min_size=0):
+        """
+        Reads the next chunk of the stream onto the end of the text buffer, first dropping the part of the
+        buffer that we've already finished with
+
+        :param min_size: Minimum number of bytes to read, if more than the normal chunk size is needed
+        :return: False if we were already at the end of the stream, otherwise True
+        """
+        if self.end_of_stream:
+            return False
+
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        data = self.stream.read(max(self.chunk_size, min_size))
+        if data:
+            self.buffer += self.text_decoder.decode(data)
+        else:
+            self.buffer += self.text_decoder.decode(b"", final=True)
+            self.end_of_stream = True
+        return True
+
+    def peek(self):
+        """
+        Skips any whitespace and returns the next character without consuming it
+
+        :return: The next character, or an empty string at the end of the document
+        """
+        while True:
+            self.position = WHITESPACE_REGEX.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                return ""
+
+    def expect(self, character):
+        """
+        Consumes the next character, which must be the one given
+        """
+        next_character = self.peek()
+        if next_character != character:
+            raise ValueError(f"Expected '{character}' but found '{next_character}' in JSON stream")
+        self.position += 1
+
+    def decode_value(self):
+        """
+        Decodes the next complete JSON value from the stream.  If the value runs past the end of the buffer then
+        more is read and we try again, reading at least as much again each time so large values stay linear.  A
+        value that ends right at the end of the buffer might be a number that continues in the next chunk, so
+        that is also only accepted once we have read further
+
+        :return: Decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.position)
+                if (end < len(self.buffer)) or self.end_of_stream:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.end_of_stream:
+                    raise
+            self.read_more(len(self.buffer) - self.position)
+
+    def read_value(self, path):
+        """
+        Reads the value at the given path - values that lead to a streamed array are walked through, and
+        everything else is decoded in one go
+        """
+        if path in self.walk_paths:
+            next_character = self.peek()
+            if next_character == "{":
+                return (yield from self.read_object(path))
+            elif next_character == "[":
+                return (yield from self.read_array(path, False))
+        return self.decode_value()
+
+    def read_object(self, path):
+        """
+        Reads an object, streaming any of its arrays that have been requested, and returns the rest of it
+        """
+        result = {}
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return result
+
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            child_path = path + (key,)
+            if (child_path in self.array_paths) and (self.peek() == "["):
+                yield from self.read_array(child_path, True)
+            else:
+                result[key] = yield from self.read_value(child_path)
+
+            separator = self.peek()
+            self.position += 1
+            if separator == "}":
+                return result
+            elif separator != ",":
+                raise ValueError(f"Expected ',' or '}}' but found '{separator}' in JSON stream")
+
+    def read_array(self, path, stream_elements):
+        """
+        Reads an array, either yielding each element as it is read or returning them all as a list
+        """
+        elements = []
+        element_path = path + (ANY_ELEMENT,)
+        walk_elements = element_path in self.walk_paths
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return elements
+
+        while True:
+            if walk_elements:
+                element = yield from self.read_value(element_path)
+            else:
+                element = self.decode_value()
+            if stream_elements:
+                yield path, element
+            else:
+                elements.append(element)
+
+            separator = self.peek()
+            self.position += 1
+            if separator == "]":
+                return elements
+            elif separator != ",":
+                raise ValueError(f"Expected ',' or ']' but found '{separator}' in JSON stream")
+
+
+def iterate_document_arrays(document, array_paths):
+    """
+    Yields a (path, element) tuple for each element of the requested arrays in a document that has already been
+    loaded, in the same order as JSONStreamReader would.  The document is not changed, so an element here still
+    holds any streamed arrays of its own, whereas JSONStreamReader would have left them out
+
+    :param document: Loaded JSON document
+    :param array_paths: List of paths, as tuples, for the arrays whose elements should be returned
+    """
+    array_paths = set(tuple(path) for path in array_paths)
+    walk_paths = get_walk_paths(array_paths)
+
+    def walk(value, path):
+        if path not in walk_paths:
+            return
+        if isinstance(value, dict):
+            for key, child in value.items():
+                child_path = path + (key,)
+                if (child_path in array_paths) and isinstance(child, list):
+                    for element in child:
+                        yield from walk(element, child_path + (ANY_ELEMENT,))
+                        yield child_path, element
+                else:
+                    yield from walk(child, child_path)
+        elif isinstance(value, list):
+            for element in value:
+                yield from walk(element, path + (ANY_ELEMENT,))
+
+    yield from walk(document, ())
@@ -3,14 +3,11 @@ Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
 import json
-import boto3
+import pcacommon
 import textwrap
 import urllib
 import dateutil.parser
 
-KENDRA = boto3.client('kendra')
-S3 = boto3.client('s3')
-
 
 def prepare_transcript(results):
     """
@@ -24,18 +21,18 @@ def prepare_transcript(results):
     for segment in results.speech_segments:
         # If we have word-level timestamps then split this into sentences,
         # otherwise a returned Kendra fragment might not contain a timestamp
-        if segment.segmentConfidence[0]["EndTime"] > 0:
+        if segment.segmentConfidence.end_times[0] > 0:
             new_sentence = True
-            for word in segment.segmentConfidence:
+            for word_text, word_start in zip(segment.segmentConfidence.texts, segment.segmentConfidence.start_times):
                 # First word in a sentence needs the start time
                 if new_sentence:
                     if txt != "":
                         txt = txt + "  "
-                    txt = txt + f"[{word['StartTime']}] "
+                    txt = txt + f"[{word_start}] "
                     new_sentence = False
 
-                txt = txt + f"{word['Text']}"
-                if str(word["Text"]).endswith(".") or str(word["Text"]).endswith("?"):
+                txt = txt + f"{word_text}"
+                if str(word_text).endswith(".") or str(word_text).endswith("?"):
                     new_sentence = True
         else:
             # Unfortunately not, so need to create a single entry in Kendra (which could be large)
@@ -62,7 +59,7 @@ def get_bucket_region(bucket):
     get bucket location.. buckets in us-east-1 return None, otherwise region is identified in LocationConstraint
     """
     try:
-        region = S3.get_bucket_location(Bucket=bucket)["LocationConstraint"] or 'us-east-1' 
+        region = pcacommon.get_s3_client().get_bucket_location(Bucket=bucket)["LocationConstraint"] or 'us-east-1' 
     except Exception as e:
         print(f"Unable to retrieve bucket region (bucket owned by another account?).. defaulting to us-east-1. Bucket: {bucket} - Message: " + str(e))
         region = 'us-east-1'
@@ -219,7 +216,7 @@ def put_kendra_document(indexId, analysisUri, conversationAnalytics, text):
     }
     documents = [document]
     print("KENDRA.batch_put_document: " + json.dumps(documents, default=str)[0:1000] + "...")
-    result = KENDRA.batch_put_document(
+    result = pcacommon.get_client('kendra').batch_put_document(
         IndexId = indexId,
         Documents = documents
     )
@@ -0,0 +1,292 @@
+"""
+This python function is part of the main processing workflow.  It provides a shared executor for Comprehend NLP
+requests, which runs them concurrently on a bounded thread pool.  Each Comprehend API is kept under a configurable
+request rate by a token bucket that is shared by every executor in the container, and any call that is throttled
+is retried with an exponential backoff plus random jitter.  It also provides the sentiment helpers that are built
+on top of the executor and the NLP result cache.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pcacommon
+import pcanlpcache
+
+# Sentiment helpers - segments shorter than this are not sent to Comprehend for sentiment, and Comprehend's scores
+# are scaled up to the +/- 5.0 range of Transcribe Call Analytics sentiment
+MIN_SENTIMENT_LENGTH = 8
+COMPREHEND_SENTIMENT_SCALER = 5.0
+
+# Size of the thread pool used to run concurrent NLP requests
+NLP_MAX_WORKERS = int(os.getenv("NLP_MAX_WORKERS", "8"))
+
+# Retry settings - backoff doubles from the base delay on each attempt up to the maximum, with full jitter
+NLP_MAX_RETRIES = int(os.getenv("NLP_MAX_RETRIES", "5"))
+NLP_BACKOFF_BASE_SECS = float(os.getenv("NLP_BACKOFF_BASE_SECS", "0.5"))
+NLP_BACKOFF_MAX_SECS = float(os.getenv("NLP_BACKOFF_MAX_SECS", "10.0"))
+
+# Error codes that Comprehend returns when we're going too fast
+NLP_THROTTLE_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException", "ProvisionedThroughputExceededException"}
+
+# Default requests per second for each Comprehend API, where 0 means unlimited.  Each can be overridden via
+# an environment variable named NLP_RATE_<API>, e.g. NLP_RATE_DETECT_SENTIMENT=10.  Custom entity endpoints
+# are sized by their inference units rather than by the account quota, so are unlimited unless configured
+NLP_DEFAULT_RATE_LIMITS = {
+    "detect_sentiment": 20.0,
+    "detect_entities": 20.0,
+    "batch_detect_sentiment": 10.0,
+    "batch_detect_entities": 10.0,
+    "detect_entities_endpoint": 0.0,
+}
+
+# Token buckets are shared across all executors in this container
+_token_buckets = {}
+_token_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket - tokens are added at a fixed rate up to the bucket's capacity,
+    and each request has to take a token before it can be made
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token from the bucket, waiting until one is available if the bucket is empty.
+        A bucket with no rate is unlimited, so never waits
+        """
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                # Top up the bucket based upon how long it's been since we last looked
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait_time = (1.0 - self.tokens) / self.rate
+
+            # Sleep outside of the lock so that other threads can top up too
+            time.sleep(wait_time)
+
+
+def get_token_bucket(api_name):
+    """
+    Returns the shared token bucket for the specified Comprehend API, creating it on first use
+    with the rate defined in the environment, or the default rate for that API
+
+    :param api_name: Name of the Comprehend API, e.g. detect_sentiment
+    :return: Token bucket for the API
+    """
+    with _token_buckets_lock:
+        if api_name not in _token_buckets:
+            default_rate = NLP_DEFAULT_RATE_LIMITS.get(api_name, 0.0)
+            rate = float(os.getenv("NLP_RATE_" + api_name.upper(), str(default_rate)))
+            _token_buckets[api_name] = TokenBucket(rate)
+        return _token_buckets[api_name]
+
+
+def is_throttling_error(error):
+    """
+    Checks if a boto3 exception is Comprehend telling us that we've been throttled
+
+    :param error: Exception raised by the boto3 call
+    :return: True if the error is a throttling error
+    """
+    try:
+        return error.response["Error"]["Code"] in NLP_THROTTLE_ERROR_CODES
+    except:
+        return False
+
+
+def create_comprehend_client():
+    """
+    Returns the shared Comprehend client for the executors, whose connection pool is large enough for all of the
+    executor's worker threads.  The boto3 retries are turned off, as the executor handles retries along with its
+    rate limiting
+
+    :return: boto3 Comprehend client
+    """
+    nlp_config = {"max_pool_connections": max(pcacommon.CLIENT_MAX_POOL_CONNECTIONS, NLP_MAX_WORKERS),
+                  "retries": {"total_max_attempts": 1, "mode": "standard"}}
+    return pcacommon.get_client("comprehend", config_options=nlp_config)
+
+
+class NLPExecutor:
+    """
+    Runs Comprehend requests, either singly or concurrently, applying the shared per-API rate limits and
+    retrying failed requests with exponential backoff.  Counts of requests made and throttled are kept
+    """
+    def __init__(self, client=None, max_workers=NLP_MAX_WORKERS, max_retries=NLP_MAX_RETRIES):
+        self.client = client if client is not None else create_comprehend_client()
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.total_calls = 0
+        self.throttled_calls = 0
+        self.counter_lock = threading.Lock()
+
+    def call(self, api_name, **kwargs):
+        """
+        Makes a single Comprehend request once the API's rate limit allows it.  Any exception is retried
+        after an exponential backoff with jitter, and is re-raised once we've run out of retries
+
+        :param api_name: Name of the boto3 Comprehend method, e.g. detect_sentiment
+        :param kwargs: Parameters for the Comprehend method
+        :return: Comprehend response
+        """
+        # Custom entity endpoints have their own throughput, so are rate-limited separately
+        bucket_name = api_name + "_endpoint" if "EndpointArn" in kwargs else api_name
+        bucket = get_token_bucket(bucket_name)
+        api_method = getattr(self.client, api_name)
+
+        attempt = 0
+        while True:
+            bucket.acquire()
+            with self.counter_lock:
+                self.total_calls += 1
+            try:
+                return api_method(**kwargs)
+            except Exception as e:
+                if is_throttling_error(e):
+                    with self.counter_lock:
+                        self.throttled_calls += 1
+                if attempt >= self.max_retries:
+                    raise e
+                time.sleep(random.uniform(0, min(NLP_BACKOFF_MAX_SECS, NLP_BACKOFF_BASE_SECS * (2 ** attempt))))
+                attempt += 1
+
+    def map(self, api_name, kwargs_list):
+        """
+        Makes a Comprehend request for each set of parameters in the list, running them concurrently
+        on the executor's thread pool, and returns the responses in the same order as the input
+
+        :param api_name: Name of the boto3 Comprehend method, e.g. detect_sentiment
+        :param kwargs_list: List of parameter dictionaries, one per request
+        :return: List of Comprehend responses
+        """
+        if (len(kwargs_list) <= 1) or (self.max_workers == 1):
+            return [self.call(api_name, **kwargs) for kwargs in kwargs_list]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(kwargs_list))) as pool:
+            return list(pool.map(lambda kwargs: self.call(api_name, **kwargs), kwargs_list))
+
+    def report(self):
+        """
+        Logs how many Comprehend requests were made by this executor, and how many of them were throttled
+        """
+        print(f"Comprehend requests made: {self.total_calls}, throttled: {self.throttled_calls}")
+
+
+def scale_sentiment_response(sentimentResponse, scalar):
+    """
+    Strips the MIXED score from a Comprehend sentiment response, as we won't be using it, and then
+    scales the remaining scores.  Only the sentiment and the scores are kept from the response
+
+    :param sentimentResponse: Sentiment response or batch result entry from Comprehend
+    :param scalar: Scaling factor to use
+    :return: Scaled sentiment response
+    """
+    scaledResponse = {"Sentiment": sentimentResponse["Sentiment"],
+                      "SentimentScore": sentimentResponse["SentimentScore"]}
+    scaledResponse["SentimentScore"].pop("Mixed", None)
+    for sentiment_key in scaledResponse["SentimentScore"]:
+        scaledResponse["SentimentScore"][sentiment_key] *= scalar
+
+    return scaledResponse
+
+
+def fetch_sentiment(text_list, lang_code, executor):
+    """
+    Gets the unscaled sentiment of a list of texts directly from Comprehend, bypassing the NLP result cache,
+    with the requests run concurrently by the NLP executor.  Only the sentiment and its scores are returned
+
+    :param text_list: Texts to be examined for sentiment
+    :param lang_code: Language for the Comprehend API check
+    :param executor: Pre-initialised NLP executor, which handles rate-limiting and retries
+    :return: List of sentiment responses, in the same order as the input texts
+    """
+    responses = executor.map("detect_sentiment", [{"Text": text, "LanguageCode": lang_code} for text in text_list])
+    return [{"Sentiment": response["Sentiment"], "SentimentScore": response["SentimentScore"]}
+            for response in responses]
+
+
+def comprehend_single_sentiment(text, lang_code, scalar=1.0, executor=None):
+    """
+    Perform sentiment analysis of the text against the current language.  A pre-initialised NLP executor
+    can be provided for Comprehend, but a new one will be created if required.  All sentiment values are
+    scaled, as Transcribe Call Analytics sentiment trends assume +/- 5.0 for the range, whereas Comprehend
+    uses +/- 1.0.
+
+    :param text: Text to be examined for sentiment
+    :param lang_code: Language for the Comprehend API check
+    :param scalar: Scaling factor to use
+    :param executor: Pre-initialised NLP executor, which handles rate-limiting and retries
+    :return: Scaled sentiment response
+    """
+    return comprehend_multiple_sentiment([text], lang_code, scalar, executor)[0]
+
+
+def comprehend_multiple_sentiment(text_list, lang_code, scalar=1.0, executor=None):
+    """
+    Perform sentiment analysis of a list of texts against the current language, with the requests run
+    concurrently by the NLP executor.  Results come from the NLP result cache where possible, and sentiment
+    values are scaled as per comprehend_single_sentiment
+
+    :param text_list: Texts to be examined for sentiment
+    :param lang_code: Language for the Comprehend API check
+    :param scalar: Scaling factor to use
+    :param executor: Pre-initialised NLP executor, which handles rate-limiting and retries
+    :return: List of scaled sentiment responses, in the same order as the input texts
+    """
+    if executor is None:
+        executor = NLPExecutor()
+
+    responses = pcanlpcache.cached_lookup("detect_sentiment", text_list, lang_code, "",
+                                          lambda fetch_list: fetch_sentiment(fetch_list, lang_code, executor))
+    return [scale_sentiment_response(response, scalar) for response in responses]
+
+
+def apply_sentiment_thresholds(segment, sentimentResponse, min_negative, min_positive):
+    """
+    Sets the sentiment of a speech segment from a scaled Comprehend sentiment response.  The segment is negative
+    if its negative score is over the negative threshold, else positive if its positive score is over the positive
+    threshold, otherwise it is neutral.  Any sentiment that the segment already had is replaced
+
+    :param segment: Speech segment to update
+    :param sentimentResponse: Scaled sentiment response for the segment's text
+    :param min_negative: Minimum negative score for the segment to be negative
+    :param min_positive: Minimum positive score for the segment to be positive
+    """
+    positiveBase = sentimentResponse["SentimentScore"]["Positive"]
+    negativeBase = sentimentResponse["SentimentScore"]["Negative"]
+
+    segment.segmentSentiment = ""
+    segment.segmentIsNegative = False
+    segment.segmentIsPositive = False
+    segment.segmentSentimentScore = 0.0
+    if negativeBase >= min_negative:
+        segment.segmentSentiment = "Negative"
+        segment.segmentIsNegative = True
+        segment.segmentSentimentScore = negativeBase
+    elif positiveBase >= min_positive:
+        segment.segmentSentiment = "Positive"
+        segment.segmentIsPositive = True
+        segment.segmentSentimentScore = positiveBase
+
+    # Store all of the original sentiments for future use
+    segment.segmentAllSentiments = sentimentResponse["SentimentScore"]
+    segment.segmentPositive = positiveBase
+    segment.segmentNegative = negativeBase
@@ -0,0 +1,333 @@
+"""
+This python function is part of the main processing workflow.  It provides a cache of Comprehend NLP results so
+that utterances that are repeated, both within a call and across calls, only need to be sent to Comprehend once.
+Results are keyed on a hash of the normalised text, language code, API and custom endpoint ARN, and are held in an
+in-process LRU cache that lives on across warm Lambda invocations.  An optional persistent store sits behind that -
+either a DynamoDB table, or a local SQLite file for testing - and all entries expire after a configurable TTL.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+import pcacommon
+
+# Cache settings - the persistent tier is only used if a DynamoDB table or SQLite file is configured
+NLP_CACHE_ENABLED = os.getenv("NLP_CACHE_ENABLED", "true").lower() == "true"
+NLP_CACHE_MAX_ENTRIES = int(os.getenv("NLP_CACHE_MAX_ENTRIES", "20000"))
+NLP_CACHE_TTL_SECS = int(os.getenv("NLP_CACHE_TTL_SECS", str(7 * 24 * 60 * 60)))
+NLP_CACHE_DYNAMODB_TABLE = os.getenv("NLP_CACHE_DYNAMODB_TABLE", "")
+NLP_CACHE_SQLITE_FILE = os.getenv("NLP_CACHE_SQLITE_FILE", "")
+
+# DynamoDB batch limits, and how often to retry anything that a batch request leaves unprocessed, with the delay
+# doubling from the base delay on each retry
+DYNAMODB_BATCH_GET_SIZE = 100
+DYNAMODB_BATCH_WRITE_SIZE = 25
+DYNAMODB_UNPROCESSED_RETRIES = int(os.getenv("NLP_CACHE_UNPROCESSED_RETRIES", "3"))
+DYNAMODB_UNPROCESSED_BACKOFF_SECS = 0.05
+
+# APIs whose results hold character offsets into the text, so the text must be cached exactly as-is
+OFFSET_APIS = {"detect_entities"}
+
+# Single instance of the cache per container
+_nlp_cache = None
+_nlp_cache_lock = threading.Lock()
+
+
+def normalise_text(text, api_name):
+    """
+    Normalises text before it is used in a cache key, so that trivially different versions of an utterance share
+    a cache entry.  Results with character offsets, such as entities, must match the text exactly, so the only
+    normalisation for those APIs is that none is done
+
+    :param text: Text that is being sent to Comprehend
+    :param api_name: Comprehend API that the text is being sent to
+    :return: Normalised text
+    """
+    if api_name in OFFSET_APIS:
+        return text
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_cache_key(api_name, text, lang_code, endpoint_arn=""):
+    """
+    Generates the cache key for a Comprehend request
+
+    :param api_name: Comprehend API, e.g. detect_sentiment - batch and single-text APIs share the same entries
+    :param text: Text that is being sent to Comprehend
+    :param lang_code: Language code for the request
+    :param endpoint_arn: Custom entity endpoint ARN, if there is one
+    :return: SHA-256 hash that identifies the request
+    """
+    key_string = "\x1f".join([api_name, lang_code, endpoint_arn, normalise_text(text, api_name)])
+    return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache, where every entry also has an expiry time
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the value for the key, or None if it is not in the cache or has expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, expires_at):
+        """
+        Adds a value to the cache, evicting the least-recently used entries if the cache is full
+        """
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class SQLiteCacheStore:
+    """
+    Persistent cache tier held in a local SQLite file - this is a stand-in for DynamoDB when testing locally
+    """
+    def __init__(self, filename):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS nlp_cache "
+                                "(cache_key TEXT PRIMARY KEY, response TEXT, expires_at REAL)")
+        self.connection.commit()
+
+    def get_many(self, keys):
+        """
+        Returns a dictionary of key -> value for all of the keys that are in the store and have not expired
+        """
+        found = {}
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                row = self.connection.execute("SELECT response, expires_at FROM nlp_cache WHERE cache_key = ?",
+                                              (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    found[key] = row[0]
+            self.connection.execute("DELETE FROM nlp_cache WHERE expires_at <= ?", (now,))
+            self.connection.commit()
+        return found
+
+    def put_many(self, entries, expires_at):
+        """
+        Writes a dictionary of key -> value to the store, all with the same expiry time
+        """
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO nlp_cache VALUES (?, ?, ?)",
+                                        [(key, value, expires_at) for key, value in entries.items()])
+            self.connection.commit()
+
+
+class DynamoDBCacheStore:
+    """
+    Persistent cache tier held in a DynamoDB table.  The table needs a string partition key called CacheKey,
+    and should have DynamoDB TTL enabled on the ExpiresAt attribute so that expired entries get removed.
+    As TTL deletion isn't immediate the expiry time is also checked when an entry is read.  DynamoDB can leave
+    part of a batch unprocessed if it is throttled, so these are retried a few times with a backoff, and anything
+    that is still left after that is logged, and is treated as a cache miss or simply not cached
+    """
+    def __init__(self, table_name, max_retries=DYNAMODB_UNPROCESSED_RETRIES):
+        self.table_name = table_name
+        self.max_retries = max_retries
+        self.client = pcacommon.get_client("dynamodb")
+
+    def batch_request(self, api_method, request_items, unprocessed_field, response_handler=None):
+        """
+        Makes a DynamoDB batch request, re-sending anything that is left unprocessed until it has all been done
+        or we run out of retries
+
+        :param api_method: boto3 batch method, e.g. batch_get_item
+        :param request_items: RequestItems for the first request
+        :param unprocessed_field: Response field holding the unprocessed RequestItems for the next request
+        :param response_handler: Function that is given each response, to pick out any results
+        :return: Number of requests for our table that were never processed
+        """
+        attempt = 0
+        while True:
+            response = api_method(RequestItems=request_items)
+            if response_handler is not None:
+                response_handler(response)
+            request_items = response.get(unprocessed_field) or {}
+            if (self.table_name not in request_items) or (attempt >= self.max_retries):
+                break
+            time.sleep(DYNAMODB_UNPROCESSED_BACKOFF_SECS * (2 ** attempt))
+            attempt += 1
+
+        unprocessed = request_items.get(self.table_name, {})
+        return len(unprocessed.get("Keys", [])) if isinstance(unprocessed, dict) else len(unprocessed)
+
+    def get_many(self, keys):
+        """
+        Returns a dictionary of key -> value for all of the keys that are in the table and have not expired
+        """
+        found = {}
+        now = time.time()
+        keys = list(keys)
+
+        def add_found_items(response):
+            for item in response["Responses"].get(self.table_name, []):
+                if float(item["ExpiresAt"]["N"]) > now:
+                    found[item["CacheKey"]["S"]] = item["Response"]["S"]
+
+        unprocessed = 0
+        for block_start in range(0, len(keys), DYNAMODB_BATCH_GET_SIZE):
+            block_keys = keys[block_start:block_start + DYNAMODB_BATCH_GET_SIZE]
+            unprocessed += self.batch_request(self.client.batch_get_item, {self.table_name: {
+                "Keys": [{"CacheKey": {"S": key}} for key in block_keys]}}, "UnprocessedKeys", add_found_items)
+        if unprocessed > 0:
+            print(f"NLP cache table {self.table_name} left {unprocessed} reads unprocessed, treating them as misses")
+        return found
+
+    def put_many(self, entries, expires_at):
+        """
+        Writes a dictionary of key -> value to the table, all with the same expiry time
+        """
+        items = list(entries.items())
+        unprocessed = 0
+        for block_start in range(0, len(items), DYNAMODB_BATCH_WRITE_SIZE):
+            unprocessed += self.batch_request(self.client.batch_write_item, {self.table_name: [
+                {"PutRequest": {"Item": {"CacheKey": {"S": key},
+                                         "Response": {"S": value},
+                                         "ExpiresAt": {"N": str(int(expires_at))}}}}
+                for key, value in items[block_start:block_start + DYNAMODB_BATCH_WRITE_SIZE]]}, "UnprocessedItems")
+        if unprocessed > 0:
+            print(f"NLP cache table {self.table_name} left {unprocessed} writes unprocessed, so they are not cached")
+
+
+class NLPResultCache:
+    """
+    Two-tier cache of Comprehend results, with counters for the hits on each tier and for the misses.
+    Values are held as JSON strings, so every caller gets its own copy of a cached result
+    """
+    def __init__(self, max_entries=NLP_CACHE_MAX_ENTRIES, ttl_secs=NLP_CACHE_TTL_SECS, store=None):
+        self.memory = LRUCache(max_entries)
+        self.ttl_secs = ttl_secs
+        self.store = store
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+
+    def lookup(self, api_name, text_list, lang_code, endpoint_arn, fetch_function):
+        """
+        Returns the Comprehend results for a list of texts.  Any text that isn't in either cache tier is passed to
+        the fetch function, which must return one result per text in the same order, and these results are then
+        added to the cache.  Texts that repeat within the list are only fetched once
+
+        :param api_name: Comprehend API, e.g. detect_sentiment - batch and single-text APIs share the same entries
+        :param text_list: Texts that need results
+        :param lang_code: Language code for the requests
+        :param endpoint_arn: Custom entity endpoint ARN, if there is one
+        :param fetch_function: Function that takes a list of texts and returns their results from Comprehend
+        :return: List of results, in the same order as the input texts
+        """
+        keys = [make_cache_key(api_name, text, lang_code, endpoint_arn) for text in text_list]
+        cached = {}
+        for key in keys:
+            if key not in cached:
+                value = self.memory.get(key)
+                if value is not None:
+                    cached[key] = value
+
+        # Look in the persistent store for anything that wasn't in memory - a failure here is just a miss
+        missing_keys = [key for key in dict.fromkeys(keys) if key not in cached]
+        store_found = {}
+        if self.store is not None and missing_keys:
+            try:
+                store_found = self.store.get_many(missing_keys)
+            except Exception as e:
+                print(f"Unable to read from NLP cache store: {e}")
+        expires_at = time.time() + self.ttl_secs
+        for key, value in store_found.items():
+            self.memory.put(key, value, expires_at)
+        cached.update(store_found)
+
+        # Fetch anything that's left from Comprehend, once per unique text, and cache the new results
+        fetch_keys = [key for key in missing_keys if key not in store_found]
+        if fetch_keys:
+            fetch_texts = {}
+            for key, text in zip(keys, text_list):
+                if key in cached or key in fetch_texts:
+                    continue
+                fetch_texts[key] = text
+            fetched = {key: json.dumps(result) for key, result in
+                       zip(fetch_texts.keys(), fetch_function(list(fetch_texts.values())))}
+            for key, value in fetched.items():
+                self.memory.put(key, value, expires_at)
+            if self.store is not None:
+                try:
+                    self.store.put_many(fetched, expires_at)
+                except Exception as e:
+                    print(f"Unable to write to NLP cache store: {e}")
+            cached.update(fetched)
+
+        # Repeats of a text within the list count as in-memory hits
+        with self.counter_lock:
+            self.memory_hits += len(keys) - len(store_found) - len(fetch_keys)
+            self.store_hits += len(store_found)
+            self.misses += len(fetch_keys)
+
+        return [json.loads(cached[key]) for key in keys]
+
+    def report(self):
+        """
+        Logs the cache hit and miss counts since the cache was created
+        """
+        print(f"NLP cache hits: {self.memory_hits} memory, {self.store_hits} store, misses: {self.misses}")
+
+
+def get_nlp_cache():
+    """
+    Returns the NLP result cache for this container, creating it on first use with any persistent
+    store that has been configured.  If caching is disabled then None is returned
+
+    :return: NLP result cache, or None
+    """
+    global _nlp_cache
+
+    if not NLP_CACHE_ENABLED:
+        return None
+
+    with _nlp_cache_lock:
+        if _nlp_cache is None:
+            store = None
+            if NLP_CACHE_DYNAMODB_TABLE != "":
+                store = DynamoDBCacheStore(NLP_CACHE_DYNAMODB_TABLE)
+            elif NLP_CACHE_SQLITE_FILE != "":
+                store = SQLiteCacheStore(NLP_CACHE_SQLITE_FILE)
+            _nlp_cache = NLPResultCache(store=store)
+        return _nlp_cache
+
+
+def cached_lookup(api_name, text_list, lang_code, endpoint_arn, fetch_function):
+    """
+    Returns Comprehend results for a list of texts via the NLP result cache, or directly
+    from the fetch function if caching is disabled.  See NLPResultCache.lookup for details
+    """
+    nlp_cache = get_nlp_cache()
+    if nlp_cache is None:
+        return fetch_function(text_list)
+    return nlp_cache.lookup(api_name, text_list, lang_code, endpoint_arn, fetch_function)
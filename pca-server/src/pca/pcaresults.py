@@ -7,6 +7,7 @@ JSON that is stored in S3.
 - ConversationAnalytics - holds all of the header-level call and analytical data for the call
 - TranscribeJobInfo - holds information about the underlying Transcribe job
 - SpeechSegment - single instance of a speech segment, and PCAResults holds an array of these for the call
+- WordConfidenceList - compact word-level data for a SpeechSegment, only turned into the output JSON shape on output
 
 The output JSON is split into the following high-level structure.
 
@@ -21,24 +22,317 @@ Please refer the output_json_structure.md file for full details on the output sc
 Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 SPDX-License-Identifier: Apache-2.0
 """
-import boto3
-import json
+import os
+import bisect
+from array import array
 import pcaconfiguration as cf
+import pcacommon
+import pcajsoncodec
+import pcajsonstream
+from botocore.exceptions import ClientError
 from datetime import datetime
 from pathlib import Path
 
 TMP_DIR = "/tmp/"
 INTERIM_RESULTS_KEY = "interimResults"
 
+# Optional compression of the interim results files - "none", "gzip" or "zstd".  The final results file is always
+# uncompressed, as the Athena parsedresults table reads every file in its folder as plain JSON, so an interim file
+# is decompressed again when it's moved into place
+RESULTS_COMPRESSION = os.getenv("RESULTS_COMPRESSION", "none")
+RESULTS_FINAL_COMPRESSION = "none"
+
+# Schema for the results files - "standard" writes one dictionary per word in each segment's WordConfidence, whereas
+# "compact" writes the word data as parallel arrays with rounded floats, and marks the file with its SchemaVersion.
+# Either schema can be read back in, whatever this is set to
+RESULTS_SCHEMA = os.getenv("RESULTS_SCHEMA", "standard").lower()
+RESULTS_SCHEMA_STANDARD = "standard"
+RESULTS_SCHEMA_COMPACT = "compact"
+COMPACT_SCHEMA_VERSION = 2
+WORD_TIME_DIGITS = int(os.getenv("WORD_TIME_DIGITS", "3"))
+WORD_CONFIDENCE_DIGITS = int(os.getenv("WORD_CONFIDENCE_DIGITS", "4"))
+
+# Lazy reading only builds the speech segments from a results file when they are first used, and segments that are
+# never used are written back out just as they were read.  Header-only reads stop reading the file at the end of the
+# ConversationAnalytics section, which is small and comes first, so only need a small read size
+RESULTS_LAZY_SEGMENTS = os.getenv("RESULTS_LAZY_SEGMENTS", "true").lower() == "true"
+RESULTS_HEADER_FIELDS = ["ConversationAnalytics"]
+RESULTS_HEADER_CHUNK_SIZE = 64 * 1024
+
+# Optional header sidecar, which is a small file holding just the ConversationAnalytics section of a results file, so
+# that anything only interested in call metadata can read that rather than the whole results file.  It has the same
+# name as the final results file, but is written to a sibling folder whose name ends in HEADER_SIDECAR_FOLDER_SUFFIX,
+# as everything in the results folder is read by the Athena parsedresults table and is indexed by the UI
+RESULTS_HEADER_SIDECAR = os.getenv("RESULTS_HEADER_SIDECAR", "false").lower() == "true"
+HEADER_SIDECAR_FOLDER_SUFFIX = "-headers"
+
+# Delta writes of the interim results file between workflow steps.  Results that are written back to the interim file
+# that they were read from are not written at all if nothing has changed, and if only the ConversationAnalytics header
+# has changed then just that is written, as a small header patch next to the file.  Any patch is merged in whenever
+# the file is read, and is folded into the final results file by the FinalProcessing step
+RESULTS_DELTA_WRITES = os.getenv("RESULTS_DELTA_WRITES", "true").lower() == "true"
+HEADER_PATCH_SUFFIX = ".patch.json"
+
+
+def write_json_to_s3(json_data, bucket, object_key, compression=RESULTS_COMPRESSION):
+    """
+    Writes JSON data to S3, compressing it and setting the Content-Encoding if compression has been requested
+
+    :param json_data: JSON data to be written
+    :param bucket: Bucket to write the data to
+    :param object_key: Key of the S3 object to write
+    :param compression: Compression to use for the file - "none", "gzip" or "zstd"
+    """
+    write_json_bytes_to_s3(pcajsoncodec.dumps(json_data), bucket, object_key, compression)
+
+
+def write_json_bytes_to_s3(json_bytes, bucket, object_key, compression=RESULTS_COMPRESSION):
+    """
+    Writes already-serialised JSON to S3, compressing it and setting the Content-Encoding if requested
+    """
+    content_encoding = pcajsoncodec.get_content_encoding(compression)
+    put_args = {"Bucket": bucket, "Key": object_key, "ContentType": "application/json"}
+    if content_encoding is not None:
+        json_bytes = pcajsoncodec.compress(json_bytes, content_encoding)
+        put_args["ContentEncoding"] = content_encoding
+    pcacommon.get_s3_client().put_object(Body=json_bytes, **put_args)
+
+
+def open_json_from_s3(bucket, object_key):
+    """
+    Opens a JSON object in S3 for reading, decompressing it on the fly if its Content-Encoding says that it is
+    compressed, so that the compressed data is never held in memory in one piece
+
+    :param bucket: Bucket to read the data from
+    :param object_key: Key of the S3 object to read
+    :return: Binary stream of the uncompressed JSON
+    """
+    s3_object = pcacommon.get_s3_client().get_object(Bucket=bucket, Key=object_key)
+    return pcajsoncodec.decompressing_stream(s3_object["Body"], s3_object.get("ContentEncoding"))
+
+
+def read_json_from_s3(bucket, object_key):
+    """
+    Reads and parses JSON data from S3, whether or not it has been compressed
+
+    :param bucket: Bucket to read the data from
+    :param object_key: Key of the S3 object to read
+    :return: Parsed JSON data
+    """
+    return pcajsoncodec.load_stream(open_json_from_s3(bucket, object_key))
+
+
+def get_header_sidecar_key(object_key):
+    """
+    Returns the S3 key of the header sidecar for a results file, e.g. "parsedFiles-headers/call.wav.json" for the
+    results file "parsedFiles/call.wav.json"
+
+    :param object_key: Key of the results file
+    :return: Key of its header sidecar
+    """
+    folder, _, filename = object_key.rpartition("/")
+    return folder + HEADER_SIDECAR_FOLDER_SUFFIX + "/" + filename
+
+
+def is_interim_results_key(object_key):
+    """
+    Checks if an S3 key is for a file in our interim results folder
+    """
+    return object_key.startswith(INTERIM_RESULTS_KEY + "/")
+
+
+def get_header_patch_key(object_key):
+    """
+    Returns the S3 key of the header patch for an interim results file, e.g. "interimResults/call.wav.patch.json"
+    for the results file "interimResults/call.wav.json"
+
+    :param object_key: Key of the results file
+    :return: Key of its header patch
+    """
+    if object_key.endswith(".json"):
+        object_key = object_key[:-len(".json")]
+    return object_key + HEADER_PATCH_SUFFIX
+
+
+def read_header_patch_from_s3(bucket, object_key):
+    """
+    Reads the header patch for an interim results file, if there is one
+
+    :param bucket: Bucket holding the results file
+    :param object_key: Key of the results file
+    :return: Header patch, which holds the ConversationAnalytics section, or None if the file has no patch
+    """
+    try:
+        return read_json_from_s3(bucket, get_header_patch_key(object_key))
+    except ClientError as err:
+        if err.response.get("Error", {}).get("Code") in ["NoSuchKey", "404"]:
+            return None
+        raise
+
+
+def delete_header_patch_from_s3(bucket, object_key):
+    """
+    Deletes the header patch for an interim results file - S3 doesn't mind if there isn't one
+
+    :param bucket: Bucket holding the results file
+    :param object_key: Key of the results file
+    """
+    pcacommon.get_s3_client().delete_object(Bucket=bucket, Key=get_header_patch_key(object_key))
+
+
+def read_json_header_from_s3(bucket, object_key, fields=RESULTS_HEADER_FIELDS):
+    """
+    Reads just the leading fields of a JSON object in S3, whether or not it has been compressed, and then closes the
+    object without downloading the rest of it
+
+    :param bucket: Bucket to read the data from
+    :param object_key: Key of the S3 object to read
+    :param fields: Top-level fields of the JSON that are wanted
+    :return: Dictionary of the top-level fields that were read
+    """
+    s3_object = pcacommon.get_s3_client().get_object(Bucket=bucket, Key=object_key)
+    try:
+        json_stream = pcajsoncodec.decompressing_stream(s3_object["Body"], s3_object.get("ContentEncoding"))
+        return pcajsonstream.JSONStreamReader(json_stream, [], RESULTS_HEADER_CHUNK_SIZE).read_leading_fields(fields)
+    finally:
+        s3_object["Body"].close()
+
+
+def copy_results_in_s3(source_bucket, source_key, dest_bucket, dest_key, compression=RESULTS_FINAL_COMPRESSION):
+    """
+    Copies a results file to a new location with the requested compression.  If the file is already compressed
+    that way then S3 copies it directly, otherwise its JSON bytes are decoded and re-written with the new compression
+
+    :param source_bucket: Bucket holding the results file
+    :param source_key: Key of the results file
+    :param dest_bucket: Bucket to copy the results file to
+    :param dest_key: Key to copy the results file to
+    :param compression: Compression to use for the new file - "none", "gzip" or "zstd"
+    """
+    s3_client = pcacommon.get_s3_client()
+    source_encoding = s3_client.head_object(Bucket=source_bucket, Key=source_key).get("ContentEncoding")
+    if source_encoding == pcajsoncodec.get_content_encoding(compression):
+        copy_source = {'Bucket': source_bucket, 'Key': source_key}
+        s3_client.copy(copy_source, dest_bucket, dest_key)
+    else:
+        json_bytes = open_json_from_s3(source_bucket, source_key).read()
+        write_json_bytes_to_s3(json_bytes, dest_bucket, dest_key, compression)
+
+
+class WordConfidenceList:
+    """
+    Class to hold the word-level data for a speech segment.  Rather than one dictionary per word, this holds
+    parallel arrays of each word's text, confidence score, and start and end times, and the words are only
+    turned into the output JSON dictionaries when the results are written out
+    """
+    __slots__ = ("texts", "confidences", "start_times", "end_times")
+
+    def __init__(self):
+        self.texts = []
+        self.confidences = array("d")
+        self.start_times = array("d")
+        self.end_times = array("d")
+
+    def __len__(self):
+        return len(self.texts)
+
+    def append(self, text, confidence, start_time, end_time):
+        """
+        Adds a word to the end of the list
+
+        :param text: Text of the word, including any leading space or trailing punctuation
+        :param confidence: Transcribe confidence score for the word
+        :param start_time: Start time of the word in seconds
+        :param end_time: End time of the word in seconds
+        """
+        self.texts.append(text)
+        self.confidences.append(confidence)
+        self.start_times.append(start_time)
+        self.end_times.append(end_time)
+
+    def extend(self, other):
+        """
+        Adds all of the words from another list to the end of this one
+        """
+        self.texts.extend(other.texts)
+        self.confidences.extend(other.confidences)
+        self.start_times.extend(other.start_times)
+        self.end_times.extend(other.end_times)
+
+    def select(self, indexes):
+        """
+        Returns a new list holding just the words at the given positions
+
+        :param indexes: Positions of the words to keep, in the order to keep them
+        :return: New word confidence list
+        """
+        selected = WordConfidenceList()
+        for index in indexes:
+            selected.append(self.texts[index], self.confidences[index], self.start_times[index], self.end_times[index])
+        return selected
+
+    def create_json_output(self):
+        """
+        Creates the output "WordConfidence" list, with one dictionary per word
+        """
+        return [{"Text": text, "Confidence": confidence, "StartTime": start_time, "EndTime": end_time}
+                for text, confidence, start_time, end_time in
+                zip(self.texts, self.confidences, self.start_times, self.end_times)]
+
+    def create_compact_json_output(self, time_digits=WORD_TIME_DIGITS, confidence_digits=WORD_CONFIDENCE_DIGITS):
+        """
+        Creates the output "WordConfidence" for the compact schema, which is a dictionary holding one list for
+        each of the word fields, with the times and confidence scores rounded to the given number of decimal places
+
+        :param time_digits: Number of decimal places to keep for the word start and end times
+        :param confidence_digits: Number of decimal places to keep for the word confidence scores
+        """
+        # Rounding via an integer is much quicker than round(value, digits), and gives the same results here
+        time_scale = 10 ** time_digits
+        confidence_scale = 10 ** confidence_digits
+        return {"Text": list(self.texts),
+                "Confidence": [round(confidence * confidence_scale) / confidence_scale
+                               for confidence in self.confidences],
+                "StartTime": [round(start_time * time_scale) / time_scale for start_time in self.start_times],
+                "EndTime": [round(end_time * time_scale) / time_scale for end_time in self.end_times]}
+
+    @classmethod
+    def parse_json_input(cls, json_input):
+        """
+        Creates a word confidence list from a "WordConfidence" entry in a results file, which is either a list of
+        word dictionaries or, for the compact schema, a dictionary of lists
+        """
+        word_list = cls()
+        if isinstance(json_input, dict):
+            word_list.texts = list(json_input["Text"])
+            word_list.confidences = array("d", json_input["Confidence"])
+            word_list.start_times = array("d", json_input["StartTime"])
+            word_list.end_times = array("d", json_input["EndTime"])
+            return word_list
+
+        word_list.texts = [word["Text"] for word in json_input]
+        word_list.confidences = array("d", [word["Confidence"] for word in json_input])
+        word_list.start_times = array("d", [word["StartTime"] for word in json_input])
+        word_list.end_times = array("d", [word["EndTime"] for word in json_input])
+        return word_list
+
 
 class SpeechSegment:
     """ Class to hold information about a single speech segment """
+    __slots__ = ("segmentStartTime", "segmentEndTime", "segmentSpeaker", "segmentTextParts", "segmentConfidence",
+                 "segmentSentiment", "segmentSentimentScore", "segmentPositive", "segmentNegative",
+                 "segmentIsPositive", "segmentIsNegative", "segmentAllSentiments", "segmentCustomEntities",
+                 "segmentLoudnessScores", "segmentInterruption", "segmentIssuesDetected",
+                 "segmentActionItemsDetected", "segmentOutcomesDetected", "segmentCategoriesDetectedPre",
+                 "segmentCategoriesDetectedPost", "segmentIVR")
+
     def __init__(self):
         self.segmentStartTime = 0.0
         self.segmentEndTime = 0.0
         self.segmentSpeaker = ""
         self.segmentText = ""
-        self.segmentConfidence = []
+        self.segmentConfidence = WordConfidenceList()
+        self.segmentSentiment = ""
         self.segmentSentimentScore = 0.0
         self.segmentPositive = 0.0
         self.segmentNegative = 0.0
@@ -57,6 +351,68 @@ class SpeechSegment:
         # Not in original version, so may not exist in legacy files
         self.segmentIVR = False
 
+    @property
+    def segmentText(self):
+        """
+        Full text of the segment.  Text is collected as a list of parts while the segment is being built, and
+        these are only joined into a single string when the text is actually needed
+        """
+        if len(self.segmentTextParts) > 1:
+            self.segmentTextParts = ["".join(self.segmentTextParts)]
+        return self.segmentTextParts[0] if self.segmentTextParts else ""
+
+    @segmentText.setter
+    def segmentText(self, text):
+        self.segmentTextParts = [text]
+
+    def parse_json_input(self, json_input):
+        """
+        Fills in this speech segment from a "SpeechSegments" entry in a results file
+
+        :param json_input: JSON speech segment entry
+        """
+        # Standard segment data
+        self.segmentStartTime = float(json_input["SegmentStartTime"])
+        self.segmentEndTime = float(json_input["SegmentEndTime"])
+        self.segmentSpeaker = json_input["SegmentSpeaker"]
+        self.segmentInterruption = bool(json_input["SegmentInterruption"])
+        self.segmentText = json_input["OriginalText"]
+        self.segmentLoudnessScores = json_input["LoudnessScores"]
+        self.segmentIsPositive = bool(json_input["SentimentIsPositive"])
+        self.segmentIsNegative = bool(json_input["SentimentIsNegative"])
+        self.segmentSentimentScore = float(json_input["SentimentScore"])
+        self.segmentAllSentiments = json_input["BaseSentimentScores"]
+        self.segmentCustomEntities = json_input["EntitiesDetected"]
+        self.segmentCategoriesDetectedPre = json_input["CategoriesDetected"]
+        self.segmentCategoriesDetectedPost = json_input["FollowOnCategories"]
+        self.segmentIssuesDetected = json_input["IssuesDetected"]
+        self.segmentActionItemsDetected = json_input["ActionItemsDetected"]
+        self.segmentOutcomesDetected = json_input["OutcomesDetected"]
+        self.segmentConfidence = WordConfidenceList.parse_json_input(json_input["WordConfidence"])
+
+        # Additional segment data (not in original version)
+        if "IVRSegment" in json_input:
+            self.segmentIVR = bool(json_input["IVRSegment"])
+
+    def append_text(self, text):
+        """
+        Appends some text, e.g. the next word, to the end of the segment's text
+
+        :param text: Text to be appended
+        """
+        self.segmentTextParts.append(text)
+
+    def append_segment_text(self, segment, separator=" "):
+        """
+        Appends the text of another segment to the end of this one's, with a separator between them.  The
+        other segment's text parts are taken as they are, so neither segment's text needs to be joined yet
+
+        :param segment: Segment whose text is to be appended
+        :param separator: Text to put between the two segments' text
+        """
+        self.segmentTextParts.append(separator)
+        self.segmentTextParts.extend(segment.segmentTextParts)
+
 
 class ConversationAnalytics:
     """ Class to hold the header-level analytics information about a call """
@@ -225,16 +581,22 @@ class ConversationAnalytics:
 
         # If we had some categories then ensure each segment is tagged with them
         if len(timed_categories) > 0:
-            # Go through each speech segment and see if a category fits here
+            # A category belongs to the first segment that starts at or after it.  Using the running maximum of
+            # the segment start times keeps this list sorted, so each category's segment can be found by bisection
+            latest_start_times = []
+            latest_start = None
             for segment in speech_segments:
-                for cat_time in timed_categories.copy().keys():
-                    if cat_time <= segment.segmentStartTime:
-                        segment.segmentCategoriesDetectedPre += timed_categories[cat_time]
-                        timed_categories.pop(cat_time)
-
-            # If we have any categories left then tag them to the final segment
-            for category in timed_categories:
-                speech_segments[-1].segmentCategoriesDetectedPost += timed_categories[category]
+                if (latest_start is None) or (segment.segmentStartTime > latest_start):
+                    latest_start = segment.segmentStartTime
+                latest_start_times.append(latest_start)
+
+            # Tag each category onto its segment - any that are after the last segment start go onto the final one
+            for cat_time, cat_names in timed_categories.items():
+                segment_index = bisect.bisect_left(latest_start_times, cat_time)
+                if segment_index < len(speech_segments):
+                    speech_segments[segment_index].segmentCategoriesDetectedPre += cat_names
+                else:
+                    speech_segments[-1].segmentCategoriesDetectedPost += cat_names
 
         # Return the header structure for detected categories
         return categories_detected
@@ -337,8 +699,49 @@ class PCAResults:
     UNKNOWN_SPEAKER_PREFIX = "Unknown_"
 
     def __init__(self):
-        self.speech_segments = []
         self.analytics = ConversationAnalytics()
+        self.segment_list = []
+        self.unread_segments = None
+        self.unread_segments_schema = None
+        self.header_only = False
+
+        # Where these results were read from, and what their header and segments looked like then, which is used
+        # to only write out what has changed when they're written back to the same interim results file
+        self.source_location = None
+        self.source_header = None
+        self.source_schema = None
+        self.source_has_patch = False
+        self.segments_changed = True
+
+    @property
+    def speech_segments(self):
+        """
+        List of speech segments for the conversation.  If the results were read in lazily then the segments are
+        only built from the results file the first time that they are needed.  We can't tell if the caller then
+        changes them, so once they have been used they always have to be written back out in full
+        """
+        if self.unread_segments is not None:
+            self.build_speech_segments()
+        self.segments_changed = True
+        return self.segment_list
+
+    @speech_segments.setter
+    def speech_segments(self, segments):
+        self.segment_list = segments
+        self.unread_segments = None
+        self.header_only = False
+        self.segments_changed = True
+
+    def build_speech_segments(self):
+        """
+        Builds our speech segments from the "SpeechSegments" entries of the results file that was read in
+        """
+        self.segment_list = []
+        for next_segment in self.unread_segments:
+            new_segment = SpeechSegment()
+            new_segment.parse_json_input(next_segment)
+            self.segment_list.append(new_segment)
+        self.unread_segments = None
 
     def get_speaker_prefix(self, known_speaker):
         """
@@ -359,11 +762,18 @@ class PCAResults:
         """
         return self.analytics
 
-    def create_output_speech_segments(self):
+    def create_output_speech_segments(self, schema=RESULTS_SCHEMA):
         """
         Creates a list of speech segments for this conversation
+
+        :param schema: Results schema to use for the word data - "standard" or "compact"
         """
+        # Segments that were read lazily and never used can go back out as they were, if the schema hasn't changed
+        if (self.unread_segments is not None) and (schema == self.unread_segments_schema):
+            return self.unread_segments
+
         speech_segments = []
+        compact = (schema == RESULTS_SCHEMA_COMPACT)
 
         # Loop through each of our speech segments
         # for segment in self.speechSegmentList:
@@ -388,21 +798,76 @@ class PCAResults:
                             "IssuesDetected": segment.segmentIssuesDetected,
                             "ActionItemsDetected": segment.segmentActionItemsDetected,
                             "OutcomesDetected": segment.segmentOutcomesDetected,
-                            "WordConfidence": segment.segmentConfidence}
+                            "WordConfidence": segment.segmentConfidence.create_compact_json_output() if compact
+                            else segment.segmentConfidence.create_json_output()}
 
             # Add what we have to the full list
             speech_segments.append(next_segment)
 
         return speech_segments
 
-    def write_results_to_s3(self, object_key=None, bucket=None, interim=False):
+    def write_header_sidecar_to_s3(self, bucket, object_key):
+        """
+        Writes out the header sidecar for a results file, which just holds the ConversationAnalytics section.  This
+        is always uncompressed, as it's only a few KB
+
+        :param bucket: Bucket holding the results file
+        :param object_key: Key of the results file, which the sidecar key is based on
+        :return: Key of the header sidecar
+        """
+        sidecar_key = get_header_sidecar_key(object_key)
+        write_json_to_s3({"ConversationAnalytics": self.analytics.create_json_output()}, bucket, sidecar_key,
+                         compression="none")
+        return sidecar_key
+
+    def is_delta_write(self, bucket, object_key, schema=RESULTS_SCHEMA):
+        """
+        Checks if writing these results to the given location only needs their header to be written, which is
+        the case if they were read from that same interim results file and their speech segments are unchanged
+
+        :param bucket: Bucket where the results are to be written
+        :param object_key: Key of the file where the results are to be written
+        :param schema: Results schema to use for the file - the segments would need re-writing if it has changed
+        :return: True if only the header needs to be written
+        """
+        return RESULTS_DELTA_WRITES and (self.source_location == (bucket, object_key)) and \
+            is_interim_results_key(object_key) and (not self.segments_changed) and \
+            (self.header_only or (schema == self.source_schema))
+
+    def write_header_patch_to_s3(self):
+        """
+        Writes out a header patch for the interim results file that these results were read from, but only if the
+        header has changed since it was read - if it hasn't then nothing is written at all
+
+        :return: JSON results object, which just holds the ConversationAnalytics section
         """
-        Writes out the PCA result data to the specified bucket/key location.
+        bucket, object_key = self.source_location
+        header_json = self.analytics.create_json_output()
+        header_bytes = pcajsoncodec.dumps(header_json)
+        if header_bytes == self.source_header:
+            print(f"Results in {object_key} are unchanged, so not writing them")
+        else:
+            write_json_bytes_to_s3(pcajsoncodec.dumps({"ConversationAnalytics": header_json}), bucket,
+                                   get_header_patch_key(object_key), compression="none")
+            self.source_header = header_bytes
+            self.source_has_patch = True
+
+        return {"ConversationAnalytics": header_json}
+
+    def write_results_to_s3(self, object_key=None, bucket=None, interim=False, compression=RESULTS_COMPRESSION,
+                            schema=RESULTS_SCHEMA, header_sidecar=False, delta=RESULTS_DELTA_WRITES):
+        """
+        Writes out the PCA result data to the specified bucket/key location.  If the file is compressed then its
+        S3 Content-Encoding is set to match, which is what the readers use to decompress it.
 
         :param bucket: Bucket where the results are to be uploaded to
         :param object_key: Name of the output file for the results
         :param interim: Forcibly writes the key to our interim results folder
-        :return: JSON results object
+        :param compression: Compression to use for the file - "none", "gzip" or "zstd"
+        :param schema: Results schema to use for the file - "standard" or "compact"
+        :param header_sidecar: Also write a header sidecar next to the results file
+        :param delta: Only write what has changed if these results are going back to the interim file they came from
+        :return: JSON results object, which only holds the ConversationAnalytics section for a delta write
         :return: Destination S3 object key
         """
 
@@ -414,16 +879,32 @@ class PCAResults:
             dest_bucket = bucket
             dest_key = object_key
 
-        # Generate the JSON output from our internal structures
-        json_data = {"ConversationAnalytics": self.analytics.create_json_output(),
-                     "SpeechSegments": self.create_output_speech_segments()}
-
-        # Write out the JSON data to the specified S3 location
-        s3_resource = boto3.resource('s3')
-        s3_object = s3_resource.Object(dest_bucket, dest_key)
-        s3_object.put(
-            Body=(bytes(json.dumps(json_data).encode('UTF-8')))
-        )
+        # If the results are going back to the interim file that they came from, and the speech segments in it are
+        # still correct, then only the header might need writing - this even works after a header-only read
+        if delta and self.is_delta_write(dest_bucket, dest_key, schema):
+            return self.write_header_patch_to_s3(), dest_key
+
+        # A header-only read has no speech segments, so writing it out would lose them from the file
+        if self.header_only:
+            raise ValueError(f"Unable to write results to {dest_key}, as only their header was read in")
+
+        # Generate the JSON output from our internal structures, with compact files tagged with their schema version
+        json_data = {}
+        if schema == RESULTS_SCHEMA_COMPACT:
+            json_data["SchemaVersion"] = COMPACT_SCHEMA_VERSION
+        json_data["ConversationAnalytics"] = self.analytics.create_json_output()
+        json_data["SpeechSegments"] = self.create_output_speech_segments(schema)
+
+        # Write out the JSON data to the specified S3 location - the codec serialises straight to bytes.  Any
+        # sidecar goes first, so that it's already there for anything triggered by the results file being written
+        if header_sidecar:
+            self.write_header_sidecar_to_s3(dest_bucket, dest_key)
+        write_json_to_s3(json_data, dest_bucket, dest_key, compression)
+
+        # The file now has the latest header, so any patch that we read in with it is out of date
+        if self.source_has_patch and (self.source_location == (dest_bucket, dest_key)):
+            delete_header_patch_from_s3(dest_bucket, dest_key)
+            self.source_has_patch = False
 
         # Return the JSON in case the caller needs it, and the actual output filename
         return json_data, dest_key
@@ -465,48 +946,66 @@ class PCAResults:
                               "Values": header_ent_dict[entity]}
                 self.analytics.custom_entities.append(nextEntity)
 
-    def read_results_from_s3(self, bucket, object_key, offline=False):
+    def read_results_from_s3(self, bucket, object_key, offline=False, header_only=False,
+                             lazy=RESULTS_LAZY_SEGMENTS):
+        """
+        Reads in a PCA results file, either from S3 or from our local temporary folder
+
+        :param bucket: Bucket holding the results file
+        :param object_key: Key of the results file
+        :param offline: Read the file from our local temporary folder rather than S3
+        :param header_only: Only read the ConversationAnalytics header, which means these results can't be written back
+                            out unless the speech segments are replaced
+        :param lazy: Only build the speech segments when they are first used
+        """
 
-        # Download results file from S3
-        local_filename = TMP_DIR + object_key.split('/')[-1]
+        # Parse the results straight from the S3 object body, or from a local file if we're offline.  An interim
+        # file may also have a header patch from a delta write, which replaces the header in the file itself
+        header_patch = None
         if not offline:
-            s3_client = boto3.client('s3')
-            s3_client.download_file(bucket, object_key, local_filename)
+            if header_only:
+                json_data = read_json_header_from_s3(bucket, object_key)
+            else:
+                json_data = read_json_from_s3(bucket, object_key)
+            if RESULTS_DELTA_WRITES and is_interim_results_key(object_key):
+                header_patch = read_header_patch_from_s3(bucket, object_key)
+                if header_patch is not None:
+                    json_data["ConversationAnalytics"] = header_patch["ConversationAnalytics"]
+        else:
+            local_filename = TMP_DIR + object_key.split('/')[-1]
+            with open(Path(local_filename).absolute(), "rb") as json_file:
+                # Local files have no Content-Encoding, so see if it's compressed from its first few bytes
+                content_encoding = pcajsoncodec.detect_content_encoding(json_file.read(4))
+                json_file.seek(0)
+                json_stream = pcajsoncodec.decompressing_stream(json_file, content_encoding)
+                if header_only:
+                    json_reader = pcajsonstream.JSONStreamReader(json_stream, [], RESULTS_HEADER_CHUNK_SIZE)
+                    json_data = json_reader.read_leading_fields(RESULTS_HEADER_FIELDS)
+                else:
+                    json_data = pcajsoncodec.load_stream(json_stream)
 
-        # Load data into JSON structure
-        json_filepath = Path(local_filename)
-        json_data = json.load(open(json_filepath.absolute(), "r", encoding="utf-8"))
+        # Files using the compact schema are tagged with its version, and their word data is unpacked per segment
+        schema_version = json_data.get("SchemaVersion", 1)
+        if schema_version > COMPACT_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported results schema version {schema_version} in {object_key}")
 
         # First parse out the main analytics
         self.analytics.parse_json_input(json_data["ConversationAnalytics"])
 
-        # Loop around each defined segment in the JSON, and create a new data structure
+        # Then the speech segments, which are either built now or left until they're first used
         self.speech_segments = []
-        for next_segment in json_data["SpeechSegments"]:
-            new_segment = SpeechSegment()
-
-            # Standard segment data
-            new_segment.segmentStartTime = float(next_segment["SegmentStartTime"])
-            new_segment.segmentEndTime = float(next_segment["SegmentEndTime"])
-            new_segment.segmentSpeaker = next_segment["SegmentSpeaker"]
-            new_segment.segmentInterruption = bool(next_segment["SegmentInterruption"])
-            new_segment.segmentText = next_segment["OriginalText"]
-            new_segment.segmentLoudnessScores = next_segment["LoudnessScores"]
-            new_segment.segmentIsPositive = bool(next_segment["SentimentIsPositive"])
-            new_segment.segmentIsNegative = bool(next_segment["SentimentIsNegative"])
-            new_segment.segmentSentimentScore = float(next_segment["SentimentScore"])
-            new_segment.segmentAllSentiments = next_segment["BaseSentimentScores"]
-            new_segment.segmentCustomEntities = next_segment["EntitiesDetected"]
-            new_segment.segmentCategoriesDetectedPre = next_segment["CategoriesDetected"]
-            new_segment.segmentCategoriesDetectedPost = next_segment["FollowOnCategories"]
-            new_segment.segmentIssuesDetected = next_segment["IssuesDetected"]
-            new_segment.segmentActionItemsDetected = next_segment["ActionItemsDetected"]
-            new_segment.segmentOutcomesDetected = next_segment["OutcomesDetected"]
-            new_segment.segmentConfidence = next_segment["WordConfidence"]
-
-            # Additional segment data (not in original version)
-            if "IVRSegment" in next_segment:
-                new_segment.segmentIVR = bool(next_segment["IVRSegment"])
-
-            # Add what we have to the full list
-            self.speech_segments.append(new_segment)
+        if header_only:
+            self.header_only = True
+        else:
+            self.unread_segments = json_data["SpeechSegments"]
+            self.unread_segments_schema = RESULTS_SCHEMA_COMPACT if schema_version == COMPACT_SCHEMA_VERSION \
+                else RESULTS_SCHEMA_STANDARD
+            if not lazy:
+                self.build_speech_segments()
+
+        # Remember where these results came from and what they were like, so that we can tell what has changed
+        self.source_location = None if offline else (bucket, object_key)
+        self.source_header = pcajsoncodec.dumps(self.analytics.create_json_output())
+        self.source_schema = self.unread_segments_schema
+        self.source_has_patch = header_patch is not None
+        self.segments_changed = False
@@ -0,0 +1,73 @@
+"""
+This python function is part of the main processing workflow.  It provides a small index over a set of points on
+a call's timeline, such as the start times of interruptions, so that questions like "does anything start inside
+this turn?" can be answered by bisection rather than by scanning every point for every turn.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import bisect
+
+
+class TimelineIndex:
+    """
+    Sorted index of timeline points, each of which can carry an optional item of data.  All window lookups
+    use a half-open window [window_start, window_end), and any units can be used as long as they're consistent
+    """
+    def __init__(self, points=None):
+        """
+        :param points: Optional list of (time, item) tuples to build the index from
+        """
+        self.times = []
+        self.items = []
+        if points:
+            ordered_points = sorted(points, key=lambda point: point[0])
+            self.times = [point[0] for point in ordered_points]
+            self.items = [point[1] for point in ordered_points]
+
+    @classmethod
+    def from_entries(cls, entries, time_key):
+        """
+        Builds an index from a list of dictionaries, using one of the dictionary fields as the timeline point
+
+        :param entries: List of dictionaries, e.g. the interruption entries from Call Analytics
+        :param time_key: Name of the field holding the time, e.g. BeginOffsetMillis
+        :return: Timeline index with each dictionary as the item for its point
+        """
+        return cls([(entry[time_key], entry) for entry in entries])
+
+    def __len__(self):
+        return len(self.times)
+
+    def window_bounds(self, window_start, window_end):
+        """
+        Returns the range of list positions in the index for the points inside the window
+        """
+        first = bisect.bisect_left(self.times, window_start)
+        last = bisect.bisect_left(self.times, window_end, lo=first)
+        return first, last
+
+    def any_in_window(self, window_start, window_end):
+        """
+        Checks if any point in the index falls inside the window
+
+        :param window_start: Start of the window, which is inclusive
+        :param window_end: End of the window, which is exclusive
+        :return: True if there is at least one point in the window
+        """
+        first, last = self.window_bounds(window_start, window_end)
+        return last > first
+
+    def count_in_window(self, window_start, window_end):
+        """
+        Returns how many points in the index fall inside the window
+        """
+        first, last = self.window_bounds(window_start, window_end)
+        return last - first
+
+    def items_in_window(self, window_start, window_end):
+        """
+        Returns the items for all of the points inside the window, in time order
+        """
+        first, last = self.window_bounds(window_start, window_end)
+        return self.items[first:last]
@@ -0,0 +1,109 @@
+"""
+Reports how long it takes to place Call Analytics category hits onto the speech segments of a call, for synthetic
+calls with different numbers of segments and category hits.  Each test also shows a digest of where every category
+was placed, so running it against an older checkout of the Lambda function code with --source shows both the
+before and after times and that the placements have not changed, e.g.
+
+python pca-server/tools/pca-category-benchmark.py --segments 500 2000 --hits 100 500 1000
+python pca-server/tools/pca-category-benchmark.py --source /tmp/pca-old/pca-server/src/pca
+
+Run it with the same packages available as the Lambda functions have.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import pcabenchmark
+
+
+def create_segments(pcaresults, segment_count, rng):
+    """
+    Creates speech segments with increasing start times, except that the occasional one starts before the one
+    before it, as happens when speakers talk over each other in a channel-separated call
+
+    :param pcaresults: The pcaresults module
+    :param segment_count: Number of speech segments
+    :param rng: Random number generator
+    :return: List of speech segments
+    :return: End time of the call in seconds
+    """
+    segments = []
+    position = 0.0
+    for index in range(segment_count):
+        start_time = position if rng.random() > 0.05 else max(0.0, position - rng.uniform(0, 10))
+        segment = pcaresults.SpeechSegment()
+        segment.segmentStartTime = round(start_time, 3)
+        segments.append(segment)
+        position += rng.uniform(0.5, 5.0)
+    return segments, position
+
+
+def create_categories(category_count, hit_count, call_duration, rng):
+    """
+    Creates the "Categories" block of a Call Analytics job, with the hits spread across the categories and the call.
+    Hits are on half-second boundaries, so that some of them share a start time
+
+    :param category_count: Number of matched categories
+    :param hit_count: Total number of points of interest across all of the categories
+    :param call_duration: Length of the call in seconds
+    :param rng: Random number generator
+    :return: Call Analytics "Categories" block
+    """
+    details = {}
+    for category in range(category_count):
+        points = []
+        for hit in range(hit_count // category_count):
+            begin = rng.randint(0, int((call_duration + 20) * 1000))
+            begin -= begin % 500
+            points.append({"BeginOffsetMillis": begin, "EndOffsetMillis": begin + 1000})
+        details[f"category-{category}"] = {"PointsOfInterest": points}
+    return {"MatchedCategories": list(details), "MatchedDetails": details}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports how long it takes to place Call Analytics category hits "
+                                                 "onto the speech segments of synthetic calls")
+    parser.add_argument("--segments", type=int, nargs="+", default=[500, 2000], help="number of speech segments")
+    parser.add_argument("--hits", type=int, nargs="+", default=[100, 500, 1000],
+                        help="total number of category hits")
+    parser.add_argument("--categories", type=int, default=40, help="number of matched categories")
+    parser.add_argument("--runs", type=int, default=5, help="number of times to place the categories")
+    pcabenchmark.add_source_argument(parser)
+    args = parser.parse_args()
+
+    pcabenchmark.load_pca_source(args.source)
+    import pcaresults
+
+    print(f"{'SEGMENTS':>9} {'HITS':>6} {'PLACE (ms)':>11}  PLACEMENT DIGEST")
+    for segment_count in args.segments:
+        for hit_count in args.hits:
+            rng = random.Random(segment_count * 100000 + hit_count)
+            segments, call_duration = create_segments(pcaresults, segment_count, rng)
+            categories = create_categories(args.categories, hit_count, call_duration, rng)
+
+            # Placing the categories adds them to the segments, so they're cleared before each run
+            best = None
+            header = None
+            for run in range(max(1, args.runs)):
+                for segment in segments:
+                    segment.segmentCategoriesDetectedPre = []
+                    segment.segmentCategoriesDetectedPost = []
+                analytics = pcaresults.ConversationAnalytics()
+                start = time.perf_counter()
+                header = analytics.extract_analytics_categories(categories, segments)
+                elapsed = time.perf_counter() - start
+                if (best is None) or (elapsed < best):
+                    best = elapsed
+
+            placements = [[segment.segmentCategoriesDetectedPre, segment.segmentCategoriesDetectedPost]
+                          for segment in segments]
+            digest = hashlib.md5(json.dumps([header, placements]).encode("utf-8")).hexdigest()
+            print(f"{segment_count:>9} {hit_count:>6} {best * 1000:>11.2f}  {digest}")
+
+
+if __name__ == "__main__":
+    main()
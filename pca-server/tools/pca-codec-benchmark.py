@@ -0,0 +1,101 @@
+"""
+Reports how long it takes to write and read back large PCA results files with each JSON codec and compression
+setting.  The results are built by running the turn-by-turn parser over synthetic Transcribe transcripts, then
+each one is serialised and compressed in the same way as PCAResults.write_results_to_s3, and read back in with
+PCAResults.read_results_from_s3 from a local file, which uses the same streaming parse as the S3 object body.
+Each round trip is checked to give back the same results.  Run it with the same packages available as the Lambda
+functions have, e.g.
+
+python pca-server/tools/pca-codec-benchmark.py --words 50000 --compression none gzip
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import argparse
+import tempfile
+from pathlib import Path
+import pcabenchmark
+
+# Name of the results file written to the temporary folder
+RESULTS_FILENAME = "benchmark.json"
+
+
+def create_results_json(results, schema):
+    """
+    Generates the JSON data for a results file in the same way as PCAResults.write_results_to_s3
+
+    :param results: PCA results
+    :param schema: Results schema to use - "standard" or "compact"
+    :return: JSON data
+    """
+    import pcaresults
+    json_data = {}
+    if schema == pcaresults.RESULTS_SCHEMA_COMPACT:
+        json_data["SchemaVersion"] = pcaresults.COMPACT_SCHEMA_VERSION
+    json_data["ConversationAnalytics"] = results.analytics.create_json_output()
+    json_data["SpeechSegments"] = results.create_output_speech_segments(schema)
+    return json_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports the write and read times of large PCA results files for "
+                                                 "each JSON codec and compression setting")
+    parser.add_argument("--words", type=int, nargs="+", default=[20000, 50000, 100000],
+                        help="number of words in each call")
+    parser.add_argument("--codecs", nargs="+", default=["json", "orjson"], help="JSON codecs to compare")
+    parser.add_argument("--compression", nargs="+", default=["none", "gzip", "zstd"],
+                        help="compression settings to compare")
+    parser.add_argument("--schema", choices=["standard", "compact"], default="standard",
+                        help="results schema to write the files with")
+    parser.add_argument("--runs", type=int, default=3, help="number of times to write and read each file")
+    pcabenchmark.add_source_argument(parser)
+    args = parser.parse_args()
+
+    pcabenchmark.load_pca_source(args.source)
+    import pcaresults
+    import pcajsoncodec
+    turn_by_turn = pcabenchmark.load_handler(args.source, "pca-aws-sf-process-turn-by-turn")
+
+    # Results files are read from the temporary folder when PCA is run offline, so point that at our own one
+    temp_folder = tempfile.TemporaryDirectory()
+    pcaresults.TMP_DIR = temp_folder.name + "/"
+    results_file = Path(temp_folder.name) / RESULTS_FILENAME
+
+    print(f"{'WORDS':>8} {'CODEC':>7} {'COMPRESSION':>12} {'SIZE (MB)':>10} {'WRITE (ms)':>11} {'READ (ms)':>10}  "
+          f"ROUND TRIP")
+    for word_count in args.words:
+        asr_output = pcabenchmark.generate_channel_transcript(word_count)
+        transcribe_parser, segments = pcabenchmark.create_turn_by_turn_segments(turn_by_turn, asr_output, True)
+        transcribe_parser.speechSegmentList = segments
+        transcribe_parser.push_turn_by_turn_results()
+        original_json = create_results_json(transcribe_parser.pca_results, args.schema)
+
+        for codec_name in args.codecs:
+            pcajsoncodec.json_codec = pcajsoncodec.get_json_codec(codec_name)
+            for compression in args.compression:
+                content_encoding = pcajsoncodec.get_content_encoding(compression)
+
+                # Generate, serialise and compress the results
+                write_time, json_bytes = pcabenchmark.best_time(
+                    lambda: pcajsoncodec.compress(pcajsoncodec.dumps(
+                        create_results_json(transcribe_parser.pca_results, args.schema)), content_encoding),
+                    args.runs)
+                results_file.write_bytes(json_bytes)
+
+                # Read them back in, building all of the speech segments
+                def read_results():
+                    results = pcaresults.PCAResults()
+                    results.read_results_from_s3("", RESULTS_FILENAME, offline=True, lazy=False)
+                    return results
+                read_time, read_back = pcabenchmark.best_time(read_results, args.runs)
+
+                round_trip = "OK" if create_results_json(read_back, args.schema) == original_json else "DIFFERENT"
+                print(f"{word_count:>8} {pcajsoncodec.json_codec.name:>7} {content_encoding or 'none':>12} "
+                      f"{len(json_bytes) / 1000000:>10.2f} {write_time * 1000:>11.1f} {read_time * 1000:>10.1f}  "
+                      f"{round_trip}")
+
+    temp_folder.cleanup()
+
+
+if __name__ == "__main__":
+    main()
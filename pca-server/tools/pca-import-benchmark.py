@@ -0,0 +1,94 @@
+"""
+Reports how long each of the PCA Lambda handlers takes to import, which is the work that they do in the Lambda
+init phase, along with the modules that take the longest to import.  Each handler is imported in a new Python
+process using "python -X importtime", so nothing is shared between them.  Run it from anywhere with the same
+packages available as the Lambda functions have, e.g.
+
+python pca-server/tools/pca-import-benchmark.py --top 5
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+# Folder holding the Lambda function code
+PCA_SOURCE_FOLDER = Path(__file__).resolve().parent.parent / "src" / "pca"
+
+# Written to stderr just before the handler is imported, so we can skip Python's own start-up imports
+IMPORT_START_MARKER = "--- PCA handler import ---"
+
+# Environment variables that some handlers read when they are imported
+HANDLER_ENVIRONMENT = {"AWS_REGION": "us-east-1", "AWS_DEFAULT_REGION": "us-east-1"}
+
+
+def import_handler(module_name, runs):
+    """
+    Imports a handler module in a new Python process, and returns the import times that it reports.  If more than
+    one run is asked for then the fastest run is used, as that is the least affected by anything else on the machine
+
+    :param module_name: Name of the handler module, e.g. "pca-aws-sf-summarize"
+    :param runs: Number of times to import it
+    :return: Total import time in microseconds, including running the handler's own module, or None if the
+             import failed
+    :return: List of (cumulative microseconds, depth, module name) for every module that was imported
+    :return: Error message if the import failed
+    """
+    code = f"import sys, time, importlib; sys.stderr.write('{IMPORT_START_MARKER}\\n'); " \
+           f"start = time.perf_counter(); importlib.import_module('{module_name}'); " \
+           f"print(int((time.perf_counter() - start) * 1000000))"
+    env = dict(os.environ)
+    for name, value in HANDLER_ENVIRONMENT.items():
+        env.setdefault(name, value)
+
+    best_total = None
+    best_modules = []
+    for run in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=PCA_SOURCE_FOLDER, env=env,
+                                capture_output=True, text=True)
+        lines = result.stderr.split(IMPORT_START_MARKER, 1)[-1].splitlines()
+        if result.returncode != 0:
+            return None, [], lines[-1] if lines else "unknown error"
+
+        # Lines look like "import time:  self [us] | cumulative | imported package", with the package name
+        # indented by two spaces for each level of nesting
+        modules = []
+        for line in lines:
+            if line.startswith("import time:") and "|" in line:
+                fields = line[len("import time:"):].split("|")
+                if fields[1].strip().isdigit():
+                    name = fields[2].rstrip()
+                    depth = (len(name) - len(name.lstrip())) // 2
+                    modules.append((int(fields[1]), depth, name.strip()))
+        total = int(result.stdout.split()[-1])
+        if (best_total is None) or (total < best_total):
+            best_total, best_modules = total, modules
+    return best_total, best_modules, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports the import time of each PCA Lambda handler")
+    parser.add_argument("--top", type=int, default=3, help="number of slowest modules to show for each handler")
+    parser.add_argument("--runs", type=int, default=3, help="number of times to import each handler")
+    parser.add_argument("handlers", nargs="*", help="handler modules to check, by default all of them")
+    args = parser.parse_args()
+
+    handlers = args.handlers or sorted(path.stem for path in PCA_SOURCE_FOLDER.glob("pca-*.py"))
+    print(f"{'HANDLER':<45} {'IMPORT (ms)':>11}  SLOWEST MODULES (cumulative ms)")
+    for handler in handlers:
+        total, modules, error = import_handler(handler, args.runs)
+        if total is None:
+            print(f"{handler:<45} {'FAILED':>11}  {error}")
+            continue
+
+        # Only show modules at the top two levels, as otherwise a package and its own imports all get listed
+        slowest = sorted([module for module in modules if module[1] <= 1], reverse=True)[:args.top]
+        details = ", ".join(f"{name} {cumulative / 1000:.0f}" for cumulative, depth, name in slowest)
+        print(f"{handler:<45} {total / 1000:>11.1f}  {details}")
+
+
+if __name__ == "__main__":
+    main()
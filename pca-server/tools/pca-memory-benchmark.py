@@ -0,0 +1,78 @@
+"""
+Reports how much memory the word-level data of the turn-by-turn parser's speech segments takes up for synthetic
+Transcribe transcripts of different sizes.  Each segment's words are held in a compact WordConfidenceList of
+parallel arrays, and this is compared with the same words held as one dictionary per word, which is how they are
+written to the standard results file.  The word texts are shared by both, so only the memory for holding the words
+is compared, along with the total memory held by the parsed segments.  Memory is measured with tracemalloc, so it
+only covers Python's own allocations.  Run it with the same packages available as the Lambda functions have, e.g.
+
+python pca-server/tools/pca-memory-benchmark.py --words 20000
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import gc
+import argparse
+import tracemalloc
+import pcabenchmark
+
+
+def measure_retained_memory(function):
+    """
+    Calls the function and returns how much memory is still allocated once it has finished, which is the memory
+    held on to by whatever it returned
+
+    :param function: Function to measure, which takes no parameters
+    :return: Retained memory in bytes
+    :return: Result of the function
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return retained, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports the memory held by the turn-by-turn parser's speech "
+                                                 "segments on synthetic Transcribe transcripts")
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 20000, 50000],
+                        help="number of words in each transcript")
+    parser.add_argument("--mode", choices=["speaker", "channel"], default="channel",
+                        help="whether the transcripts are speaker-separated or channel-separated")
+    pcabenchmark.add_source_argument(parser)
+    args = parser.parse_args()
+
+    pcabenchmark.load_pca_source(args.source)
+    import pcaresults
+    turn_by_turn = pcabenchmark.load_handler(args.source, "pca-aws-sf-process-turn-by-turn")
+    channel_mode = (args.mode == "channel")
+
+    print(f"{'WORDS':>8} {'SEGMENTS':>9} {'PARSED (MB)':>12} {'WORD DICTS (MB)':>16} {'PER WORD':>9} "
+          f"{'WORD ARRAYS (MB)':>17} {'PER WORD':>9}")
+    for word_count in args.words:
+        if channel_mode:
+            asr_output = pcabenchmark.generate_channel_transcript(word_count)
+        else:
+            asr_output = pcabenchmark.generate_speaker_transcript(word_count)
+
+        # Everything that the parser holds on to, then the words as dictionaries and as parallel arrays
+        parsed_bytes, (transcribe_parser, segments) = measure_retained_memory(
+            lambda: pcabenchmark.create_turn_by_turn_segments(turn_by_turn, asr_output, channel_mode))
+        dict_bytes, word_dictionaries = measure_retained_memory(
+            lambda: [segment.segmentConfidence.create_json_output() for segment in segments])
+        array_bytes, word_arrays = measure_retained_memory(
+            lambda: [pcaresults.WordConfidenceList.parse_json_input(words) for words in word_dictionaries])
+        parsed_words = sum(len(words) for words in word_arrays)
+
+        print(f"{parsed_words:>8} {len(segments):>9} {parsed_bytes / 1000000:>12.2f} "
+              f"{dict_bytes / 1000000:>16.2f} {dict_bytes / parsed_words:>9.0f} "
+              f"{array_bytes / 1000000:>17.2f} {array_bytes / parsed_words:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
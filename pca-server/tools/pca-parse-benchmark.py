@@ -0,0 +1,45 @@
+"""
+Reports how long the turn-by-turn parser takes to build the speech segments for synthetic Transcribe transcripts
+of different sizes.  Comprehend is never called, so this is just the parsing.  It can be run against an older
+checkout of the Lambda function code with --source, which gives a before and after comparison for a change, e.g.
+
+python pca-server/tools/pca-parse-benchmark.py --words 1000 10000 50000
+python pca-server/tools/pca-parse-benchmark.py --source /tmp/pca-old/pca-server/src/pca
+
+Run it with the same packages available as the Lambda functions have.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import argparse
+import pcabenchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports how long the turn-by-turn parser takes on synthetic "
+                                                 "Transcribe transcripts")
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="number of words in each transcript")
+    parser.add_argument("--mode", choices=["speaker", "channel"], default="speaker",
+                        help="whether the transcripts are speaker-separated or channel-separated")
+    parser.add_argument("--runs", type=int, default=3, help="number of times to parse each transcript")
+    pcabenchmark.add_source_argument(parser)
+    args = parser.parse_args()
+
+    pcabenchmark.load_pca_source(args.source)
+    turn_by_turn = pcabenchmark.load_handler(args.source, "pca-aws-sf-process-turn-by-turn")
+    channel_mode = (args.mode == "channel")
+
+    print(f"{'WORDS':>8} {'SEGMENTS':>9} {'PARSE (ms)':>11} {'PER WORD (us)':>14}")
+    for word_count in args.words:
+        if channel_mode:
+            asr_output = pcabenchmark.generate_channel_transcript(word_count)
+        else:
+            asr_output = pcabenchmark.generate_speaker_transcript(word_count)
+        elapsed, (transcribe_parser, segments) = pcabenchmark.best_time(
+            lambda: pcabenchmark.create_turn_by_turn_segments(turn_by_turn, asr_output, channel_mode), args.runs)
+        print(f"{word_count:>8} {len(segments):>9} {elapsed * 1000:>11.1f} {elapsed * 1000000 / word_count:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
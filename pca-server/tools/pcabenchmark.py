@@ -0,0 +1,201 @@
+"""
+Shared helpers for the PCA benchmark tools.  These load the Lambda function code from a source folder, which is
+the one in this repository unless another checkout of it is given, so the same benchmark can be run before and
+after a change.  They also generate synthetic Transcribe output of any size.  No AWS access is needed, as the
+configuration is set up locally rather than being read from Parameter Store, and Comprehend is never called.
+
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+"""
+import os
+import sys
+import time
+import random
+import importlib.util
+from pathlib import Path
+
+# Folder holding the Lambda function code
+PCA_SOURCE_FOLDER = Path(__file__).resolve().parent.parent / "src" / "pca"
+
+# Environment variables that some modules read when they are imported
+BENCHMARK_ENVIRONMENT = {"AWS_REGION": "us-east-1", "AWS_DEFAULT_REGION": "us-east-1"}
+
+# Vocabulary for the synthetic transcripts
+SYNTHETIC_WORDS = ["hello", "thank", "you", "for", "calling", "account", "number", "please", "card", "the", "a",
+                   "payment", "yes", "no", "my", "is", "today", "billing", "refund", "order", "okay", "sure"]
+SYNTHETIC_PUNCTUATION = [".", ",", "?"]
+SYNTHETIC_WORD_DURATIONS = [0.2, 0.3, 0.41]
+
+
+def add_source_argument(parser):
+    """
+    Adds the --source argument, which picks the Lambda function code to benchmark, to a benchmark's arguments
+    """
+    parser.add_argument("--source", default=str(PCA_SOURCE_FOLDER),
+                        help="folder holding the PCA Lambda function code, e.g. from an older checkout of the "
+                             "repository for a before and after comparison")
+
+
+def load_pca_source(source_folder):
+    """
+    Makes the PCA modules in the source folder importable, and gives them a local configuration with the default
+    sentiment thresholds and speaker names.  Loading the configuration from Parameter Store is switched off
+
+    :param source_folder: Folder holding the PCA Lambda function code
+    :return: The pcaconfiguration module
+    """
+    for name, value in BENCHMARK_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, str(source_folder))
+
+    import pcaconfiguration as cf
+    cf.appConfig.update({
+        cf.CONF_MINNEGATIVE: 0.5, cf.CONF_MINPOSITIVE: 0.5, cf.CONF_ENTITYCONF: 0.5, cf.CONF_ENTITY_FILE: "",
+        cf.CONF_SPEAKER_NAMES: ["Customer", "Agent"], cf.CONF_ENTITY_TYPES: ["LOCATION"], cf.CONF_COMP_LANGS: ["en"],
+        cf.CONF_SPEAKER_MODE: "speaker", cf.CONF_TELEPHONY_CTR: "", cf.CONF_S3BUCKET_OUTPUT: "",
+        cf.CONF_KENDRA_INDEX_ID: "None", cf.CONF_ENTITYENDPOINT: ""
+    })
+    cf.loadConfiguration = lambda *args, **kwargs: None
+    return cf
+
+
+def load_handler(source_folder, handler_name):
+    """
+    Imports one of the Lambda handler modules, whose names are not valid Python module names
+
+    :param source_folder: Folder holding the PCA Lambda function code
+    :param handler_name: Name of the handler, e.g. "pca-aws-sf-process-turn-by-turn"
+    :return: The handler module
+    """
+    spec = importlib.util.spec_from_file_location(handler_name.replace("-", "_"),
+                                                  Path(source_folder) / (handler_name + ".py"))
+    handler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(handler)
+    return handler
+
+
+def best_time(function, runs):
+    """
+    Calls the function a number of times and returns the fastest time, as that is the least affected by anything
+    else on the machine, along with what the function returned on its last run
+
+    :param function: Function to time, which takes no parameters
+    :param runs: Number of times to call it
+    :return: Fastest time in seconds
+    :return: Result of the last call
+    """
+    best = None
+    result = None
+    for run in range(max(1, runs)):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return best, result
+
+
+def create_synthetic_word(rng, start_time):
+    """
+    Creates a Transcribe pronunciation item for a random word, starting at the given time
+
+    :param rng: Random number generator
+    :param start_time: Start time of the word in seconds
+    :return: Transcribe pronunciation item
+    """
+    end_time = start_time + rng.choice(SYNTHETIC_WORD_DURATIONS)
+    return {"start_time": f"{start_time:.2f}", "end_time": f"{end_time:.2f}", "type": "pronunciation",
+            "alternatives": [{"confidence": f"{rng.random():.4f}", "content": rng.choice(SYNTHETIC_WORDS)}]}
+
+
+def create_synthetic_punctuation(rng):
+    """
+    Creates a Transcribe punctuation item for a random punctuation mark
+
+    :param rng: Random number generator
+    :return: Transcribe punctuation item
+    """
+    return {"type": "punctuation",
+            "alternatives": [{"confidence": "0.0", "content": rng.choice(SYNTHETIC_PUNCTUATION)}]}
+
+
+def generate_speaker_transcript(word_count, seed=1, speakers=2):
+    """
+    Generates the output of a speaker-separated Transcribe job, with around one in six words followed by
+    punctuation and a new speaker segment every dozen or so words
+
+    :param word_count: Number of words in the transcript
+    :param seed: Seed for the random number generator, so that the same transcript can be generated again
+    :param speakers: Number of speakers in the call
+    :return: Transcribe job output
+    """
+    rng = random.Random(seed)
+    items = []
+    segments = []
+    segment = None
+    position = 0.0
+    for word in range(word_count):
+        if (segment is None) or (rng.random() < 0.08):
+            position += rng.choice([0.05, 0.5, 3.5])
+            segment = {"start_time": f"{position:.2f}", "speaker_label": f"spk_{rng.randrange(speakers)}",
+                       "items": []}
+            segments.append(segment)
+        item = create_synthetic_word(rng, position)
+        items.append(item)
+        segment["items"].append({"start_time": item["start_time"], "end_time": item["end_time"],
+                                 "speaker_label": segment["speaker_label"]})
+        segment["end_time"] = item["end_time"]
+        position = float(item["end_time"]) + 0.01
+        if rng.random() < 0.15:
+            items.append(create_synthetic_punctuation(rng))
+
+    return {"jobName": "synthetic", "status": "COMPLETED",
+            "results": {"transcripts": [{"transcript": ""}], "items": items,
+                        "speaker_labels": {"speakers": speakers, "segments": segments}}}
+
+
+def generate_channel_transcript(word_count, seed=1, channels=2):
+    """
+    Generates the output of a channel-separated Transcribe job, with the words split evenly between the
+    channels, around one in six words followed by punctuation and the occasional pause in each channel
+
+    :param word_count: Number of words in the transcript
+    :param seed: Seed for the random number generator, so that the same transcript can be generated again
+    :param channels: Number of channels in the call
+    :return: Transcribe job output
+    """
+    rng = random.Random(seed)
+    channel_labels = []
+    for channel in range(channels):
+        items = []
+        position = rng.random()
+        for word in range(word_count // channels):
+            if rng.random() < 0.2:
+                position += rng.choice([0.0, 0.05, 0.5, 2.0, 4.0])
+            item = create_synthetic_word(rng, position)
+            items.append(item)
+            position = float(item["end_time"])
+            if rng.random() < 0.15:
+                items.append(create_synthetic_punctuation(rng))
+        channel_labels.append({"channel_label": f"ch_{channel}", "items": items})
+
+    return {"jobName": "synthetic", "status": "COMPLETED",
+            "results": {"transcripts": [{"transcript": ""}], "items": [],
+                        "channel_labels": {"channels": channel_labels, "number_of_channels": channels}}}
+
+
+def create_turn_by_turn_segments(turn_by_turn, asr_output, channel_mode):
+    """
+    Runs the turn-by-turn parser over some standard Transcribe output, without making any Comprehend calls
+
+    :param turn_by_turn: The turn-by-turn processing handler module
+    :param asr_output: Transcribe job output
+    :param channel_mode: True if the output is channel-separated, or False if it is speaker-separated
+    :return: The parser, which holds the call's results
+    :return: List of speech segments
+    """
+    parser = turn_by_turn.TranscribeParser(0.5, 0.5, "")
+    parser.asr_output = asr_output
+    parser.analytics.transcribe_job.channel_identification = 1 if channel_mode else 0
+    parser.extract_nlp = lambda segment_list: None
+    return parser, parser.create_turn_by_turn_segments({})
@@ -1,4 +1,5 @@
 const AWS = require("aws-sdk");
+const { parseResultsBody } = require("./results");
 const s3 = new AWS.S3({signatureVersion: 'v4'});
 
 const dataBucket = process.env.DataBucket;
@@ -21,7 +22,7 @@ async function getData(key) {
     }
     console.log("Res:", res);
 
-    const data = JSON.parse(res.Body.toString());
+    const data = parseResultsBody(res);
 
     const jobInfo =
         data.ConversationAnalytics.SourceInformation[0].TranscribeJobInfo;
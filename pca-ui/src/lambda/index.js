@@ -1,8 +1,10 @@
 const AWS = require("aws-sdk");
+const { parseResultsBody, isHeaderSidecar, getHeaderSidecarKey } = require("./results");
 const s3 = new AWS.S3();
 const ddb = new AWS.DynamoDB();
 
 const tableName = process.env.TableName;
+const useHeaderSidecar = process.env.HeaderSidecar === "true";
 
 function makeItem(pk, sk, tk, data) {
     return {
@@ -35,22 +37,35 @@ async function createRecord(record) {
 
     console.log("Creating:", key);
 
+    // We only need the header, so read that from its sidecar if we can
     let res;
-    try {
-        res = await s3
-            .getObject({
-                Bucket: record.s3.bucket.name,
-                Key: key,
-            })
-            .promise();
-    } catch (e) {
-        throw e;
+    if (useHeaderSidecar) {
+        try {
+            res = await s3
+                .getObject({
+                    Bucket: record.s3.bucket.name,
+                    Key: getHeaderSidecarKey(key),
+                })
+                .promise();
+        } catch (e) {
+            console.log("No header sidecar, so reading full results file:", e.code);
+        }
+    }
+    if (!res) {
+        try {
+            res = await s3
+                .getObject({
+                    Bucket: record.s3.bucket.name,
+                    Key: key,
+                })
+                .promise();
+        } catch (e) {
+            throw e;
+        }
     }
     console.log("Res:", res);
 
-    const body = res.Body.toString();
-   
-    const parsed = JSON.parse(body);
+    const parsed = parseResultsBody(res);
     console.log("Parsed:", parsed);
 
     const jobInfo =
@@ -178,9 +193,25 @@ async function createRecord(record) {
 async function deleteRecord(record) {
     const key = record.s3.object.key;
     console.log("Deleting:", key);
+    await deleteHeaderSidecar(record.s3.bucket.name, key);
     return deleteKey(key);
 }
 
+// Header sidecars aren't in the folder that we get events for, so one would be left behind
+// when its results file is removed.  Deleting a sidecar that was never written is a no-op
+async function deleteHeaderSidecar(bucket, key) {
+    try {
+        await s3
+            .deleteObject({
+                Bucket: bucket,
+                Key: getHeaderSidecarKey(key),
+            })
+            .promise();
+    } catch (e) {
+        console.log("Unable to delete header sidecar:", e.code);
+    }
+}
+
 async function deleteKey(key) {
     console.log("Deleting key:", key);
     let records;
@@ -261,6 +292,12 @@ exports.handler = async function (event, context) {
         let inner = body.Records.map((s3Record) => {
             let eventType = s3Record.eventName.split(":")[0];
 
+            // Header sidecars have their own folder so shouldn't reach us, but they aren't calls
+            if (isHeaderSidecar(s3Record.s3.object.key)) {
+                console.log("Ignoring header sidecar:", s3Record.s3.object.key);
+                return Promise.resolve("No op");
+            }
+
             if (eventType == "ObjectCreated") {
                 return createRecord(s3Record);
             } else if (eventType == "ObjectRemoved") {
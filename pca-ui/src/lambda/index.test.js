@@ -1,5 +1,6 @@
 const { handler } = require("./index");
 const AWS = require("aws-sdk");
+const zlib = require("zlib");
 const testFile = require("./testfile.json");
 
 jest.mock("aws-sdk", () => {
@@ -12,6 +13,7 @@ jest.mock("aws-sdk", () => {
 
   const mockS3Client = {
     getObject: jest.fn().mockReturnThis(),
+    deleteObject: jest.fn().mockReturnThis(),
     promise: jest.fn().mockReturnThis(),
   };
 
@@ -21,6 +23,43 @@ jest.mock("aws-sdk", () => {
   };
 });
 
+// Builds the SQS event that the indexer receives when a results bucket object is written or removed
+function createS3Event(key, size, eventName = "ObjectCreated:Put") {
+  const s3Event = {
+    Records: [
+      {
+        eventVersion: "2.1",
+        eventSource: "aws:s3",
+        awsRegion: "us-east-1",
+        eventTime: "2021-11-25T12:58:37.771Z",
+        eventName: eventName,
+        userIdentity: { principalId: "example-arn" },
+        s3: {
+          s3SchemaVersion: "1.0",
+          configurationId: "example::example-bucket/parsedFiles",
+          bucket: {
+            name: "example-bucket",
+            ownerIdentity: { principalId: "example" },
+            arn: "arn:aws:s3:::example-bucket",
+          },
+          object: { key: key, size: size },
+        },
+      },
+    ],
+  };
+
+  return {
+    Records: [
+      {
+        body: JSON.stringify(s3Event),
+        eventSource: "aws:sqs",
+        eventSourceARN: "arn:aws:sqs:us-east-1:999999999:test-arn",
+        awsRegion: "us-east-1",
+      },
+    ],
+  };
+}
+
 describe("S3 Object Index Handler", () => {
   test("it works", async () => {
     const ddb = AWS.DynamoDB();
@@ -49,4 +88,50 @@ describe("S3 Object Index Handler", () => {
     expect(s3.getObject.mock.calls.length).toBe(1);
     expect(ddb.putItem.mock.calls.length).toBe(13);
   });
+
+  test("it reads gzip-compressed results", async () => {
+    const ddb = AWS.DynamoDB();
+    const s3 = AWS.S3();
+
+    s3.promise.mockResolvedValueOnce({
+      Body: zlib.gzipSync(JSON.stringify(testFile)),
+      ContentEncoding: "gzip",
+    });
+
+    const resp = await handler(createS3Event("test-key", 16314));
+
+    expect(s3.getObject.mock.calls[0][0].Bucket).toBe("example-bucket");
+    expect(s3.getObject.mock.calls[0][0].Key).toBe("test-key");
+
+    expect(s3.getObject.mock.calls.length).toBe(1);
+    expect(ddb.putItem.mock.calls.length).toBe(13);
+  });
+
+  test("it ignores header sidecars", async () => {
+    const ddb = AWS.DynamoDB();
+    const s3 = AWS.S3();
+
+    const resp = await handler(createS3Event("parsedFiles-headers/test-key.json", 2048));
+
+    expect(s3.getObject.mock.calls.length).toBe(0);
+    expect(ddb.putItem.mock.calls.length).toBe(0);
+  });
+
+  test("it deletes the header sidecar of a removed results file", async () => {
+    const ddb = AWS.DynamoDB();
+    const s3 = AWS.S3();
+
+    ddb.promise.mockResolvedValueOnce({ Items: [] });
+
+    const resp = await handler(
+      createS3Event("parsedFiles/test-key.json", 0, "ObjectRemoved:Delete")
+    );
+
+    expect(s3.deleteObject.mock.calls.length).toBe(1);
+    expect(s3.deleteObject.mock.calls[0][0].Bucket).toBe("example-bucket");
+    expect(s3.deleteObject.mock.calls[0][0].Key).toBe(
+      "parsedFiles-headers/test-key.json"
+    );
+    expect(s3.getObject.mock.calls.length).toBe(0);
+  });
 });
@@ -0,0 +1,29 @@
+const zlib = require("zlib");
+
+// Parsed results files can be written gzip-compressed by the server, in which case S3
+// marks them with a ContentEncoding of "gzip" that getObject does not undo for us
+function parseResultsBody(res) {
+    let body = res.Body;
+    if (res.ContentEncoding === "gzip") {
+        body = zlib.gunzipSync(body);
+    }
+    return JSON.parse(body.toString());
+}
+
+// The server can write a small header sidecar for each results file, holding just its
+// ConversationAnalytics.  It has the same name, but sits in a sibling folder so that the
+// results folder only holds calls, e.g. "parsedFiles-headers/call.wav.json" for
+// "parsedFiles/call.wav.json"
+const headerSidecarFolderSuffix = "-headers";
+
+function isHeaderSidecar(key) {
+    const folder = key.slice(0, Math.max(key.lastIndexOf("/"), 0));
+    return folder.endsWith(headerSidecarFolderSuffix);
+}
+
+function getHeaderSidecarKey(key) {
+    const slash = key.lastIndexOf("/");
+    return key.slice(0, Math.max(slash, 0)) + headerSidecarFolderSuffix + "/" + key.slice(slash + 1);
+}
+
+module.exports = { parseResultsBody, isHeaderSidecar, getHeaderSidecarKey };
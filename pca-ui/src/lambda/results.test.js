@@ -0,0 +1,21 @@
+const { isHeaderSidecar, getHeaderSidecarKey } = require("./results");
+
+describe("Results file helpers", () => {
+  test("it maps results files to their header sidecars", () => {
+    expect(getHeaderSidecarKey("parsedFiles/call.wav.json")).toBe(
+      "parsedFiles-headers/call.wav.json"
+    );
+    expect(getHeaderSidecarKey("pca/parsedFiles/call.wav.json")).toBe(
+      "pca/parsedFiles-headers/call.wav.json"
+    );
+  });
+
+  test("it keeps header sidecars out of the results folder", () => {
+    const sidecarKey = getHeaderSidecarKey("parsedFiles/call.wav.json");
+
+    expect(sidecarKey.startsWith("parsedFiles/")).toBe(false);
+    expect(isHeaderSidecar(sidecarKey)).toBe(true);
+    expect(isHeaderSidecar("parsedFiles/call.wav.json")).toBe(false);
+    expect(isHeaderSidecar("call.wav.json")).toBe(false);
+  });
+});
@@ -1,4 +1,5 @@
 const AWS = require("aws-sdk");
+const { parseResultsBody, getHeaderSidecarKey } = require("./results");
 const ddb = new AWS.DynamoDB();
 const s3 = new AWS.S3();
 
@@ -75,9 +76,7 @@ async function getData(key) {
     }
     console.log("Res:", res);
 
-    const body = res.Body.toString();
-
-    return JSON.parse(body);
+    return parseResultsBody(res);
 }
 
 async function putData(key, data) {
@@ -90,6 +89,29 @@ async function putData(key, data) {
         .promise();
 }
 
+// If the server wrote a header sidecar for this call then it holds its own copy of the
+// speaker labels, and the indexer reads that first, so it has to be swapped as well
+async function putHeaderSidecar(key, data) {
+    const sidecarKey = getHeaderSidecarKey(key);
+    try {
+        await s3
+            .headObject({
+                Bucket: dataBucket,
+                Key: sidecarKey,
+            })
+            .promise();
+    } catch (e) {
+        if (e.code === "NotFound" || e.code === "NoSuchKey") {
+            return;
+        }
+        throw e;
+    }
+
+    return putData(sidecarKey, {
+        ConversationAnalytics: data.ConversationAnalytics,
+    });
+}
+
 async function swapData(key) {
     const data = await getData(key);
 
@@ -99,6 +121,8 @@ async function swapData(key) {
     data.ConversationAnalytics.SpeakerLabels[0].DisplayText = b;
     data.ConversationAnalytics.SpeakerLabels[1].DisplayText = a;
 
+    // Sidecar first, as rewriting the results file is what re-triggers the indexer
+    await putHeaderSidecar(key, data);
     return putData(key, data);
 }
 
@@ -17,7 +17,7 @@ import { useDangerAlert } from "../../hooks/useAlert";
 import "./dashboard.css";
 import { getEntityColor } from "./colours";
 import { TranscriptOverlay } from "./TranscriptOverlay";
-import { range } from "../../util";
+import { range, getWordConfidence } from "../../util";
 import { Sentiment } from "../../components/Sentiment";
 import { ChatInput } from "../../components/ChatInput";
 import { Button, ContentLayout, Spinner, Link, Header, Grid, Container, SpaceBetween, Input, FormField, TextContent } from '@cloudscape-design/components';
@@ -426,7 +426,7 @@ function Dashboard({ setAlert }) {
   const tcaSummary = (data?.ConversationAnalytics?.ContactSummary?.AutoGenerated?.OverallSummary?.Content ?? "");
 
   const audioEndTimestamps = (data?.SpeechSegments || [])
-    .map(({WordConfidence}) => WordConfidence)
+    .map(({WordConfidence}) => getWordConfidence(WordConfidence))
     .flat()
     .reduce((accumulator, item) => ([...accumulator, item.EndTime]),[]);
 
@@ -801,7 +801,7 @@ function Dashboard({ setAlert }) {
               <TranscriptSegment
                 key={i}
                 name={speakerLabels[s.SegmentSpeaker]}
-                allSegments={s?.WordConfidence || []}
+                allSegments={getWordConfidence(s?.WordConfidence)}
                 segmentStart={s.SegmentStartTime}
                 text={s.DisplayText}
                 onClick={setAudioCurrentTime}
@@ -1,3 +1,15 @@
 export const range = (start, end) => {
   return [...Array(end + 1 - start).keys()].map((x) => x + start);
 };
+
+// Results files written with the compact schema hold each segment's WordConfidence
+// as parallel lists, so turn them back into one object per word
+export const getWordConfidence = (wordConfidence) => {
+  if (!wordConfidence || Array.isArray(wordConfidence)) return wordConfidence || [];
+  return wordConfidence.Text.map((text, i) => ({
+    Text: text,
+    Confidence: wordConfidence.Confidence[i],
+    StartTime: wordConfidence.StartTime[i],
+    EndTime: wordConfidence.EndTime[i],
+  }));
+};